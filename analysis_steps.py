@@ -7,12 +7,90 @@ Utiliza as configurações de config.py e os dados carregados por data_loader.py
 
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
 import config # Importa as configurações
 import data_loader # Importa o módulo de carregamento de dados
+import pareto
+from quantile_sketch import KLLSketch
 
-def filter_best_models(df, of_column, percentile):
+def compute_of_threshold(of_values, percentile, method=None, error=None):
+    """
+    Calcula o valor de corte da OF para o percentil informado.
+
+    Args:
+        of_values (array-like or KLLSketch): Valores de OF, ou um esboço já preenchido.
+        percentile (float): Percentil (entre 0 e 1) para o corte.
+        method (str, optional): 'exact' (seleção com np.partition, mesmo resultado de
+                                pandas.Series.quantile) ou 'sketch' (esboço KLL aproximado).
+                                Padrão: config.QUANTILE_METHOD.
+        error (float, optional): Erro de posto do esboço. Padrão: config.QUANTILE_SKETCH_ERROR.
+
+    Returns:
+        float: O valor de corte.
+    """
+
+    if isinstance(of_values, KLLSketch):
+        return of_values.quantile(percentile)
+
+    method = method or config.QUANTILE_METHOD
+    values = np.asarray(of_values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+
+    if method == 'sketch':
+        return KLLSketch(error or config.QUANTILE_SKETCH_ERROR).update(values).quantile(percentile)
+    if method != 'exact':
+        raise ValueError(f"Método de quantil desconhecido: '{method}'. Use 'exact' ou 'sketch'.")
+
+    # Interpolação linear entre as duas estatísticas de ordem vizinhas,
+    # obtidas em O(n) com np.partition em vez de ordenar todo o array
+    position = percentile * (values.size - 1)
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    partitioned = np.partition(values, [lower, upper])
+    return partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (position - lower)
+
+
+def sketch_of_column(chunk_source, of_column, error=None):
+    """
+    Constrói, em uma única passada, o esboço KLL da coluna de OF.
+    Esboços de arquivos ou partes diferentes podem ser combinados com KLLSketch.merge.
+
+    Args:
+        chunk_source (callable): Função sem argumentos que retorna um iterador de blocos.
+        of_column (str): Nome da coluna da função objetivo.
+        error (float, optional): Erro de posto do esboço. Padrão: config.QUANTILE_SKETCH_ERROR.
+
+    Returns:
+        KLLSketch: O esboço preenchido.
+    """
+
+    sketch = KLLSketch(error or config.QUANTILE_SKETCH_ERROR)
+    for chunk in chunk_source():
+        sketch.update(chunk[of_column].to_numpy())
+    return sketch
+
+
+def select_best_indices(of_values, percentile, method=None, error=None):
+    """
+    Retorna as posições (índices inteiros) dos modelos com OF abaixo do percentil,
+    sem copiar nenhum dado além da própria máscara.
+
+    Args:
+        of_values (array-like): Valores de OF de todos os modelos.
+        percentile (float): Percentil (entre 0 e 1) para o corte.
+        method (str, optional): Ver compute_of_threshold.
+        error (float, optional): Ver compute_of_threshold.
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Posições das linhas selecionadas.
+            - float: O valor de corte.
+    """
+
+    values = np.asarray(of_values)
+    of_threshold = compute_of_threshold(values, percentile, method, error)
+    return np.flatnonzero(values <= of_threshold), of_threshold
+
+
+def filter_best_models(df, of_column, percentile, method=None, return_indices=False):
     """
     Filtra o DataFrame para manter apenas os modelos com 'OF Value'
     abaixo de um determinado percentil.
@@ -21,26 +99,133 @@ def filter_best_models(df, of_column, percentile):
         df (pandas.DataFrame): DataFrame original com os dados.
         of_column (str): Nome da coluna da função objetivo.
         percentile (float): Percentil (entre 0 e 1) para o corte.
+        method (str, optional): 'exact' ou 'sketch'. Padrão: config.QUANTILE_METHOD.
+        return_indices (bool): Se True, retorna apenas as posições das linhas
+                               selecionadas em vez de um novo DataFrame.
 
     Returns:
-        pandas.DataFrame: DataFrame filtrado contendo os melhores modelos.
+        pandas.DataFrame or numpy.ndarray: DataFrame filtrado contendo os melhores
+        modelos, ou as posições das linhas selecionadas.
     """
     
-    # Calcula o valor de corte (threshold)
-    of_threshold = df[of_column].quantile(percentile)
+    # Calcula o valor de corte (threshold) e as linhas selecionadas
+    best_positions, of_threshold = select_best_indices(df[of_column].to_numpy(), percentile, method)
     print(f"Calculando o valor de corte da OF ({percentile*100:.0f}º percentil): {of_threshold:.4f}")
+    print(f"Número de modelos selecionados (melhores {percentile*100:.0f}%): {len(best_positions)}")
+
+    if return_indices:
+        return best_positions
+
+    # Filtra o DataFrame (iloc com posições já gera um novo DataFrame; .copy() seria uma segunda cópia)
+    return df.iloc[best_positions]
+
 
-    # Filtra o DataFrame
-    best_models_df = df[df[of_column] <= of_threshold].copy()
+def filter_best_models_chunked(chunk_source, of_column, percentile, of_values=None, method=None):
+    """
+    Versão em blocos de filter_best_models, para ensembles que não cabem em memória.
+
+    O corte é calculado em uma única passada: com of_values (já carregados) pela
+    seleção exata, ou, sem eles, por um esboço KLL montado bloco a bloco. Uma
+    segunda passada mantém, de cada bloco, somente as linhas abaixo do corte.
+
+    Args:
+        chunk_source (callable): Função sem argumentos que retorna um novo iterador
+                                 de blocos (ex.: lambda: data_loader.iter_data_chunks(arquivo)).
+        of_column (str): Nome da coluna da função objetivo.
+        percentile (float): Percentil (entre 0 e 1) para o corte.
+        of_values (array-like or KLLSketch, optional): Valores de OF de todo o ensemble,
+                                                       ou um esboço já preenchido.
+        method (str, optional): Método usado com of_values. Padrão: config.QUANTILE_METHOD.
+
+    Returns:
+        pandas.DataFrame: DataFrame filtrado contendo os melhores modelos.
+    """
+
+    if of_values is None:
+        of_values = sketch_of_column(chunk_source, of_column)
+    of_threshold = compute_of_threshold(of_values, percentile, method)
+    print(f"Calculando o valor de corte da OF ({percentile*100:.0f}º percentil): {of_threshold:.4f}")
+
+    selected = [chunk[chunk[of_column] <= of_threshold] for chunk in chunk_source()]
+    best_models_df = pd.concat(selected)
     print(f"Número de modelos selecionados (melhores {percentile*100:.0f}%): {len(best_models_df)}")
 
     return best_models_df
 
 
+def select_best_pareto(df, objective_columns=None, target_count=None, return_indices=False):
+    """
+    Seleciona os melhores modelos por frentes de Pareto de várias colunas de
+    desajuste (ex.: uma por poço), todas minimizadas, em vez do percentil de
+    uma única OF. As frentes entram em ordem até target_count modelos; a última
+    frente necessária é truncada pela distância de aglomeração (ver pareto.py).
+
+    Args:
+        df (pandas.DataFrame): DataFrame com as colunas de objetivos.
+        objective_columns (list, optional): Colunas minimizadas.
+                                            Padrão: config.OBJECTIVE_COLUMNS (ou ['OF Value']).
+        target_count (int, optional): Número de modelos selecionados. Padrão:
+                                      config.PARETO_TARGET_COUNT (ou BEST_MODEL_PERCENTILE do total).
+        return_indices (bool): Se True, retorna as posições selecionadas e a
+                               frente de todas as linhas em vez de um novo DataFrame.
+
+    Returns:
+        pandas.DataFrame or tuple: DataFrame dos modelos selecionados, com a coluna
+        'Frente_Pareto', ou (posições selecionadas, frente de cada linha de df).
+    """
+    objective_columns = list(objective_columns or config.OBJECTIVE_COLUMNS or ['OF Value'])
+    missing = [col for col in objective_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colunas de objetivos não encontradas: {missing}")
+    if target_count is None:
+        target_count = config.PARETO_TARGET_COUNT or int(round(config.BEST_MODEL_PERCENTILE * len(df)))
+
+    F = np.empty((len(df), len(objective_columns)), dtype=np.float64)
+    for j, col in enumerate(objective_columns):
+        F[:, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    F[np.isnan(F)] = np.inf # Desajuste ausente conta como o pior possível
+    best_positions, fronts = pareto.select_by_fronts(F, target_count)
+
+    selected_fronts = fronts[best_positions]
+    last_front = int(selected_fronts.max()) if len(best_positions) else -1
+    print(f"Seleção por frentes de Pareto ({len(objective_columns)} objetivos: {', '.join(objective_columns)})")
+    print(f"Número de modelos selecionados: {len(best_positions)} "
+          f"(frentes 0 a {last_front}; {int((fronts == 0).sum())} modelos não dominados)")
+
+    if return_indices:
+        return best_positions, fronts
+
+    best_models_df = df.iloc[best_positions]
+    best_models_df['Frente_Pareto'] = selected_fronts
+    return best_models_df
+
+
+def select_rows_chunked(chunk_source, positions):
+    """
+    Mantém, de cada bloco, somente as linhas nas posições informadas (posições
+    em relação ao arquivo inteiro, como as de select_best_pareto sobre load_columns).
+
+    Args:
+        chunk_source (callable): Função sem argumentos que retorna um novo iterador de blocos.
+        positions (array-like): Posições das linhas a manter, em ordem crescente.
+
+    Returns:
+        pandas.DataFrame: As linhas selecionadas.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    selected, offset = [], 0
+    for chunk in chunk_source():
+        lo, hi = np.searchsorted(positions, [offset, offset + len(chunk)])
+        selected.append(chunk.iloc[positions[lo:hi] - offset])
+        offset += len(chunk)
+    return pd.concat(selected)
+
+
 def select_parameters(df):
     """
     Seleciona apenas as colunas de parâmetros (multiplicadores) do DataFrame.
-    Exclui 'OF Value' e 'Simulation'.
+    Exclui 'OF Value', 'Simulation', as colunas de objetivos (config.OBJECTIVE_COLUMNS)
+    e 'Frente_Pareto'.
 
     Args:
         df (pandas.DataFrame): DataFrame (geralmente o filtrado).
@@ -50,49 +235,140 @@ def select_parameters(df):
     """
 
     # Colunas a serem excluídas (assumindo que 'Simulation' exista)
-    cols_to_exclude = ['OF Value', 'Simulation']
+    cols_to_exclude = ['OF Value', 'Simulation', 'Frente_Pareto'] + list(config.OBJECTIVE_COLUMNS or [])
     parameter_cols = [col for col in df.columns if col not in cols_to_exclude]
 
     print(f"Colunas de parâmetros selecionadas: {parameter_cols}")
-    return df[parameter_cols].copy()
+    # Sem .copy(): com Copy-on-Write (pandas 3) a seleção compartilha os dados de df
+    # e só é copiada se for modificada
+    return df[parameter_cols]
 
-def scale_data(X):
+def scale_data(X, chunk_size=None):
     """
     Padroniza (escala) os dados dos parâmetros (média 0, desvio padrão 1).
 
     Args:
-        X (pandas.DataFrame): DataFrame com os parâmetros selecionados.
+        X (pandas.DataFrame or numpy.ndarray): Parâmetros selecionados. Uma matriz
+                                               de ponto flutuante (ex.: CalibrationMatrix.values)
+                                               é escalada no próprio lugar, sem cópia.
+        chunk_size (int, optional): Se informado, o scaler é ajustado com partial_fit
+                                    e os dados são transformados em blocos de linhas,
+                                    sem cópias intermediárias do tamanho de X.
 
     Returns:
         tuple: Contendo:
-            - pandas.DataFrame: DataFrame com os parâmetros escalados.
+            - pandas.DataFrame or numpy.ndarray: Os parâmetros escalados (a própria
+              matriz X, se X for um numpy.ndarray).
             - sklearn.preprocessing.StandardScaler: O objeto scaler ajustado.
     """
 
+    from sklearn.preprocessing import StandardScaler # Importado sob demanda (início mais rápido)
+
     scaler = StandardScaler()
-    X_scaled_array = scaler.fit_transform(X)
+    if isinstance(X, np.ndarray) and X.dtype.kind == 'f':
+        row_blocks = [slice(start, start + chunk_size) for start in range(0, len(X), chunk_size)] \
+            if chunk_size else [slice(None)]
+        for block in row_blocks:
+            scaler.partial_fit(X[block])
+        for block in row_blocks:
+            # copy=False: cada bloco (uma visão de X) é escalado no próprio lugar
+            scaler.transform(X[block], copy=False)
+        print(f"Dados padronizados (escalados) no próprio lugar. Shape: {X.shape}")
+        return X, scaler
+    if chunk_size:
+        n_rows = len(X)
+        for start in range(0, n_rows, chunk_size):
+            scaler.partial_fit(X.iloc[start:start + chunk_size])
+        # Mantém o tipo compacto da entrada (ex.: float32 vindo de iter_data_chunks)
+        dtype = np.result_type(*X.dtypes) if len(X.columns) else np.float64
+        X_scaled_array = np.empty(X.shape, dtype=dtype)
+        for start in range(0, n_rows, chunk_size):
+            X_scaled_array[start:start + chunk_size] = scaler.transform(X.iloc[start:start + chunk_size])
+    else:
+        X_scaled_array = scaler.fit_transform(X)
     X_scaled_df = pd.DataFrame(X_scaled_array, columns=X.columns, index=X.index)
     print(f"Dados padronizados (escalados). Shape: {X_scaled_df.shape}")
 
     return X_scaled_df, scaler
 
 
-def apply_pca(X_scaled, variance_threshold):
+def _truncate_pca(pca, n_components):
+    """
+    Mantém apenas os primeiros n_components de um PCA/IncrementalPCA já ajustado,
+    preservando transform/inverse_transform e os atributos usados no relatório.
+    """
+    total_variance = np.sum(pca.explained_variance_)
+    pca.noise_variance_ = (np.mean(pca.explained_variance_[n_components:])
+                           if n_components < len(pca.explained_variance_) else 0.0)
+    pca.components_ = pca.components_[:n_components]
+    pca.explained_variance_ = pca.explained_variance_[:n_components]
+    pca.explained_variance_ratio_ = pca.explained_variance_ratio_[:n_components]
+    pca.singular_values_ = pca.singular_values_[:n_components]
+    pca.n_components_ = n_components
+    pca.n_components = n_components
+    if total_variance == 0:
+        pca.explained_variance_ratio_ = np.zeros(n_components)
+    return pca
+
+
+def _row_batches(n_rows, batch_size, min_rows):
+    """
+    Divide n_rows em fatias de batch_size linhas. A última fatia é unida à
+    anterior se tiver menos que min_rows linhas (exigência do IncrementalPCA).
+    """
+    starts = list(range(0, n_rows, batch_size))
+    if len(starts) > 1 and n_rows - starts[-1] < min_rows:
+        starts.pop()
+    bounds = starts[1:] + [n_rows]
+    return [slice(start, stop) for start, stop in zip(starts, bounds)]
+
+
+def apply_pca(X_scaled, variance_threshold, engine=None, batch_size=None):
     """
     Aplica PCA aos dados escalados para reter uma certa porcentagem da variância.
 
     Args:
         X_scaled (pandas.DataFrame): DataFrame com os parâmetros escalados.
         variance_threshold (float): Percentual da variância a ser mantido (entre 0 e 1).
+        engine (str, optional): 'full' (SVD completo em memória) ou 'incremental'
+                                (IncrementalPCA ajustado lote a lote, com o número de
+                                componentes escolhido após o ajuste). Padrão: config.PCA_ENGINE.
+        batch_size (int, optional): Linhas por lote no modo incremental.
+                                    Padrão: config.PCA_BATCH_SIZE.
 
     Returns:
         tuple: Contendo:
             - numpy.ndarray: Array com os dados transformados pelo PCA.
-            - sklearn.decomposition.PCA: O objeto PCA ajustado.
+            - sklearn.decomposition.PCA: O objeto PCA ajustado (IncrementalPCA no modo
+              incremental, com a mesma interface de transform/inverse_transform).
     """
+    from sklearn.decomposition import PCA, IncrementalPCA # Importado sob demanda (início mais rápido)
+
+    engine = engine or config.PCA_ENGINE
+    if engine == 'full':
+        pca = PCA(n_components=variance_threshold)
+        X_pca_array = pca.fit_transform(X_scaled)
+    elif engine == 'incremental':
+        X_array = np.asarray(X_scaled)
+        n_rows, n_features = X_array.shape
+        batches = _row_batches(n_rows, batch_size or config.PCA_BATCH_SIZE, n_features)
+
+        pca = IncrementalPCA(n_components=min(n_features, len(X_array[batches[0]])))
+        for batch in batches:
+            pca.partial_fit(X_array[batch])
+
+        # Escolhe o número de componentes pela variância acumulada, como PCA(n_components=float)
+        cumulative = np.cumsum(pca.explained_variance_ratio_)
+        n_components = min(int(np.searchsorted(cumulative, variance_threshold, side='right')) + 1,
+                           len(cumulative))
+        _truncate_pca(pca, n_components)
+
+        X_pca_array = np.empty((n_rows, n_components), dtype=X_array.dtype)
+        for batch in batches:
+            X_pca_array[batch] = pca.transform(X_array[batch])
+    else:
+        raise ValueError(f"Engine de PCA desconhecida: '{engine}'. Use 'full' ou 'incremental'.")
 
-    pca = PCA(n_components=variance_threshold)
-    X_pca_array = pca.fit_transform(X_scaled)
     print(f"PCA aplicado. Número de componentes selecionados: {pca.n_components_}")
     print(f"Variância explicada acumulada: {np.sum(pca.explained_variance_ratio_):.2f}")
     
@@ -0,0 +1,189 @@
+# batch_runner.py
+"""
+Executa o pipeline completo (main.main) para vários arquivos de calibração em
+paralelo, cada um em um processo próprio, com configuração e diretório de
+resultados isolados. Ao final, imprime um resumo consolidado de tempo e vazão.
+
+Uso:
+    python batch_runner.py "*.xlsx" --workers 3
+    python batch_runner.py arquivo1.xlsx arquivo2.xlsx --config analise.toml --set OPTIMAL_K=6
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import config
+
+LOG_FILENAME = 'execucao.log'
+
+def expand_inputs(patterns):
+    """
+    Expande uma lista de caminhos e/ou padrões glob em arquivos únicos, na ordem informada.
+
+    Args:
+        patterns (list): Caminhos ou padrões (ex.: '*.xlsx').
+
+    Returns:
+        list: Caminhos dos arquivos encontrados.
+    """
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+        if not matches:
+            print(f"Aviso: Nenhum arquivo encontrado para '{pattern}'.")
+        for path in matches:
+            if path not in files:
+                files.append(path)
+    return files
+
+def assign_results_dirs(files):
+    """
+    Diretório de resultados de cada arquivo: o padrão ('results_<nome do arquivo>')
+    ou, para arquivos com o mesmo nome (ex.: a/calib.xlsx e b/calib.xlsx, ou
+    x.xlsx e x.csv), esse nome acrescido da pasta e, se preciso, da extensão, de
+    modo que execuções simultâneas não compartilhem logs, caches e resultados.
+
+    Args:
+        files (list): Caminhos dos arquivos de calibração.
+
+    Returns:
+        list: Diretório de resultados de cada arquivo, na mesma ordem.
+
+    Raises:
+        ValueError: Se dois arquivos ainda assim usariam o mesmo diretório.
+    """
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _disambiguate(results_dirs, suffix):
+        # O sufixo só é acrescentado aos diretórios repetidos em que ele distingue os arquivos
+        suffixes = pd.DataFrame({'dir': [_key(results_dir) for results_dir in results_dirs],
+                                 'suffix': [suffix(path) for path in files]})
+        distinct = suffixes.groupby('dir')['suffix'].transform('nunique') > 1
+        return [f"{results_dir}_{suffix}" if add else results_dir
+                for results_dir, suffix, add in zip(results_dirs, suffixes['suffix'], distinct)]
+
+    results_dirs = [config._default_results_dir(path) for path in files]
+    results_dirs = _disambiguate(results_dirs, lambda path: os.path.basename(os.path.dirname(os.path.abspath(path))))
+    results_dirs = _disambiguate(results_dirs, lambda path: os.path.splitext(path)[1].lstrip('.'))
+    seen = {}
+    for path, results_dir in zip(files, results_dirs):
+        other = seen.setdefault(_key(results_dir), path)
+        if other != path:
+            raise ValueError(f"'{other}' e '{path}' usariam o mesmo diretório de resultados ('{results_dir}').")
+    return results_dirs
+
+def run_single_input(input_file, n_jobs=None, overrides=None, results_dir=None):
+    """
+    Executa o pipeline para um único arquivo. Roda dentro de um processo do pool,
+    então a configuração alterada aqui não afeta as demais entradas.
+    A saída do pipeline é gravada em '<diretório de resultados>/execucao.log'.
+
+    Args:
+        input_file (str): Arquivo de calibração a analisar.
+        n_jobs (int, optional): Processos da varredura de k dentro desta execução.
+        overrides (dict, optional): Alterações de configuração (config.load_overrides),
+                                    aplicadas antes de definir o arquivo de entrada.
+        results_dir (str, optional): Diretório de resultados (ver assign_results_dirs).
+                                     Padrão: 'results_<nome do arquivo>'.
+
+    Returns:
+        dict: Resumo da execução, com 'status', 'seconds' e, em caso de erro, 'error'.
+    """
+    import main
+
+    config.update(**(overrides or {}))
+    config.configure(input_file, results_dir)
+    if n_jobs is not None:
+        config.N_JOBS = n_jobs
+    log_path = os.path.join(config.ensure_results_dir(), LOG_FILENAME)
+
+    start = time.perf_counter()
+    summary = {'input_file': input_file, 'results_dir': config.RESULTS_DIR}
+    with open(log_path, 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            summary.update(main.main() or {})
+            summary['status'] = 'ok'
+        except Exception as e:
+            traceback.print_exc()
+            summary['status'] = 'erro'
+            summary['error'] = str(e)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+def run_batch(inputs, max_workers=None, overrides=None):
+    """
+    Executa o pipeline para vários arquivos em um pool de processos.
+
+    Args:
+        inputs (list): Caminhos ou padrões glob dos arquivos de calibração.
+        max_workers (int, optional): Máximo de arquivos processados ao mesmo tempo.
+                                     Padrão: mínimo entre o número de arquivos e de núcleos.
+        overrides (dict, optional): Alterações de configuração aplicadas em cada execução.
+
+    Returns:
+        pandas.DataFrame: Resumo por arquivo (status, linhas, tempo e vazão).
+    """
+    files = expand_inputs(inputs)
+    if not files:
+        print("Nenhum arquivo para processar.")
+        return pd.DataFrame()
+    # Cada arquivo em um diretório próprio, mesmo com nomes repetidos (ex.: '*/calib.xlsx')
+    try:
+        results_dirs = assign_results_dirs(files)
+    except ValueError as e:
+        print(f"Erro: {e} Nada foi processado.")
+        return pd.DataFrame()
+
+    n_cpus = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers or n_cpus, len(files)))
+    # Divide os núcleos entre as execuções simultâneas (varredura de k de cada uma)
+    n_jobs = max(1, n_cpus // max_workers)
+    print(f"Processando {len(files)} arquivo(s) com até {max_workers} execução(ões) simultânea(s)...")
+
+    start = time.perf_counter()
+    results = []
+    # max_tasks_per_child=1: cada arquivo roda em um processo novo, com config isolado
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as executor:
+        futures = {executor.submit(run_single_input, path, n_jobs, overrides, results_dir): path
+                   for path, results_dir in zip(files, results_dirs)}
+        for future in as_completed(futures):
+            summary = future.result()
+            results.append(summary)
+            print(f"  [{summary['status']}] {summary['input_file']} em {summary['seconds']:.1f}s "
+                  f"(log: {os.path.join(summary['results_dir'], LOG_FILENAME)})")
+    total_seconds = time.perf_counter() - start
+
+    summary_df = pd.DataFrame(results).set_index('input_file').loc[files]
+    if 'n_simulations' in summary_df:
+        summary_df['simulacoes_por_segundo'] = summary_df['n_simulations'] / summary_df['seconds']
+
+    print("\n--- Resumo do Processamento em Lote ---")
+    print(summary_df.drop(columns=['results_dir', 'error'], errors='ignore').to_string())
+    total_rows = summary_df.get('n_simulations', pd.Series(dtype=float)).sum()
+    n_ok = int((summary_df['status'] == 'ok').sum())
+    print(f"\n{n_ok}/{len(files)} arquivo(s) concluído(s) em {total_seconds:.1f}s "
+          f"(soma dos tempos individuais: {summary_df['seconds'].sum():.1f}s).")
+    if total_seconds > 0:
+        print(f"Vazão total: {total_rows / total_seconds:.1f} simulações/s, "
+              f"{len(files) / total_seconds * 60:.2f} arquivos/min.")
+    return summary_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa a análise de calibração para vários arquivos em paralelo.")
+    parser.add_argument('inputs', nargs='+', help="Arquivos ou padrões glob (ex.: '*.xlsx').")
+    parser.add_argument('--workers', type=int, default=None, help="Máximo de arquivos processados ao mesmo tempo.")
+    config.add_cli_arguments(parser)
+    args = parser.parse_args()
+    overrides = config.load_overrides(args.config_file, args.assignments)
+    overrides.pop('INPUT_FILE', None) # Cada execução usa o seu arquivo
+    overrides.pop('RESULTS_DIR', None)
+    summary_df = run_batch(args.inputs, args.workers, overrides)
+    sys.exit(0 if len(summary_df) and (summary_df['status'] == 'ok').all() else 1)
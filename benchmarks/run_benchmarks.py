@@ -0,0 +1,393 @@
+# benchmarks/run_benchmarks.py
+"""
+Suíte de benchmarks do pipeline de análise de calibração.
+
+Para cada cenário (linhas x parâmetros x clusters), gera um ensemble sintético
+(benchmarks/synthetic_data.py), mede tempo, vazão (linhas/s) e pico de memória
+alocada (tracemalloc) de cada função pública de analysis_steps e clustering,
+e roda main.main de ponta a ponta sobre o arquivo gerado.
+
+As medidas são comparadas com um baseline salvo (benchmarks/baseline.json).
+Queda de vazão ou aumento de pico de memória acima da tolerância, ou mudança
+nos resultados numéricos de referência (limiar de OF, componentes do PCA,
+inércia...), fazem o script terminar com código 1. O baseline depende da
+máquina: gere-o com --save-baseline no mesmo equipamento em que a suíte roda.
+
+Uso:
+    python benchmarks/run_benchmarks.py                       # compara com o baseline
+    python benchmarks/run_benchmarks.py --save-baseline       # grava um novo baseline
+    python benchmarks/run_benchmarks.py --scenarios grande --skip-end-to-end
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR)) # Raiz do repositório
+
+import sklearn
+import config
+import analysis_steps
+import clustering
+import incremental
+from synthetic_data import generate_ensemble, write_ensemble
+from data_loader import _clean_dataframe
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# input_format: formato do arquivo usado no teste de ponta a ponta
+# ('parquet' roda main.main no modo em blocos, config.STREAMING_CHUNK_SIZE)
+SCENARIOS = {
+    'pequeno': {'rows': 2_000, 'params': 7, 'clusters': 5, 'input_format': 'xlsx'},
+    'medio': {'rows': 50_000, 'params': 7, 'clusters': 5, 'input_format': 'parquet'},
+    'grande': {'rows': 500_000, 'params': 12, 'clusters': 8, 'input_format': 'parquet'},
+}
+DEFAULT_SCENARIOS = ['pequeno', 'medio']
+
+CHUNK_SIZE = 50_000         # Blocos das variantes em blocos e do teste de ponta a ponta
+MIN_REPEAT_SECONDS = 1.0    # Funções mais rápidas que isso são repetidas (mediana de 3 a 5 execuções)
+MIN_COMPARED_SECONDS = 0.5  # Abaixo disso o ruído de medição domina: vazão não é comparada
+NOISE_SECONDS = 0.1         # Quedas de vazão que custam menos que isso (em segundos) são ignoradas
+MIN_END_TO_END_SECONDS = 10.0 # main.main mais rápido que isso é repetido (mediana de 3 execuções)
+# Custo fixo (não cresce com as linhas): a vazão em linhas/s não é comparada
+FIXED_COST_BENCHMARKS = ('plot_elbow_method', 'plot_silhouette_scores')
+FIXED_COST_STAGES = ('Gerando Gráficos de Visualização',) # Etapas de main.main fora do tempo de ponta a ponta
+MEMORY_SLACK_MB = 1.0       # Aumentos de memória menores que isso são ignorados
+
+def _measure(func, *args, **kwargs):
+    """
+    Executa func uma vez com tracemalloc (pico de memória e resultado) e depois
+    sem ele, para o tempo (mediana de 3 a 5 execuções se a função for rápida).
+
+    Returns:
+        tuple: (resultado, segundos, pico de memória em MB).
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        result = func(*args, **kwargs)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+
+        # Uma execução basta para as funções lentas; as rápidas são repetidas
+        timings = []
+        while not timings or (timings[0] < MIN_REPEAT_SECONDS and len(timings) < 5 and
+                              (len(timings) < 3 or sum(timings) < MIN_REPEAT_SECONDS)):
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+    return result, float(np.median(timings)), peak_mb
+
+def _blocks(data, size=CHUNK_SIZE):
+    """Fonte de blocos reiniciável sobre um DataFrame ou array já em memória."""
+    if hasattr(data, 'iloc'):
+        return lambda: (data.iloc[i:i + size] for i in range(0, len(data), size))
+    return lambda: (data[i:i + size] for i in range(0, len(data), size))
+
+def run_function_benchmarks(df_raw, work_dir, n_jobs=None):
+    """
+    Mede as funções públicas de analysis_steps e clustering, na ordem do pipeline.
+
+    Args:
+        df_raw (pandas.DataFrame): Ensemble sintético bruto.
+        work_dir (str): Diretório para os gráficos gerados.
+        n_jobs (int, optional): Processos da varredura de k (config.N_JOBS se None).
+
+    Returns:
+        dict: nome -> {'seconds', 'rows', 'rows_per_second', 'peak_mb', 'result'}.
+    """
+    records = {}
+
+    def bench(name, rows, func, *args, result=None, **kwargs):
+        value, seconds, peak_mb = _measure(func, *args, **kwargs)
+        records[name] = {'seconds': seconds, 'rows': rows,
+                         'rows_per_second': rows / seconds if seconds > 0 else None,
+                         'peak_mb': peak_mb,
+                         'result': result(value) if result is not None else None}
+        return value
+
+    df = _clean_dataframe(df_raw, verbose=False)
+    of_values = df['OF Value'].to_numpy()
+    n = len(df)
+    percentile = config.BEST_MODEL_PERCENTILE
+
+    # analysis_steps
+    bench('compute_of_threshold', n, analysis_steps.compute_of_threshold, of_values, percentile,
+          method='exact', result=float)
+    bench('compute_of_threshold[sketch]', n, analysis_steps.compute_of_threshold, of_values, percentile,
+          method='sketch')
+    bench('sketch_of_column', n, analysis_steps.sketch_of_column, _blocks(df), 'OF Value')
+    bench('select_best_indices', n, analysis_steps.select_best_indices, of_values, percentile,
+          result=lambda value: len(value[0]))
+    df_best = bench('filter_best_models', n, analysis_steps.filter_best_models, df, 'OF Value', percentile,
+                    result=len)
+    bench('filter_best_models_chunked', n, analysis_steps.filter_best_models_chunked, _blocks(df),
+          'OF Value', percentile, of_values=of_values, result=len)
+    n_best = len(df_best)
+    X_parameters = bench('select_parameters', n_best, analysis_steps.select_parameters, df_best,
+                         result=lambda value: value.shape[1])
+    X_scaled, scaler = bench('scale_data', n_best, analysis_steps.scale_data, X_parameters)
+    bench('scale_data[chunked]', n_best, analysis_steps.scale_data, X_parameters, chunk_size=CHUNK_SIZE)
+    X_pca, pca = bench('apply_pca', n_best, analysis_steps.apply_pca, X_scaled, config.PCA_VARIANCE_THRESHOLD,
+                       engine='full', result=lambda value: value[1].n_components_)
+    bench('apply_pca[incremental]', n_best, analysis_steps.apply_pca, X_scaled, config.PCA_VARIANCE_THRESHOLD,
+          engine='incremental', result=lambda value: value[1].n_components_)
+
+    # clustering
+    sweep = bench('run_k_sweep', n_best, clustering.run_k_sweep, X_pca, config.K_RANGE, n_jobs=n_jobs,
+                  backend='kmeans', result=lambda value: [round(float(v), 6) for v in value.inertia_list()])
+    optimal_k, _ = bench('select_optimal_k', n_best, clustering.select_optimal_k, sweep, strategy='kneedle',
+                         result=lambda value: value[0])
+    sweep_metrics = sweep.without_models()
+    bench('plot_elbow_method', n_best, clustering.plot_elbow_method, None, config.K_RANGE,
+          os.path.join(work_dir, 'cotovelo.png'), sweep=sweep_metrics)
+    bench('plot_silhouette_scores', n_best, clustering.plot_silhouette_scores, None, config.K_RANGE,
+          os.path.join(work_dir, 'silhueta.png'), sweep=sweep_metrics)
+    labels, model = bench('apply_kmeans', n_best, clustering.apply_kmeans, X_pca, optimal_k, sweep=sweep,
+                          backend='kmeans', result=lambda value: round(float(value[1].inertia_), 6))
+    _, minibatch_model = bench('fit_minibatch_kmeans_stream', n_best,
+                               lambda: clustering.fit_minibatch_kmeans_stream(_blocks(X_pca), optimal_k))
+    bench('evaluate_clustering_quality', n_best, clustering.evaluate_clustering_quality, X_pca, minibatch_model)
+
+    df_best = df_best.copy()
+    df_best['Cluster'] = labels
+    X_scaled['Cluster'] = labels
+    parameter_columns = list(X_parameters.columns)
+    bench('analyze_clusters', n_best, clustering.analyze_clusters, df_best, X_scaled, model, scaler, pca,
+          parameter_columns)
+    bench('analyze_of_by_cluster', n_best, clustering.analyze_of_by_cluster, df_best, 'OF Value',
+          result=lambda value: int(value['count'].sum()))
+    # Um gerador de blocos novo a cada repetição da medida
+    bench('analyze_of_by_cluster[chunked]', n_best,
+          lambda: clustering.analyze_of_by_cluster(None, 'OF Value', chunks=_blocks(df_best)()))
+
+    # incremental: reexecutar sem simulações novas deve continuar incremental (resultado True),
+    # inclusive com um parâmetro constante, como nas planilhas reais
+    df_constant = df.assign(ParamConstante=0.15)
+    df_best_constant = df_best.drop(columns='Cluster').assign(ParamConstante=0.15)
+    X_constant = analysis_steps.select_parameters(df_best_constant)
+    X_constant_scaled, constant_scaler = analysis_steps.scale_data(X_constant.to_numpy(dtype=float))
+    X_constant_pca, constant_pca = analysis_steps.apply_pca(X_constant_scaled, config.PCA_VARIANCE_THRESHOLD)
+    constant_labels, constant_model = clustering.apply_kmeans(X_constant_pca, optimal_k, backend='kmeans')
+    state = incremental.build_state(df_constant, df_best_constant, X_constant, X_constant_pca, constant_labels,
+                                    constant_scaler, constant_pca, constant_model)
+    bench('prepare_update[sem novas]', n, incremental.prepare_update, df_constant, state=state,
+          result=lambda value: value is not None)
+    # ... mas novas simulações em que o parâmetro constante varia exigem o ajuste completo (resultado False)
+    state = incremental.build_state(df_constant, df_best_constant, X_constant, X_constant_pca, constant_labels,
+                                    constant_scaler, constant_pca, constant_model)
+    new_rows = df_constant.loc[df_best_constant.index[:max(1, n // 100)]].assign(ParamConstante=0.3)
+    new_rows.index = 'Nova' + new_rows.index.astype(str)
+    df_varying = pd.concat([df_constant, new_rows])
+    bench('prepare_update[constante varia]', n, incremental.prepare_update, df_varying, state=state,
+          result=lambda value: value is not None)
+    return records
+
+def run_end_to_end(input_path, work_dir, n_rows, n_jobs=None):
+    """
+    Executa main.main sobre o arquivo sintético, sem caches, com os resultados em work_dir
+    (mediana de 3 execuções se uma levar menos de MIN_END_TO_END_SECONDS). O tempo
+    não inclui as etapas de custo fixo (FIXED_COST_STAGES, os gráficos), que nos
+    cenários pequenos dominariam a vazão em linhas/s.
+
+    Returns:
+        dict: {'seconds', 'rows', 'rows_per_second', 'peak_mb', 'result'}, com o pico
+              de RSS e o número de clusters lidos das medidas do próprio pipeline.
+    """
+    import main
+
+    saved = config.settings() # Restaurado ao final
+    try:
+        config.configure(input_path, results_dir=os.path.join(work_dir, 'resultados'))
+        config.USE_DATA_CACHE = False
+        config.USE_STAGE_CACHE = False
+        config.STREAMING_CHUNK_SIZE = CHUNK_SIZE if input_path.endswith('.parquet') else None
+        if n_jobs is not None:
+            config.N_JOBS = n_jobs
+        timings = []
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            while not timings or (timings[0] < MIN_END_TO_END_SECONDS and len(timings) < 3):
+                start = time.perf_counter()
+                summary = main.main()
+                seconds = time.perf_counter() - start
+                with open(config.OUTPUT_PERFORMANCE_JSON, encoding='utf-8') as f:
+                    performance = json.load(f)
+                timings.append(seconds - sum(stage['wall_seconds'] for stage in performance['stages']
+                                             if stage['title'] in FIXED_COST_STAGES))
+        seconds = float(np.median(timings))
+    finally:
+        config.update(**saved)
+
+    peak_rss = [stage['peak_rss_mb'] for stage in performance['stages'] if stage['peak_rss_mb'] is not None]
+    return {'seconds': seconds, 'rows': n_rows, 'rows_per_second': n_rows / seconds,
+            'peak_mb': max(peak_rss) if peak_rss else None,
+            'result': {'n_best': summary['n_best'], 'n_clusters': summary['n_clusters']}}
+
+def _preload_lazy_imports():
+    """
+    Importa antes das medidas as bibliotecas que o pipeline carrega sob demanda
+    (sklearn, matplotlib, seaborn), para que o custo único de importação não
+    seja atribuído à primeira função medida.
+    """
+    import sklearn.cluster, sklearn.decomposition, sklearn.metrics, sklearn.preprocessing
+    import matplotlib.figure, matplotlib.backends.backend_agg, matplotlib.colors, matplotlib.patches
+    import plotting
+    plotting.new_figure((1, 1))
+
+def run_scenario(name, n_jobs=None, end_to_end=True):
+    """Gera o ensemble do cenário e executa todos os benchmarks sobre ele."""
+    _preload_lazy_imports()
+    spec = SCENARIOS[name]
+    print(f"\n--- Cenário '{name}': {spec['rows']} linhas x {spec['params']} parâmetros, "
+          f"{spec['clusters']} clusters ---")
+    df_raw = generate_ensemble(spec['rows'], spec['params'], spec['clusters'])
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+        records = run_function_benchmarks(df_raw, work_dir, n_jobs)
+        if end_to_end:
+            input_path = write_ensemble(df_raw, os.path.join(work_dir, f"sintetico_{name}.{spec['input_format']}"))
+            records['main.main'] = run_end_to_end(input_path, work_dir, spec['rows'], n_jobs)
+    for bench_name, record in records.items():
+        peak = f"{record['peak_mb']:.1f} MB" if record['peak_mb'] is not None else "n/d"
+        print(f"  {bench_name:<34} {record['seconds']:>9.4f} s  {record['rows_per_second'] or 0:>14,.0f} linhas/s  {peak}")
+    return records
+
+def _same_result(current, baseline):
+    """Compara resultados de referência (números, listas ou dicionários) com tolerância relativa."""
+    if isinstance(baseline, dict):
+        return isinstance(current, dict) and baseline.keys() == current.keys() and \
+            all(_same_result(current[key], baseline[key]) for key in baseline)
+    if isinstance(baseline, list):
+        return isinstance(current, list) and len(current) == len(baseline) and \
+            np.allclose(current, baseline, rtol=1e-6, equal_nan=True)
+    if baseline is None:
+        return True
+    return bool(np.isclose(current, baseline, rtol=1e-6))
+
+def reference_seconds(repeats=5):
+    """
+    Tempo (mediana) de uma carga fixa de numpy e Python puro. A razão entre o
+    valor atual e o do baseline mede a velocidade da máquina no momento, para
+    que uma lentidão geral (outros processos, CPU compartilhada) não seja
+    tomada por regressão.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.random((400_000, 8))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        np.sort(X, axis=0)
+        X.T @ X
+        sum(i * i for i in range(1_000_000))
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def compare_with_baseline(current, baseline, tolerance=0.25, memory_tolerance=0.25, speed_ratio=1.0):
+    """
+    Compara as medidas atuais com o baseline.
+
+    Args:
+        current (dict): cenário -> benchmark -> medidas (como em run_scenario).
+        baseline (dict): Mesmo formato, lido do arquivo de baseline.
+        tolerance (float): Queda relativa de vazão tolerada.
+        memory_tolerance (float): Aumento relativo de pico de memória tolerado.
+        speed_ratio (float): Tempo da carga de referência atual / do baseline
+                             (ver reference_seconds); os tempos do baseline são
+                             escalados por ele antes da comparação.
+
+    Returns:
+        list: Descrições das regressões encontradas (vazia se não houver).
+    """
+    regressions = []
+    for scenario, records in current.items():
+        for bench_name, record in records.items():
+            base = baseline.get(scenario, {}).get(bench_name)
+            if base is None:
+                continue
+            label = f"{scenario}/{bench_name}"
+            # Vazão esperada nesta máquina, no ritmo atual
+            base_seconds = base['seconds'] * speed_ratio
+            base_rate = base['rows_per_second'] / speed_ratio if base['rows_per_second'] else None
+            if base_rate and record['rows_per_second'] and bench_name not in FIXED_COST_BENCHMARKS and \
+                    max(base_seconds, record['seconds']) >= MIN_COMPARED_SECONDS and \
+                    record['seconds'] - base_seconds > NOISE_SECONDS and \
+                    record['rows_per_second'] < base_rate * (1 - tolerance):
+                regressions.append(f"{label}: vazão caiu de {base_rate:,.0f} para "
+                                   f"{record['rows_per_second']:,.0f} linhas/s")
+            if base['peak_mb'] is not None and record['peak_mb'] is not None and \
+                    record['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance) and \
+                    record['peak_mb'] - base['peak_mb'] > MEMORY_SLACK_MB:
+                regressions.append(f"{label}: pico de memória subiu de {base['peak_mb']:.1f} para "
+                                   f"{record['peak_mb']:.1f} MB")
+            if not _same_result(record['result'], base['result']):
+                regressions.append(f"{label}: resultado mudou de {base['result']} para {record['result']}")
+    return regressions
+
+def _json_default(value):
+    """Converte escalares numpy (ex.: np.int64) para tipos nativos ao gravar JSON."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não é serializável em JSON")
+
+def _environment(reference):
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'sklearn': sklearn.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'reference_seconds': reference}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa os benchmarks do pipeline de calibração.")
+    parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS, choices=list(SCENARIOS),
+                        help="Cenários a executar.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Arquivo JSON do baseline.")
+    parser.add_argument('--save-baseline', action='store_true', help="Grava as medidas como novo baseline.")
+    parser.add_argument('--output', default=None, help="Grava as medidas desta execução em JSON.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Queda relativa de vazão tolerada.")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                        help="Aumento relativo de pico de memória tolerado.")
+    parser.add_argument('--n-jobs', type=int, default=None, help="Processos da varredura de k.")
+    parser.add_argument('--skip-end-to-end', action='store_true', help="Não executa main.main.")
+    args = parser.parse_args()
+
+    # Carga de referência antes e depois dos cenários (velocidade média da máquina durante a suíte)
+    reference = reference_seconds()
+    results = {name: run_scenario(name, args.n_jobs, not args.skip_end_to_end) for name in args.scenarios}
+    reference = (reference + reference_seconds()) / 2
+    payload = {'environment': _environment(reference), 'scenarios': results}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, default=_json_default)
+
+    if args.save_baseline:
+        # Preserva os cenários do baseline que não foram executados agora
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                previous = json.load(f)
+            payload['scenarios'] = {**previous.get('scenarios', {}), **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, default=_json_default)
+        print(f"\nBaseline salvo em '{args.baseline}'.")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"\nAviso: Baseline '{args.baseline}' não encontrado; use --save-baseline para criá-lo.")
+        sys.exit(0)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    base_reference = baseline['environment'].get('reference_seconds')
+    speed_ratio = reference / base_reference if base_reference else 1.0
+    print(f"\nVelocidade da máquina em relação ao baseline: {1 / speed_ratio:.0%} (carga de referência).")
+    regressions = compare_with_baseline(results, baseline['scenarios'], args.tolerance, args.memory_tolerance,
+                                        speed_ratio)
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) em relação ao baseline:")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\nNenhuma regressão em relação ao baseline.")
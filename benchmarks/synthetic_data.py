@@ -0,0 +1,104 @@
+# benchmarks/synthetic_data.py
+"""
+Gera ensembles sintéticos de calibração com o mesmo esquema das planilhas
+reais lidas por data_loader: 'Unnamed: 0' (ex.: 'Sim0'), N colunas de
+multiplicadores, 'OutputPath', 'OF Value', 'Simulation' e 'Ambiguity'.
+
+Os multiplicadores de uma fração das simulações são sorteados em torno de
+centros (a estrutura de clusters que o pipeline deve encontrar); os demais
+são uniformes no intervalo dos multiplicadores. O 'OF Value' cresce com a
+distância ao centro mais próximo, de modo que os melhores modelos se
+concentram nos clusters, como nas calibrações reais.
+
+Uso:
+    python benchmarks/synthetic_data.py sintetico.xlsx --rows 20000 --params 7 --clusters 5
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+MULTIPLIER_RANGE = (0.3, 2.0) # Faixa dos multiplicadores nas planilhas reais
+
+def generate_ensemble(n_rows, n_params=7, n_clusters=5, cluster_std=0.08, cluster_fraction=0.6,
+                      extra_columns=True, random_state=42):
+    """
+    Gera um ensemble sintético de calibração.
+
+    Args:
+        n_rows (int): Número de simulações.
+        n_params (int): Número de multiplicadores (parâmetros).
+        n_clusters (int): Número de centros da estrutura de clusters.
+        cluster_std (float): Desvio padrão dos multiplicadores em torno de cada centro.
+        cluster_fraction (float): Fração das simulações sorteadas em torno dos centros.
+        extra_columns (bool): Se inclui 'OutputPath' e 'Ambiguity' (removidas na limpeza).
+        random_state (int): Semente do gerador, para ensembles reprodutíveis.
+
+    Returns:
+        pandas.DataFrame: O ensemble bruto, como lido de uma planilha.
+    """
+    rng = np.random.default_rng(random_state)
+    low, high = MULTIPLIER_RANGE
+    span = high - low
+    centers = rng.uniform(low + 0.15 * span, high - 0.15 * span, size=(n_clusters, n_params))
+
+    params = rng.uniform(low, high, size=(n_rows, n_params))
+    n_clustered = int(round(n_rows * cluster_fraction))
+    members = rng.integers(0, n_clusters, size=n_clustered)
+    params[:n_clustered] = centers[members] + rng.normal(0.0, cluster_std * span, size=(n_clustered, n_params))
+    np.clip(params, low, high, out=params)
+    params = params[rng.permutation(n_rows)]
+
+    # OF: distância (normalizada) ao centro mais próximo, mais ruído, em blocos para limitar memória
+    nearest = np.empty(n_rows)
+    for start in range(0, n_rows, 100_000):
+        block = params[start:start + 100_000]
+        sq_dist = ((block[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        nearest[start:start + 100_000] = np.sqrt(sq_dist.min(axis=1) / n_params) / span
+    of_value = 0.35 + 0.5 * nearest + rng.normal(0.0, 0.01, size=n_rows)
+
+    simulation = np.arange(n_rows)
+    df = pd.DataFrame({'Unnamed: 0': [f"Sim{i}" for i in simulation]})
+    for j in range(n_params):
+        df[f"Param{j + 1}"] = params[:, j]
+    if extra_columns:
+        df['OutputPath'] = [f"output{i}" for i in simulation]
+    df['OF Value'] = of_value
+    df['Simulation'] = simulation
+    if extra_columns:
+        df['Ambiguity'] = rng.uniform(0.2, 0.25, size=n_rows)
+    return df
+
+def write_ensemble(df, file_path):
+    """
+    Grava o ensemble no formato indicado pela extensão (.xlsx, .csv ou .parquet).
+
+    Args:
+        df (pandas.DataFrame): Ensemble gerado por generate_ensemble.
+        file_path (str): Caminho do arquivo de saída.
+
+    Returns:
+        str: O caminho gravado.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        df.to_excel(file_path, index=False)
+    elif extension == '.csv':
+        df.to_csv(file_path, index=False)
+    elif extension == '.parquet':
+        df.to_parquet(file_path, index=False)
+    else:
+        raise ValueError(f"Formato de arquivo não suportado: '{extension}'")
+    return file_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um ensemble sintético de calibração.")
+    parser.add_argument('output', help="Arquivo de saída (.xlsx, .csv ou .parquet).")
+    parser.add_argument('--rows', type=int, default=20_000, help="Número de simulações.")
+    parser.add_argument('--params', type=int, default=7, help="Número de multiplicadores.")
+    parser.add_argument('--clusters', type=int, default=5, help="Número de centros de clusters.")
+    parser.add_argument('--seed', type=int, default=42, help="Semente do gerador.")
+    args = parser.parse_args()
+    write_ensemble(generate_ensemble(args.rows, args.params, args.clusters, random_state=args.seed), args.output)
+    print(f"Ensemble sintético com {args.rows} simulações salvo em '{args.output}'")
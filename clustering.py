@@ -1,19 +1,352 @@
 # clustering.py
 """
-Módulo para determinar o número ideal de clusters, aplicar K-Means
-e analisar as características dos clusters formados.
+Módulo para determinar o número ideal de clusters, aplicar K-Means (ou o
+clustering por densidade, HDBSCAN/DBSCAN) e analisar as características
+dos clusters formados.
 """
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
 import config # Importa as configurações
-import data_loader # Para teste
-import analysis_steps # Para teste
+import plotting
+from silhouette import compute_silhouette, SILHOUETTE_MODE_LABELS
+from quantile_sketch import KLLSketch
 
-def plot_elbow_method(X_pca, k_range, filename):
+@dataclass
+class KSweepResult:
+    """
+    Resultados do K-Means ajustado uma única vez para cada k do intervalo testado.
+    Compartilhado entre o Método do Cotovelo, a Silhueta e apply_kmeans.
+
+    Attributes:
+        k_values (list): Valores de k testados.
+        models (dict): k -> KMeans ajustado (ausente se k >= número de amostras).
+        labels (dict): k -> rótulos de cluster.
+        inertia (dict): k -> inércia (WSS).
+        centers (dict): k -> centróides no espaço PCA.
+        silhouette (dict): k -> pontuação média de silhueta (NaN se não aplicável).
+        silhouette_ci (dict): k -> (limite inferior, limite superior) do intervalo de
+                              confiança da silhueta (NaN fora do modo 'sample').
+        silhouette_mode (str): Modo usado no cálculo da silhueta (ver silhouette.py).
+        calinski_harabasz (dict): k -> índice de Calinski-Harabasz (maior é melhor).
+        davies_bouldin (dict): k -> índice de Davies-Bouldin (menor é melhor).
+        backend (str): Backend de clustering usado nos ajustes ('kmeans' ou 'minibatch').
+        timings (dict): k -> {'fit_seconds', 'metrics_seconds', 'cpu_seconds'}, medidos
+                        no processo que ajustou cada k.
+    """
+    k_values: list
+    models: dict = field(default_factory=dict)
+    labels: dict = field(default_factory=dict)
+    inertia: dict = field(default_factory=dict)
+    centers: dict = field(default_factory=dict)
+    silhouette: dict = field(default_factory=dict)
+    silhouette_ci: dict = field(default_factory=dict)
+    calinski_harabasz: dict = field(default_factory=dict)
+    davies_bouldin: dict = field(default_factory=dict)
+    silhouette_mode: str = 'exact'
+    backend: str = 'kmeans'
+    timings: dict = field(default_factory=dict)
+
+    def inertia_list(self):
+        """Inércias na ordem de k_values (NaN para k não ajustado)."""
+        return [self.inertia.get(k, np.nan) for k in self.k_values]
+
+    def silhouette_list(self):
+        """Pontuações de silhueta na ordem de k_values."""
+        return [self.silhouette.get(k, np.nan) for k in self.k_values]
+
+    def without_models(self):
+        """Cópia só com as métricas por k (sem modelos e rótulos), leve para enviar a outros processos."""
+        return replace(self, models={}, labels={}, centers={})
+
+CLUSTERING_BACKENDS = ('kmeans', 'minibatch')
+# Backends por densidade: sem varredura de k; modelos fora de qualquer cluster recebem NOISE_LABEL
+DENSITY_BACKENDS = ('hdbscan', 'dbscan')
+NOISE_LABEL = -1
+
+@dataclass
+class DensityClustering:
+    """
+    Clustering por densidade ajustado (HDBSCAN ou DBSCAN), com os atributos que o
+    pipeline usa do K-Means (n_clusters, labels_, cluster_centers_).
+
+    Attributes:
+        estimator: O estimador do scikit-learn ajustado.
+        labels_ (numpy.ndarray): Rótulo de cada modelo (NOISE_LABEL para ruído).
+        cluster_centers_ (numpy.ndarray): Média, no espaço PCA, dos membros de cada
+                                          cluster (usada pelo pacote do modelo).
+        backend (str): 'hdbscan' ou 'dbscan'.
+        silhouette (float): Silhueta média dos modelos fora do ruído (NaN com menos de 2 clusters).
+        seconds (float): Tempo do ajuste.
+        min_cluster_size (int): Tamanho mínimo de cluster usado (HDBSCAN).
+        min_samples (int): Vizinhos usados na estimativa de densidade.
+    """
+    estimator: object
+    labels_: np.ndarray
+    cluster_centers_: np.ndarray
+    backend: str
+    silhouette: float = np.nan
+    seconds: float = 0.0
+    min_cluster_size: int = None
+    min_samples: int = None
+
+    @property
+    def n_clusters(self):
+        return len(self.cluster_centers_)
+
+    @property
+    def n_noise(self):
+        return int((self.labels_ == NOISE_LABEL).sum())
+
+def density_min_cluster_size(n_rows):
+    """Tamanho mínimo de cluster do HDBSCAN: config.DENSITY_MIN_CLUSTER_SIZE ou, se None, 1% dos modelos (mínimo 5)."""
+    return config.DENSITY_MIN_CLUSTER_SIZE or max(5, n_rows // 100)
+
+def is_density_backend(backend=None):
+    """Se o backend de clustering é por densidade (sem k)."""
+    return (backend or config.CLUSTERING_BACKEND) in DENSITY_BACKENDS
+
+def _make_kmeans(k, backend=None, random_state=42, n_init='auto', batch_size=None):
+    """
+    Cria o estimador de clustering do backend escolhido.
+
+    Args:
+        k (int): Número de clusters.
+        backend (str, optional): 'kmeans' (K-Means completo) ou 'minibatch'
+                                 (MiniBatchKMeans). Padrão: config.CLUSTERING_BACKEND.
+        random_state (int): Semente da inicialização.
+        n_init (int or str): Número de inicializações ('auto' é o padrão moderno).
+        batch_size (int, optional): Tamanho dos mini-lotes ('minibatch'). Padrão: config.MINIBATCH_SIZE.
+
+    Returns:
+        KMeans or MiniBatchKMeans: Estimador não ajustado.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans # Importado sob demanda (início mais rápido)
+
+    backend = backend or config.CLUSTERING_BACKEND
+    if backend == 'kmeans':
+        return KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    if backend == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=n_init,
+                               batch_size=batch_size or config.MINIBATCH_SIZE)
+    raise ValueError(f"Backend de clustering desconhecido: '{backend}'. Use um de {CLUSTERING_BACKENDS}.")
+
+# Dados compartilhados (somente leitura) de cada processo do pool da varredura de k
+_worker_X = None
+
+def _init_sweep_worker(X_pca, n_threads):
+    """Inicializa um processo da varredura: recebe os dados uma vez e limita os threads."""
+    from threadpoolctl import threadpool_limits
+
+    global _worker_X
+    _worker_X = X_pca
+    threadpool_limits(limits=n_threads)
+
+def _fit_single_k(k, X_pca=None, silhouette_mode=None, backend=None, batch_size=None, silhouette_options=None):
+    """
+    Ajusta o K-Means para um único k e calcula a silhueta dos rótulos obtidos.
+    As configurações chegam como argumentos: processos iniciados por 'spawn'
+    (macOS, Windows) não veem as alterações feitas em config pelo processo principal.
+    """
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+
+    X_pca = _worker_X if X_pca is None else X_pca
+    start, cpu_start = time.perf_counter(), time.process_time()
+    kmeans = _make_kmeans(k, backend, batch_size=batch_size)
+    labels = kmeans.fit_predict(X_pca)
+    fit_end = time.perf_counter()
+    # compute_silhouette retorna NaN se apenas um cluster for formado
+    silhouette = compute_silhouette(X_pca, labels, mode=silhouette_mode, centers=kmeans.cluster_centers_,
+                                    **(silhouette_options or {}))
+    if len(np.unique(labels)) < 2:
+        ch_score, db_score = np.nan, np.nan
+    else:
+        ch_score = calinski_harabasz_score(X_pca, labels)
+        db_score = davies_bouldin_score(X_pca, labels)
+    timing = {'fit_seconds': fit_end - start,
+              'metrics_seconds': time.perf_counter() - fit_end,
+              'cpu_seconds': time.process_time() - cpu_start}
+    return k, kmeans, silhouette, ch_score, db_score, timing
+
+def run_k_sweep(X_pca, k_range, n_jobs=None, silhouette_mode=None, backend=None):
+    """
+    Ajusta o K-Means uma vez para cada k, distribuindo os valores de k entre processos.
+
+    Args:
+        X_pca (numpy.ndarray): Dados após PCA.
+        k_range (range): Intervalo de valores de 'k' a testar.
+        n_jobs (int, optional): Número de processos. Padrão: config.N_JOBS
+                                (None = todos os núcleos; 1 = sem pool de processos).
+        silhouette_mode (str, optional): 'exact', 'sample' ou 'simplified'.
+                                         Padrão: config.SILHOUETTE_MODE.
+        backend (str, optional): 'kmeans' ou 'minibatch'. Padrão: config.CLUSTERING_BACKEND.
+
+    Returns:
+        KSweepResult: Modelos, rótulos, inércias, centróides e silhuetas por k.
+    """
+
+    k_values = list(k_range)
+    silhouette_mode = silhouette_mode or config.SILHOUETTE_MODE
+    backend = backend or config.CLUSTERING_BACKEND
+    result = KSweepResult(k_values=k_values, silhouette_mode=silhouette_mode, backend=backend)
+    valid_k = []
+    for k in k_values:
+        # Garante que k seja menor que o número de amostras
+        if k >= X_pca.shape[0]:
+            print(f"  Aviso: k={k} é maior ou igual ao número de amostras ({X_pca.shape[0]}). Pulando.")
+        else:
+            valid_k.append(k)
+
+    n_jobs = n_jobs if n_jobs is not None else config.N_JOBS
+    n_workers = min(n_jobs or os.cpu_count() or 1, max(len(valid_k), 1))
+    print(f"\n--- Varredura de k ({len(valid_k)} valores, {n_workers} processo(s), "
+          f"silhueta {SILHOUETTE_MODE_LABELS[silhouette_mode]}) ---")
+
+    # Configurações resolvidas aqui e passadas explicitamente aos processos do pool
+    silhouette_options = {'sample_size': config.SILHOUETTE_SAMPLE_SIZE, 'confidence': config.SILHOUETTE_CONFIDENCE,
+                          'max_bytes': config.SILHOUETTE_BLOCK_BYTES}
+    fit_k = partial(_fit_single_k, silhouette_mode=silhouette_mode, backend=backend,
+                    batch_size=config.MINIBATCH_SIZE, silhouette_options=silhouette_options)
+    if n_workers <= 1:
+        fitted = [fit_k(k, X_pca) for k in valid_k]
+    else:
+        n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_sweep_worker,
+                                 initargs=(X_pca, n_threads)) as executor:
+            fitted = list(executor.map(fit_k, valid_k))
+
+    # Modo efetivamente usado (ex.: 'sample' com amostra >= número de modelos vira 'exact')
+    used_modes = {fit[2].mode for fit in fitted if fit[2].n_evaluated}
+    if len(used_modes) == 1 and silhouette_mode not in used_modes:
+        result.silhouette_mode = used_modes.pop()
+        print(f"  Silhueta calculada no modo '{result.silhouette_mode}' (a amostra cobre todos os modelos).")
+    for k, kmeans, silhouette, ch_score, db_score, timing in fitted:
+        result.models[k] = kmeans
+        result.labels[k] = kmeans.labels_
+        result.inertia[k] = kmeans.inertia_
+        result.centers[k] = kmeans.cluster_centers_
+        result.silhouette[k] = silhouette.score
+        result.silhouette_ci[k] = (silhouette.ci_low, silhouette.ci_high)
+        result.calinski_harabasz[k] = ch_score
+        result.davies_bouldin[k] = db_score
+        result.timings[k] = timing
+    return result
+
+K_SELECTION_STRATEGIES = ('manual', 'silhouette', 'kneedle', 'gap', 'calinski_harabasz', 'davies_bouldin')
+
+def _kneedle_k(k_values, inertia):
+    """
+    Encontra o 'cotovelo' da curva de inércia (algoritmo Kneedle): o k cujo ponto
+    normalizado está mais distante da reta que liga os extremos da curva.
+    """
+    x = np.asarray(k_values, dtype=float)
+    y = np.asarray(inertia, dtype=float)
+    x_norm = (x - x.min()) / (x.max() - x.min())
+    y_norm = (y - y.min()) / (y.max() - y.min()) if y.max() > y.min() else np.zeros_like(y)
+    # Curva decrescente e convexa: a reta entre os extremos é y = 1 - x
+    distance = (1.0 - x_norm) - y_norm
+    return int(x[np.argmax(distance)]), float(distance.max())
+
+def _gap_statistic(X_pca, k_values, inertia, n_references, backend, random_state=42):
+    """
+    Calcula a estatística Gap (Tibshirani et al., 2001) usando conjuntos de referência
+    uniformes na caixa delimitadora dos dados (já alinhada aos eixos do PCA).
+
+    Returns:
+        tuple: (gap, s_k) como arrays na ordem de k_values.
+    """
+    rng = np.random.default_rng(random_state)
+    low, high = X_pca.min(axis=0), X_pca.max(axis=0)
+    references = [rng.uniform(low, high, size=X_pca.shape) for _ in range(n_references)]
+
+    gap, s_k = [], []
+    for k, observed in zip(k_values, inertia):
+        log_reference = np.log([_make_kmeans(k, backend).fit(reference).inertia_ for reference in references])
+        gap.append(log_reference.mean() - np.log(observed))
+        s_k.append(log_reference.std() * np.sqrt(1.0 + 1.0 / n_references))
+    return np.array(gap), np.array(s_k)
+
+def select_optimal_k(sweep, strategy=None, X_pca=None, manual_k=None):
+    """
+    Escolhe o número de clusters a partir da varredura de k, sem precisar
+    rodar o pipeline novamente.
+
+    Estratégias:
+        - 'manual': usa manual_k (config.OPTIMAL_K).
+        - 'silhouette': maior pontuação média de silhueta.
+        - 'kneedle': cotovelo da curva de inércia (algoritmo Kneedle).
+        - 'gap': menor k com Gap(k) >= Gap(k+1) - s(k+1) (requer X_pca).
+        - 'calinski_harabasz': maior índice de Calinski-Harabasz.
+        - 'davies_bouldin': menor índice de Davies-Bouldin.
+
+    Args:
+        sweep (KSweepResult): Varredura de k calculada por run_k_sweep.
+        strategy (str, optional): Estratégia de escolha. Padrão: config.K_SELECTION_STRATEGY.
+        X_pca (numpy.ndarray, optional): Dados após PCA (necessário para 'gap').
+        manual_k (int, optional): k da estratégia 'manual'. Padrão: config.OPTIMAL_K.
+
+    Returns:
+        tuple: Contendo:
+            - int: O k escolhido.
+            - str: Justificativa da escolha (usada no relatório).
+    """
+
+    strategy = strategy or config.K_SELECTION_STRATEGY
+    if strategy not in K_SELECTION_STRATEGIES:
+        raise ValueError(f"Estratégia de escolha de k desconhecida: '{strategy}'. Use um de {K_SELECTION_STRATEGIES}.")
+
+    fitted_k = [k for k in sweep.k_values if k in sweep.models]
+    scores = None
+    if strategy in ('silhouette', 'calinski_harabasz', 'davies_bouldin'):
+        # Métrica de cada k ajustado (NaN, ex.: todo ajuste com um único cluster, é ignorado)
+        metric = getattr(sweep, strategy)
+        scores = {k: metric[k] for k in fitted_k if not np.isnan(metric[k])}
+    # Sem ao menos dois k ajustados (ou sem pontuações válidas) a estratégia não se aplica:
+    # volta ao k manual, como quando nenhum k foi ajustado
+    unavailable = None
+    if strategy != 'manual' and len(fitted_k) < 2:
+        unavailable = f"{len(fitted_k)} k ajustado(s) na varredura"
+    elif scores is not None and not scores:
+        unavailable = "nenhum k com pontuação válida"
+
+    if strategy == 'manual' or unavailable:
+        optimal_k = manual_k or config.OPTIMAL_K
+        reason = "definido manualmente em config.OPTIMAL_K"
+        if unavailable:
+            print(f"Aviso: Estratégia '{strategy}' sem dados suficientes ({unavailable}); usando config.OPTIMAL_K.")
+            reason = f"definido em config.OPTIMAL_K; a estratégia '{strategy}' não se aplica: {unavailable}"
+    elif strategy == 'silhouette':
+        optimal_k = max(scores, key=scores.get)
+        reason = f"maior pontuação de silhueta ({scores[optimal_k]:.4f})"
+    elif strategy == 'kneedle':
+        optimal_k, distance = _kneedle_k(fitted_k, [sweep.inertia[k] for k in fitted_k])
+        reason = f"cotovelo da curva de inércia pelo algoritmo Kneedle (distância normalizada {distance:.3f})"
+    elif strategy == 'gap':
+        if X_pca is None:
+            raise ValueError("A estratégia 'gap' requer os dados X_pca.")
+        gap, s_k = _gap_statistic(X_pca, fitted_k, [sweep.inertia[k] for k in fitted_k],
+                                  config.GAP_N_REFERENCES, sweep.backend)
+        candidates = [i for i in range(len(fitted_k) - 1) if gap[i] >= gap[i + 1] - s_k[i + 1]]
+        index = candidates[0] if candidates else int(np.argmax(gap))
+        optimal_k = fitted_k[index]
+        reason = (f"estatística Gap ({config.GAP_N_REFERENCES} referências uniformes): "
+                  f"menor k com Gap(k) >= Gap(k+1) - s(k+1), Gap={gap[index]:.4f}")
+    elif strategy == 'calinski_harabasz':
+        optimal_k = max(scores, key=scores.get)
+        reason = f"maior índice de Calinski-Harabasz ({scores[optimal_k]:.2f})"
+    else:
+        optimal_k = min(scores, key=scores.get)
+        reason = f"menor índice de Davies-Bouldin ({scores[optimal_k]:.4f})"
+
+    print(f"\nNúmero de clusters escolhido: k={optimal_k} ({reason}).")
+    return optimal_k, reason
+
+def plot_elbow_method(X_pca, k_range, filename, sweep=None):
     """
     Calcula e plota a inércia para diferentes valores de 'k' (Método do Cotovelo).
 
@@ -21,29 +354,30 @@ def plot_elbow_method(X_pca, k_range, filename):
         X_pca (numpy.ndarray): Dados após PCA.
         k_range (range): Intervalo de valores de 'k' a testar.
         filename (str): Nome do arquivo para salvar o gráfico.
+        sweep (KSweepResult, optional): Varredura já calculada por run_k_sweep.
     """
 
-    inertia = []
+    if sweep is None:
+        sweep = run_k_sweep(X_pca, k_range)
+    inertia = sweep.inertia_list()
     print("\n--- Calculando Inércia (Método do Cotovelo) ---")
-    for k in k_range:
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto') # n_init='auto' é o padrão moderno
-        kmeans.fit(X_pca)
-        inertia.append(kmeans.inertia_)
-        print(f"  k={k}, Inércia={kmeans.inertia_:.2f}")
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(k_range, inertia, marker='o', linestyle='--')
-    plt.xlabel('Número de Clusters (k)')
-    plt.ylabel('Inércia (WSS)')
-    plt.title('Método do Cotovelo para Determinar k Ótimo')
-    plt.xticks(list(k_range))
-    plt.grid(True)
+    for k, value in zip(sweep.k_values, inertia):
+        print(f"  k={k}, Inércia={value:.2f}")
+
+    # API orientada a objetos (Agg), sem o estado global do pyplot
+    fig = plotting.new_figure((10, 6))
+    ax = fig.add_subplot()
+    ax.plot(sweep.k_values, inertia, marker='o', linestyle='--')
+    ax.set_xlabel('Número de Clusters (k)')
+    ax.set_ylabel('Inércia (WSS)')
+    ax.set_title('Método do Cotovelo para Determinar k Ótimo')
+    ax.set_xticks(sweep.k_values)
+    ax.grid(True)
  
-    plt.savefig(filename)
+    fig.savefig(filename)
     print(f"Gráfico do Método do Cotovelo salvo como '{filename}'")
-    plt.close()
 
-def plot_silhouette_scores(X_pca, k_range, filename):
+def plot_silhouette_scores(X_pca, k_range, filename, sweep=None):
     """
     Calcula e plota a Pontuação de Silhueta para diferentes valores de 'k'.
 
@@ -51,72 +385,250 @@ def plot_silhouette_scores(X_pca, k_range, filename):
         X_pca (numpy.ndarray): Dados após PCA.
         k_range (range): Intervalo de valores de 'k' a testar.
         filename (str): Nome do arquivo para salvar o gráfico.
+        sweep (KSweepResult, optional): Varredura já calculada por run_k_sweep.
     """
 
-    silhouette_scores = []
+    if sweep is None:
+        sweep = run_k_sweep(X_pca, k_range)
+    silhouette_scores = sweep.silhouette_list()
     print("\n--- Calculando Pontuação de Silhueta ---")
-    for k in k_range:
-        # Garante que k seja menor que o número de amostras
-        if k >= X_pca.shape[0]:
-            print(f"  Aviso: k={k} é maior ou igual ao número de amostras ({X_pca.shape[0]}). Pulando.")
-            silhouette_scores.append(np.nan)
+    for k, silhouette_avg in zip(sweep.k_values, silhouette_scores):
+        if k not in sweep.inertia:
             continue
-
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
-        cluster_labels = kmeans.fit_predict(X_pca)
-        # Evita erro se apenas um cluster for formado ou previsto
-        if len(np.unique(cluster_labels)) < 2:
-            print(f"  Aviso: Apenas {len(np.unique(cluster_labels))} cluster(s) encontrado(s) para k={k}. Pontuação de Silhueta não aplicável.")
-            silhouette_scores.append(np.nan) # Ou algum valor indicativo como -1
+        ci_low, ci_high = sweep.silhouette_ci.get(k, (np.nan, np.nan))
+        if np.isnan(silhouette_avg):
+            print(f"  Aviso: Apenas 1 cluster encontrado para k={k}. Pontuação de Silhueta não aplicável.")
+        elif not np.isnan(ci_low):
+            print(f"  k={k}, Pontuação de Silhueta={silhouette_avg:.4f} (IC: {ci_low:.4f} a {ci_high:.4f})")
         else:
-            silhouette_avg = silhouette_score(X_pca, cluster_labels)
-            silhouette_scores.append(silhouette_avg)
             print(f"  k={k}, Pontuação de Silhueta={silhouette_avg:.4f}")
 
-    plt.figure(figsize=(10, 6))
-    plt.plot(k_range, silhouette_scores, marker='o', linestyle='--')
-    plt.xlabel('Número de Clusters (k)')
-    plt.ylabel('Pontuação Média de Silhueta')
-    plt.title('Análise da Pontuação de Silhueta para Determinar k Ótimo')
-    plt.xticks(list(k_range))
-    plt.grid(True)
+    fig = plotting.new_figure((10, 6))
+    ax = fig.add_subplot()
+    ax.plot(sweep.k_values, silhouette_scores, marker='o', linestyle='--')
+    if sweep.silhouette_mode == 'sample':
+        # Faixa do intervalo de confiança da estimativa amostral
+        bounds = np.array([sweep.silhouette_ci.get(k, (np.nan, np.nan)) for k in sweep.k_values])
+        ax.fill_between(sweep.k_values, bounds[:, 0], bounds[:, 1], alpha=0.2)
+    ax.set_xlabel('Número de Clusters (k)')
+    ax.set_ylabel(f'Pontuação Média de Silhueta ({SILHOUETTE_MODE_LABELS[sweep.silhouette_mode]})')
+    ax.set_title('Análise da Pontuação de Silhueta para Determinar k Ótimo')
+    ax.set_xticks(sweep.k_values)
+    ax.grid(True)
     try:
-        plt.savefig(filename)
+        fig.savefig(filename)
         print(f"Gráfico da Pontuação de Silhueta salvo como '{filename}'")
     except Exception as e:
         print(f"Erro ao salvar gráfico da Silhueta: {e}")
-    plt.close()
 
-def apply_kmeans(X_pca, optimal_k):
+def apply_kmeans(X_pca, optimal_k, sweep=None, backend=None):
     """
     Aplica o algoritmo K-Means aos dados com o número ótimo de clusters.
 
     Args:
         X_pca (numpy.ndarray): Dados após PCA.
         optimal_k (int): Número de clusters a serem formados.
+        sweep (KSweepResult, optional): Varredura de k; se já contiver optimal_k
+                                        ajustado com o mesmo backend, o modelo é reutilizado.
+        backend (str, optional): 'kmeans' ou 'minibatch'. Padrão: config.CLUSTERING_BACKEND.
 
     Returns:
         tuple: Contendo:
             - numpy.ndarray: Array com os rótulos de cluster para cada modelo.
-            - sklearn.cluster.KMeans: O objeto KMeans ajustado.
+            - sklearn.cluster.KMeans: O objeto KMeans (ou MiniBatchKMeans) ajustado.
     """
 
-    kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init='auto')
-    cluster_labels = kmeans.fit_predict(X_pca)
-    print(f"\nK-Means aplicado com k={optimal_k}.")
+    backend = backend or config.CLUSTERING_BACKEND
+    if sweep is not None and sweep.backend == backend and optimal_k in sweep.models:
+        kmeans = sweep.models[optimal_k]
+        cluster_labels = sweep.labels[optimal_k]
+        print(f"\nK-Means com k={optimal_k} reaproveitado da varredura de k.")
+    else:
+        kmeans = _make_kmeans(optimal_k, backend)
+        cluster_labels = kmeans.fit_predict(X_pca)
+        print(f"\nK-Means ({backend}) aplicado com k={optimal_k}.")
     return cluster_labels, kmeans
 
-def analyze_clusters(df_with_clusters, X_scaled_with_clusters, kmeans_model, scaler, pca, parameter_columns):
+def _make_hdbscan(min_cluster_size, min_samples):
+    """
+    HDBSCAN com árvore geradora mínima de Borůvka sobre KD-tree (pacote opcional
+    hdbscan, custo próximo de n log n em poucas dimensões) ou, sem ele, o
+    sklearn.cluster.HDBSCAN (KD-tree só nas distâncias de núcleo; a árvore
+    geradora mínima pelo algoritmo de Prim custa O(n²)).
+    """
+    try:
+        import hdbscan
+        return hdbscan.HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples,
+                               algorithm='boruvka_kdtree')
+    except ImportError:
+        from sklearn.cluster import HDBSCAN
+        print("Aviso: pacote hdbscan não instalado; usando sklearn.cluster.HDBSCAN "
+              "(tempo quadrático no número de modelos).")
+        return HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples, algorithm='kd_tree', copy=True)
+
+def apply_density_clustering(X_pca, backend=None):
+    """
+    Agrupa os modelos por densidade, sem escolher k: HDBSCAN (clusters de
+    densidades diferentes; config.DENSITY_MIN_CLUSTER_SIZE e DENSITY_MIN_SAMPLES)
+    ou DBSCAN (raio fixo config.DBSCAN_EPS). As vizinhanças são consultadas em um
+    KD-tree, com custo próximo de n log n nas poucas dimensões do PCA (no
+    HDBSCAN, com o pacote opcional hdbscan; ver _make_hdbscan).
+
+    Se todos os modelos forem classificados como ruído, emite um aviso e volta
+    ao K-Means com k = config.OPTIMAL_K (sem varredura de k).
+
+    Args:
+        X_pca (numpy.ndarray): Dados após PCA.
+        backend (str, optional): 'hdbscan' ou 'dbscan'. Padrão: config.CLUSTERING_BACKEND.
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Rótulo de cada modelo (NOISE_LABEL para ruído).
+            - DensityClustering: O modelo ajustado (ou o KMeans, se tudo foi ruído).
+    """
+    from sklearn.cluster import DBSCAN # Importado sob demanda (início mais rápido)
+
+    backend = backend or config.CLUSTERING_BACKEND
+    min_cluster_size = density_min_cluster_size(len(X_pca))
+    min_samples = config.DENSITY_MIN_SAMPLES or min_cluster_size
+    if backend == 'hdbscan':
+        estimator = _make_hdbscan(min_cluster_size, min_samples)
+    elif backend == 'dbscan':
+        estimator = DBSCAN(eps=config.DBSCAN_EPS, min_samples=min_samples, algorithm='kd_tree')
+    else:
+        raise ValueError(f"Backend por densidade desconhecido: '{backend}'. Use um de {DENSITY_BACKENDS}.")
+
+    start = time.perf_counter()
+    X_pca = np.asarray(X_pca, dtype=np.float64)
+    cluster_labels = estimator.fit_predict(X_pca)
+    n_clusters = int(cluster_labels.max()) + 1
+    if n_clusters == 0:
+        print(f"Aviso: O {backend.upper()} classificou todos os modelos como ruído; usando o K-Means com "
+              f"k={config.OPTIMAL_K} (OPTIMAL_K). Reduza DENSITY_MIN_CLUSTER_SIZE/DENSITY_MIN_SAMPLES "
+              "(ou aumente DBSCAN_EPS) para agrupar por densidade.")
+        return apply_kmeans(X_pca, config.OPTIMAL_K, backend='kmeans')
+
+    clustered = cluster_labels != NOISE_LABEL
+    counts = np.bincount(cluster_labels[clustered], minlength=n_clusters)
+    centers = np.zeros((n_clusters, X_pca.shape[1]))
+    np.add.at(centers, cluster_labels[clustered], X_pca[clustered])
+    centers /= counts[:, None]
+    # Silhueta só dos modelos agrupados (NaN com um único cluster)
+    silhouette = compute_silhouette(X_pca[clustered], cluster_labels[clustered], centers=centers).score
+    model = DensityClustering(estimator=estimator, labels_=cluster_labels, cluster_centers_=centers,
+                              backend=backend, silhouette=silhouette, seconds=time.perf_counter() - start,
+                              min_cluster_size=min_cluster_size, min_samples=min_samples)
+    print(f"\n{type(estimator).__name__} aplicado: {n_clusters} clusters e {model.n_noise} modelos de ruído "
+          f"({model.n_noise / len(X_pca):.1%}), em {model.seconds:.2f} s.")
+    return cluster_labels, model
+
+def fit_minibatch_kmeans_stream(chunk_source, optimal_k, transform=None):
+    """
+    Ajusta um MiniBatchKMeans consumindo blocos de dados (ex.: de data_loader.iter_data_chunks),
+    sem nunca materializar o conjunto completo.
+
+    Uma primeira passada ajusta o modelo (partial_fit); uma segunda atribui o
+    cluster de cada linha de todos os blocos (predict), de modo que labels_ e
+    inertia_ se referem ao conjunto completo, como em apply_kmeans.
+
+    Args:
+        chunk_source (callable): Função sem argumentos que retorna um novo iterador de
+                                 blocos (numpy.ndarray ou pandas.DataFrame).
+        optimal_k (int): Número de clusters a serem formados.
+        transform (callable, optional): Função aplicada a cada bloco antes do ajuste
+                                        (ex.: escalonamento + PCA já ajustados).
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Rótulos de cluster de todas as linhas, na ordem dos blocos.
+            - sklearn.cluster.MiniBatchKMeans: O modelo ajustado.
+    """
+
+    def _blocks():
+        for chunk in chunk_source():
+            yield np.asarray(transform(chunk) if transform is not None else chunk)
+
+    model = _make_kmeans(optimal_k, 'minibatch')
+    pending = None
+    n_rows = 0
+    for X_chunk in _blocks():
+        # partial_fit exige pelo menos k linhas: blocos pequenos são acumulados
+        pending = X_chunk if pending is None else np.vstack([pending, X_chunk])
+        if len(pending) >= optimal_k:
+            model.partial_fit(pending)
+            n_rows += len(pending)
+            pending = None
+    if pending is not None:
+        if not hasattr(model, 'cluster_centers_') and len(pending) < optimal_k:
+            raise ValueError(f"Dados insuficientes para formar {optimal_k} clusters.")
+        model.partial_fit(pending)
+        n_rows += len(pending)
+
+    # Segunda passada: rótulos e inércia de todas as linhas
+    labels = []
+    inertia = 0.0
+    for X_chunk in _blocks():
+        chunk_labels = model.predict(X_chunk)
+        inertia += float(((X_chunk - model.cluster_centers_[chunk_labels]) ** 2).sum())
+        labels.append(chunk_labels)
+    model.labels_ = np.concatenate(labels) if labels else np.empty(0, dtype=np.int32)
+    model.inertia_ = inertia
+    print(f"\nMiniBatchKMeans ajustado em blocos com k={optimal_k} ({n_rows} linhas).")
+    return model.labels_, model
+
+def evaluate_clustering_quality(X_pca, model, sample_size=None, random_state=42):
+    """
+    Compara o modelo ajustado com um K-Means completo ajustado em uma amostra,
+    para medir a perda de qualidade de backends aproximados (ex.: MiniBatchKMeans).
+
+    Args:
+        X_pca (numpy.ndarray): Dados após PCA.
+        model: Modelo ajustado, com cluster_centers_ e predict.
+        sample_size (int, optional): Tamanho da amostra. Padrão: config.QUALITY_SAMPLE_SIZE.
+        random_state (int): Semente da amostragem e do K-Means de referência.
+
+    Returns:
+        dict: 'sample_size', 'inertia_model', 'inertia_full', 'inertia_increase'
+              (aumento relativo da inércia em relação ao K-Means completo) e
+              'adjusted_rand' (concordância entre os rótulos dos dois modelos).
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+
+    sample_size = min(sample_size or config.QUALITY_SAMPLE_SIZE, len(X_pca))
+    rng = np.random.default_rng(random_state)
+    X_sample = X_pca[rng.choice(len(X_pca), size=sample_size, replace=False)]
+
+    reference = KMeans(n_clusters=model.n_clusters, random_state=random_state, n_init='auto').fit(X_sample)
+    labels_model = model.predict(X_sample)
+    inertia_model = float(-model.score(X_sample))
+    inertia_full = float(-reference.score(X_sample))
+    quality = {
+        'sample_size': sample_size,
+        'inertia_model': inertia_model,
+        'inertia_full': inertia_full,
+        'inertia_increase': inertia_model / inertia_full - 1.0 if inertia_full > 0 else 0.0,
+        'adjusted_rand': float(adjusted_rand_score(reference.labels_, labels_model)),
+    }
+    print(f"\n--- Qualidade do Clustering vs. K-Means Completo (amostra de {sample_size}) ---")
+    print(f"  Aumento relativo da inércia: {quality['inertia_increase']*100:.2f}%")
+    print(f"  Índice de Rand ajustado: {quality['adjusted_rand']:.4f}")
+    return quality
+
+def analyze_clusters(df_with_clusters, X_scaled_with_clusters, kmeans_model, scaler, pca, parameter_columns,
+                     stability=None):
     """
     Analisa os clusters formados, calculando tamanhos e centróides.
 
     Args:
         df_with_clusters (pd.DataFrame): DataFrame original com a coluna 'Cluster'.
-        X_scaled_with_clusters (pd.DataFrame): DataFrame escalado com a coluna 'Cluster'.
+        X_scaled_with_clusters (numpy.ndarray or pd.DataFrame): Parâmetros escalados dos mesmos modelos.
         kmeans_model (KMeans): Modelo KMeans ajustado.
         scaler (StandardScaler): Scaler ajustado.
         pca (PCA): Modelo PCA ajustado.
         parameter_columns (list): Lista dos nomes das colunas de parâmetros.
+        stability (pd.DataFrame, optional): Estabilidade por cluster do clustering de
+                                            consenso (consensus.ConsensusResult.stability).
 
     Returns:
         pd.DataFrame: DataFrame com os centróides no espaço original dos parâmetros.
@@ -127,29 +639,100 @@ def analyze_clusters(df_with_clusters, X_scaled_with_clusters, kmeans_model, sca
     print("\n--- Tamanho de Cada Cluster ---")
     cluster_counts = df_with_clusters['Cluster'].value_counts().sort_index()
     print(cluster_counts)
+    if stability is not None:
+        print("\n--- Estabilidade dos Clusters (Consenso) ---")
+        print(stability)
 
-    # Centróides (revertendo PCA e escalonamento)
     print("\n--- Centróides dos Clusters (Valores Médios dos Parâmetros Originais) ---")
-    centroids_pca = kmeans_model.cluster_centers_
-    centroids_scaled = pca.inverse_transform(centroids_pca) # Reverte PCA
-    centroids_original = scaler.inverse_transform(centroids_scaled) # Reverte escalonamento
-    centroid_df = pd.DataFrame(centroids_original, columns=parameter_columns)
-    centroid_df.index.name = 'Cluster'
+    if isinstance(kmeans_model, DensityClustering):
+        # Clusters por densidade: média dos parâmetros originais dos membros (o ruído fica de fora)
+        members = df_with_clusters[df_with_clusters['Cluster'] != NOISE_LABEL]
+        centroid_df = members.groupby('Cluster')[parameter_columns].mean()
+    else:
+        # Centróides (revertendo PCA e escalonamento)
+        centroids_pca = kmeans_model.cluster_centers_
+        centroids_scaled = pca.inverse_transform(centroids_pca) # Reverte PCA
+        centroids_original = scaler.inverse_transform(centroids_scaled) # Reverte escalonamento
+        centroid_df = pd.DataFrame(centroids_original, columns=parameter_columns)
+        centroid_df.index.name = 'Cluster'
     print(centroid_df)
 
     return centroid_df
 
 
-def analyze_of_by_cluster(df_with_clusters, of_column):
+def _merge_of_moments(acc, chunk_stats):
+    """
+    Combina estatísticas parciais (count, mean, M2, min, max) por cluster
+    usando a fórmula de Chan et al. para média e variância em paralelo.
+    """
+    if acc is None:
+        return chunk_stats
+    acc, chunk_stats = acc.align(chunk_stats, join='outer', axis=0)
+    n_a = acc['count'].fillna(0)
+    n_b = chunk_stats['count'].fillna(0)
+    n = n_a + n_b
+    delta = chunk_stats['mean'].fillna(0) - acc['mean'].fillna(0)
+    merged = pd.DataFrame(index=acc.index)
+    merged['count'] = n
+    merged['mean'] = (acc['mean'].fillna(0) * n_a + chunk_stats['mean'].fillna(0) * n_b) / n
+    merged['M2'] = acc['M2'].fillna(0) + chunk_stats['M2'].fillna(0) + delta ** 2 * n_a * n_b / n
+    merged['min'] = pd.concat([acc['min'], chunk_stats['min']], axis=1).min(axis=1)
+    merged['max'] = pd.concat([acc['max'], chunk_stats['max']], axis=1).max(axis=1)
+    return merged
+
+def describe_of_moments(acc, sketches):
+    """
+    Monta a tabela de DataFrame.describe() (mesmas colunas e ordem) a partir das
+    estatísticas combinadas por _merge_of_moments e dos esboços KLL de cada cluster.
+
+    Args:
+        acc (pd.DataFrame): count, mean, M2, min e max por cluster.
+        sketches (dict): Cluster -> KLLSketch da OF (quartis estimados).
+
+    Returns:
+        pd.DataFrame: Estatísticas da OF por cluster.
+    """
+    acc = acc.sort_index()
+    quartiles = np.array([sketches[cluster].quantile([0.25, 0.5, 0.75]) for cluster in acc.index])
+    of_stats = pd.DataFrame(index=acc.index)
+    of_stats['count'] = acc['count'].astype(float)
+    of_stats['mean'] = acc['mean']
+    of_stats['std'] = np.sqrt(acc['M2'] / (acc['count'] - 1)).where(acc['count'] > 1)
+    of_stats['min'] = acc['min']
+    of_stats['25%'] = quartiles[:, 0]
+    of_stats['50%'] = quartiles[:, 1]
+    of_stats['75%'] = quartiles[:, 2]
+    of_stats['max'] = acc['max']
+    return of_stats
+
+def analyze_of_by_cluster(df_with_clusters, of_column, chunks=None):
     """
     Calcula e exibe estatísticas da Função Objetivo ('OF Value') para cada cluster.
 
+    Com o DataFrame em memória, as estatísticas são as exatas de describe(). Só
+    para dados lidos em blocos (que não cabem em memória) elas são acumuladas
+    bloco a bloco, com quartis estimados por esboços KLL.
+
     Args:
-        df_with_clusters (pd.DataFrame): DataFrame com a coluna 'Cluster'.
+        df_with_clusters (pd.DataFrame): DataFrame com a coluna 'Cluster' (ignorado com chunks).
         of_column (str): Nome da coluna da Função Objetivo.
+        chunks (iterable, optional): Blocos (pd.DataFrame com 'Cluster' e of_column)
+                                     lidos em sequência, ex.: de data_loader.iter_data_chunks.
     """
 
     print(f"\n--- Estatísticas da '{of_column}' por Cluster ---")
-    of_stats = df_with_clusters.groupby('Cluster')[of_column].describe()
+    if chunks is not None:
+        acc = None
+        sketches = {}
+        for chunk in chunks:
+            grouped = chunk.groupby('Cluster')[of_column]
+            chunk_stats = grouped.agg(['count', 'mean', 'min', 'max'])
+            chunk_stats['M2'] = grouped.var(ddof=0) * chunk_stats['count']
+            acc = _merge_of_moments(acc, chunk_stats)
+            for cluster, values in grouped:
+                sketches.setdefault(cluster, KLLSketch(config.QUANTILE_SKETCH_ERROR)).update(values.to_numpy())
+        of_stats = describe_of_moments(acc, sketches)
+    else:
+        of_stats = df_with_clusters.groupby('Cluster')[of_column].describe()
     print(of_stats)
     return of_stats
\ No newline at end of file
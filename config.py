@@ -2,35 +2,287 @@
 """
 Arquivo de configuração para a análise de calibração.
 Armazena constantes como nomes de arquivos, parâmetros de análise e nomes de gráficos.
+
+Importar este módulo não tem efeitos colaterais: os valores abaixo são os
+padrões, o diretório de resultados e os caminhos de saída são derivados de
+INPUT_FILE sob demanda (sem criar diretórios) e só ensure_results_dir() cria
+o diretório. Os padrões podem ser alterados em tempo de execução por
+update(), por um arquivo JSON/TOML, por variáveis de ambiente com o prefixo
+CALIB_ (ex.: CALIB_N_JOBS=4) ou pela linha de comando de main.py,
+batch_runner.py e sharding.py (--config arquivo.toml --set OPTIMAL_K=6).
 """
 
 import os
+import ast
+import json
 
 # --- Arquivos de Entrada/Saída ---
 INPUT_FILE = '5_well_7param_RangeMaior_35x40.xlsx'
+# O diretório de resultados e todos os caminhos de saída, de cache e de gráficos
+# são derivados de INPUT_FILE sob demanda (ver __getattr__ e configure()).
+
+# --- Cache dos Dados Carregados ---
+USE_DATA_CACHE = True         # False força a releitura do Excel a cada execução
 
-# Diretório de resultados baseado no nome do arquivo de entrada
-_input_stem = os.path.splitext(os.path.basename(INPUT_FILE))[0]
-RESULTS_DIR = f"results_{_input_stem}"
-os.makedirs(RESULTS_DIR, exist_ok=True)
+# --- Cache das Etapas do Pipeline ---
+USE_STAGE_CACHE = True        # Reaproveita filtragem, PCA, varredura de k e K-Means de execuções anteriores
+STAGE_CACHE_MAX_BYTES = 2 * 1024**3 # Tamanho máximo do cache de etapas (2 GB)
+STAGE_CACHE_MAX_AGE_DAYS = 30 # Entradas não usadas há mais tempo são removidas
 
-# Arquivos de saída (Excel e relatório) dentro do diretório de resultados
-OUTPUT_CLUSTER_RESULTS = os.path.join(RESULTS_DIR, 'simulacoes_por_cluster.xlsx')
-OUTPUT_BEST_PER_CLUSTER = os.path.join(RESULTS_DIR, 'melhores_simulacoes_por_grupo.xlsx')
-OUTPUT_REPORT = os.path.join(RESULTS_DIR, 'relatorio_analise_calibracao.md')
+# --- Leitura em Blocos (ensembles maiores que a memória) ---
+STREAMING_CHUNK_SIZE = None   # Ex.: 100_000 para processar o arquivo em blocos de linhas
+
+# --- Representação dos Dados ---
+DATA_DTYPE = 'float32'        # Tipo da matriz de parâmetros dos melhores modelos ('float64' para precisão dupla)
 
 # --- Parâmetros da Análise ---
 BEST_MODEL_PERCENTILE = 0.30  # Percentil para selecionar os melhores modelos (30%)
+QUANTILE_METHOD = 'exact'     # 'exact' (np.partition) ou 'sketch' (esboço KLL, uma passada)
+QUANTILE_SKETCH_ERROR = 0.001 # Erro de posto aproximado do esboço KLL (0,1%)
+SELECTION_MODE = 'percentile' # 'percentile' (OF abaixo do percentil) ou 'pareto' (frentes de Pareto de OBJECTIVE_COLUMNS)
+OBJECTIVE_COLUMNS = None      # Desajustes minimizados no modo 'pareto' (ex.: um por poço). None = ['OF Value']
+PARETO_TARGET_COUNT = None    # Modelos selecionados no modo 'pareto' (None = BEST_MODEL_PERCENTILE do ensemble)
 PCA_VARIANCE_THRESHOLD = 0.95 # Variância a ser mantida pelo PCA (95%)
+PCA_ENGINE = 'full'           # 'full' (SVD completo) ou 'incremental' (scaler e IncrementalPCA em lotes)
+PCA_BATCH_SIZE = 10_000       # Linhas por lote no modo 'incremental'
 K_RANGE = range(2, 11)        # Intervalo de 'k' para testar no Elbow/Silhouette
 OPTIMAL_K = 10                 # Número de clusters escolhido (baseado na sua análise)
+K_SELECTION_STRATEGY = 'manual' # 'manual' (usa OPTIMAL_K), 'silhouette', 'kneedle', 'gap',
+                                # 'calinski_harabasz' ou 'davies_bouldin' (escolha automática)
+GAP_N_REFERENCES = 5          # Conjuntos de referência da estatística Gap
+N_JOBS = None                 # Processos na varredura de k (None = todos os núcleos, 1 = sequencial)
+CLUSTERING_BACKEND = 'kmeans' # 'kmeans' (K-Means completo), 'minibatch' (MiniBatchKMeans) ou, sem
+                              # varredura de k e com ruído (-1), 'hdbscan' ou 'dbscan' (por densidade)
+MINIBATCH_SIZE = 4096         # Tamanho dos mini-lotes do MiniBatchKMeans
+DENSITY_MIN_CLUSTER_SIZE = None # HDBSCAN: menor número de modelos de um cluster (None = 1% dos modelos, mínimo 5)
+DENSITY_MIN_SAMPLES = None    # Vizinhos na estimativa de densidade (HDBSCAN e DBSCAN; None = DENSITY_MIN_CLUSTER_SIZE)
+DBSCAN_EPS = 0.5              # DBSCAN: raio da vizinhança (espaço PCA)
+QUALITY_SAMPLE_SIZE = 10_000  # Amostra usada para comparar o 'minibatch' com o K-Means completo
+
+# --- Pontuação de Silhueta ---
+SILHOUETTE_MODE = 'exact'     # 'exact' (em blocos), 'sample' (amostra estratificada) ou 'simplified' (centróides)
+SILHOUETTE_SAMPLE_SIZE = 5000 # Pontos sorteados no modo 'sample'
+SILHOUETTE_CONFIDENCE = 0.95  # Nível do intervalo de confiança no modo 'sample'
+SILHOUETTE_BLOCK_BYTES = 64 * 1024**2 # Memória máxima de cada bloco da matriz de distâncias
+
+# --- Índice Espacial (quase-duplicados e campeões diversos, ver spatial_index.py) ---
+DUPLICATE_RADIUS = None       # Raio (espaço PCA) para unir simulações quase idênticas antes do k e do K-Means (None = desativado)
+CHAMPIONS_PER_CLUSTER = 1     # Modelos representativos ('campeões') por cluster
+CHAMPION_MIN_DISTANCE = None  # Distância mínima (espaço PCA) entre quaisquer dois campeões (None = sem restrição)
+
+# --- Sensibilidade dos Parâmetros ---
+SENSITIVITY_ANALYSIS = True   # Correlações de Spearman, OF por faixas, ANOVA/Kruskal entre clusters e cargas do PCA
+SENSITIVITY_BINS = 10         # Faixas de igual frequência por parâmetro na OF condicional
+
+# --- Clustering de Consenso ---
+CONSENSUS_MODE = False        # Rótulos por votação de várias execuções do K-Means (ver consensus.py)
+CONSENSUS_RUNS = 100          # Número de execuções (sementes/subamostras), distribuídas entre N_JOBS processos
+CONSENSUS_SAMPLE_FRACTION = 0.8 # Fração das linhas usada no ajuste de cada execução (1.0 = só muda a semente)
+
+# --- Modo Incremental (simulações acrescentadas ao mesmo arquivo) ---
+INCREMENTAL_MODE = False      # Reaproveita scaler, PCA e modelo da última execução e só atribui os modelos novos
+INCREMENTAL_MAX_NEW_FRACTION = 0.5  # Acima desta fração de linhas novas, faz o ajuste completo
+INCREMENTAL_DRIFT_THRESHOLD = 0.25  # Desvio máximo das médias/escalas dos parâmetros (em desvios padrão)
+INCREMENTAL_QUALITY_TOLERANCE = 0.10 # Aumento relativo máximo da inércia média antes do ajuste completo
+
+# --- Execução em Shards (vários processos ou nós, ver sharding.py) ---
+SHARD_COUNT = 8               # Partes (shards) em que as linhas do ensemble são divididas
+SHARD_EXECUTOR = 'process'    # 'process' (pool de processos local) ou 'dask' (cluster Dask local ou remoto)
+SHARD_WORKERS = None          # Processos/workers locais (None = todos os núcleos, 1 = sequencial)
+SHARD_SCHEDULER_ADDRESS = None # Scheduler Dask já em execução (ex.: 'tcp://10.0.0.5:8786'); None = cluster local
+SHARD_CHUNK_SIZE = 100_000    # Linhas por bloco lidas por cada worker
+SHARD_SAMPLE_SIZE = 20_000    # Amostra uniforme dos melhores modelos (escolha de k e início do K-Means)
+SHARD_KMEANS_MAX_ITER = 100   # Iterações máximas do K-Means distribuído
+SHARD_KMEANS_TOL = 1e-4       # Deslocamento dos centróides (relativo à variância) que encerra as iterações
+
+# --- Pacote do Modelo (classificação de novas simulações sem rodar o pipeline) ---
+SAVE_MODEL_BUNDLE = True      # Salva scaler + PCA + centróides em MODEL_BUNDLE_DIR (ver model_bundle.py)
+MODEL_BUNDLE_DTYPE = 'float64' # Dtype dos arrays do pacote ('float32' reduz o tamanho pela metade)
+
+# --- Arquivos de Resultados ---
+OUTPUT_FORMAT = 'parquet'     # Resultados por simulação: 'parquet' (zstd) ou 'csv.gz'
+OUTPUT_CHUNK_SIZE = 100_000   # Linhas gravadas por bloco
+WRITE_EXCEL = True            # Também grava os melhores modelos em Excel (mais lento)
+EXCEL_MAX_ROWS = 100_000      # Máximo de linhas no Excel (None = sem limite)
+
+# --- Medição de Desempenho ---
+PROFILE_MODE = None           # None, 'cprofile' (um .prof por etapa) ou 'tracemalloc' (pico de alocação do Python)
+
+# --- Gráficos ---
+PLOT_N_JOBS = None            # Processos para renderizar os gráficos (None = um por gráfico, 1 = sequencial)
+BOXPLOT_QUANTILE_THRESHOLD = 50_000 # Acima deste nº de modelos, boxplots usam quartis pré-calculados
+SCATTER_DENSITY_THRESHOLD = 200_000 # Acima deste nº de pontos, dispersões viram histogramas 2D (None desativa)
+SCATTER_DENSITY_BINS = (500, 300)   # Resolução (pixels x, y) dos histogramas 2D
+
+# Nomes das configurações que podem ser alteradas em tempo de execução
+SETTING_NAMES = tuple(name for name in list(globals()) if name.isupper())
+
+ENV_PREFIX = 'CALIB_' # Prefixo das variáveis de ambiente lidas por load_overrides
+
+# Diretório de resultados definido por configure(); None = 'results_<nome do arquivo>'
+_results_dir = None
+
+# Caminhos derivados do diretório de resultados, resolvidos a cada acesso
+_RESULT_PATHS = {
+    # Arquivos de saída (Excel e relatório)
+    'OUTPUT_CLUSTER_RESULTS': 'simulacoes_por_cluster.xlsx',
+    'OUTPUT_BEST_PER_CLUSTER': 'melhores_simulacoes_por_grupo.xlsx',
+    'OUTPUT_REPORT': 'relatorio_analise_calibracao.md',
+    # Caches dos dados limpos (Parquet) e das etapas do pipeline
+    'DATA_CACHE_DIR': 'cache',
+    'STAGE_CACHE_DIR': os.path.join('cache', 'stages'),
+    # Tabelas da análise de sensibilidade (SENSITIVITY_ANALYSIS)
+    'OUTPUT_SENSITIVITY': 'sensibilidade_parametros.csv',
+    'OUTPUT_SENSITIVITY_BINS': 'sensibilidade_faixas.csv',
+    # Pacote do modelo ajustado (SAVE_MODEL_BUNDLE)
+    'MODEL_BUNDLE_DIR': 'modelo',
+    # Estado do modo incremental (INCREMENTAL_MODE)
+    'INCREMENTAL_STATE_FILE': 'modelo_incremental.pkl',
+    # Execução em shards (sharding.py): melhores modelos, pacote do modelo e medidas em SHARD_DIR;
+    # tabelas consolidadas no diretório de resultados
+    'SHARD_DIR': 'shards',
+    'OUTPUT_SHARDED_SUMMARY': 'resumo_shards.json',
+    'OUTPUT_SHARDED_OF_STATS': 'estatisticas_of_por_cluster_shards.csv',
+    'OUTPUT_SHARDED_CENTROIDS': 'centroides_shards.csv',
+    'OUTPUT_SHARDED_CHAMPIONS': 'melhores_simulacoes_por_grupo_shards.csv',
+    # Medidas de desempenho por etapa e perfis (PROFILE_MODE)
+    'OUTPUT_PERFORMANCE_JSON': 'desempenho.json',
+    'OUTPUT_PERFORMANCE_CSV': 'desempenho.csv',
+    'PROFILE_DIR': 'perfil',
+    # Gráficos
+    'PLOT_OF_SCATTER': 'grafico_dispersao_OF.png',
+    'PLOT_ELBOW': 'grafico_metodo_cotovelo.png',
+    'PLOT_SILHOUETTE': 'grafico_pontuacao_silhueta.png',
+    'PLOT_PCA_CLUSTERS': 'grafico_clusters_pca.png',
+    'PLOT_BOXPLOTS': 'grafico_boxplots_parametros.png',
+}
+
+def _default_results_dir(input_file):
+    """Diretório de resultados baseado no nome do arquivo de entrada."""
+    input_stem = os.path.splitext(os.path.basename(input_file))[0]
+    return f"results_{input_stem}"
+
+def __getattr__(name):
+    """Resolve RESULTS_DIR e os caminhos de saída a partir do INPUT_FILE atual (PEP 562)."""
+    if name == 'RESULTS_DIR':
+        return _results_dir if _results_dir is not None else _default_results_dir(INPUT_FILE)
+    if name in _RESULT_PATHS:
+        return os.path.join(__getattr__('RESULTS_DIR'), _RESULT_PATHS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def configure(input_file, results_dir=None):
+    """
+    Define o arquivo de entrada e, opcionalmente, o diretório de resultados.
+    Os caminhos derivados passam a apontar para o novo diretório; nada é criado
+    no disco (ver ensure_results_dir).
+
+    Args:
+        input_file (str): Caminho do arquivo de calibração a analisar.
+        results_dir (str, optional): Diretório de resultados. Padrão: 'results_<nome do arquivo>'.
+    """
+    global INPUT_FILE, _results_dir
+    INPUT_FILE = input_file
+    _results_dir = results_dir
+
+def ensure_results_dir():
+    """
+    Cria o diretório de resultados, se ainda não existir.
+
+    Returns:
+        str: O diretório de resultados.
+    """
+    results_dir = __getattr__('RESULTS_DIR')
+    os.makedirs(results_dir, exist_ok=True)
+    return results_dir
+
+def _coerce(name, value):
+    """Converte um valor (possivelmente texto) para o tipo do valor padrão da configuração."""
+    current = globals()[name]
+    if isinstance(value, str):
+        if isinstance(current, str):
+            return value
+        if isinstance(current, range) and ':' in value:
+            return range(*(int(part) for part in value.split(':'))) # Ex.: '2:11'
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value # Texto livre (ex.: PROFILE_MODE='cprofile', cujo padrão é None)
+    if isinstance(current, range) and isinstance(value, (list, tuple)):
+        return range(*value) # [início, fim) como em range()
+    if isinstance(current, tuple) and isinstance(value, list):
+        return tuple(value)
+    return value
+
+def update(**overrides):
+    """
+    Altera configurações em tempo de execução (ex.: update(OPTIMAL_K=6, N_JOBS=2)).
+    Textos são convertidos para o tipo do valor padrão; INPUT_FILE e RESULTS_DIR
+    passam por configure().
+
+    Raises:
+        ValueError: Se algum nome não for uma configuração conhecida.
+    """
+    unknown = [name for name in overrides if name not in SETTING_NAMES and name != 'RESULTS_DIR']
+    if unknown:
+        raise ValueError(f"Configurações desconhecidas: {unknown}")
+    for name, value in overrides.items():
+        if name not in ('INPUT_FILE', 'RESULTS_DIR'):
+            globals()[name] = _coerce(name, value)
+    if 'INPUT_FILE' in overrides or 'RESULTS_DIR' in overrides:
+        configure(overrides.get('INPUT_FILE', INPUT_FILE), overrides.get('RESULTS_DIR', _results_dir))
+
+def settings():
+    """Retorna um dicionário com os valores atuais de todas as configurações."""
+    current = {name: globals()[name] for name in SETTING_NAMES}
+    current['RESULTS_DIR'] = __getattr__('RESULTS_DIR')
+    return current
+
+def _read_settings_file(path):
+    """Lê configurações de um arquivo .json ou .toml (chaves com os nomes das constantes)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path, encoding='utf-8') as f:
+            values = json.load(f)
+    elif extension == '.toml':
+        import tomllib # Python 3.11+
+        with open(path, 'rb') as f:
+            values = tomllib.load(f)
+    else:
+        raise ValueError(f"Formato de arquivo de configuração não suportado: '{extension}'")
+    return {name.upper(): value for name, value in values.items()}
+
+def load_overrides(config_file=None, assignments=None, environ=None):
+    """
+    Reúne alterações de configuração de um arquivo, de variáveis de ambiente e de
+    atribuições 'NOME=valor' (linha de comando), nesta ordem de prioridade crescente.
+    Não aplica nada: passe o resultado para update().
+
+    Args:
+        config_file (str, optional): Arquivo .json ou .toml.
+        assignments (list, optional): Textos 'NOME=valor' (ex.: de --set).
+        environ (dict, optional): Variáveis de ambiente. Padrão: os.environ.
 
-# --- Nomes dos Arquivos de Gráfico ---
-# Salvamos as imagens dentro do diretório de resultados
-PLOT_OF_SCATTER = os.path.join(RESULTS_DIR, 'grafico_dispersao_OF.png')
-PLOT_ELBOW = os.path.join(RESULTS_DIR, 'grafico_metodo_cotovelo.png')
-PLOT_SILHOUETTE = os.path.join(RESULTS_DIR, 'grafico_pontuacao_silhueta.png')
-PLOT_PCA_CLUSTERS = os.path.join(RESULTS_DIR, 'grafico_clusters_pca.png')
-PLOT_BOXPLOTS = os.path.join(RESULTS_DIR, 'grafico_boxplots_parametros.png')
+    Returns:
+        dict: Nome da configuração -> novo valor.
+    """
+    overrides = {}
+    if config_file:
+        overrides.update(_read_settings_file(config_file))
+    environ = os.environ if environ is None else environ
+    for key, value in environ.items():
+        name = key[len(ENV_PREFIX):]
+        if key.startswith(ENV_PREFIX) and (name in SETTING_NAMES or name == 'RESULTS_DIR'):
+            overrides[name] = value
+    for assignment in assignments or []:
+        name, separator, value = assignment.partition('=')
+        if not separator:
+            raise ValueError(f"Atribuição inválida: '{assignment}'. Use NOME=valor.")
+        overrides[name.strip().upper()] = value.strip()
+    return overrides
 
-print("Configurações carregadas.")
+def add_cli_arguments(parser):
+    """Adiciona as opções --config e --set a um argparse.ArgumentParser."""
+    parser.add_argument('--config', dest='config_file', default=None,
+                        help="Arquivo de configuração (.json ou .toml).")
+    parser.add_argument('--set', dest='assignments', action='append', default=[], metavar='NOME=valor',
+                        help="Altera uma configuração (pode ser repetido), ex.: --set OPTIMAL_K=6.")
@@ -0,0 +1,221 @@
+# consensus.py
+"""
+Módulo de clustering de consenso: o K-Means é repetido com várias sementes e
+subamostras, em paralelo, e cada modelo recebe o rótulo da maioria das
+execuções, depois de alinhadas ao K-Means de referência (algoritmo húngaro
+sobre a tabela de contingência).
+
+Medidas de estabilidade:
+- índice de consenso de cada cluster (Monti et al., 2003): média da matriz de
+  co-associação entre os pares de membros do cluster;
+- Jaccard médio do cluster mais parecido em cada execução (Hennig, 2007);
+- índice de Rand ajustado de cada execução em relação ao consenso.
+
+A matriz de co-associação (n x n) não é materializada: a soma de cada bloco
+(cluster x cluster) é obtida das tabelas de contingência k x k de cada
+execução, de modo que a memória fica em O(execuções x n) para os rótulos.
+"""
+
+import os
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+import clustering
+
+@dataclass
+class ConsensusResult:
+    """
+    Resultado do clustering de consenso.
+
+    Attributes:
+        labels (numpy.ndarray): Rótulos de consenso (votação majoritária das execuções alinhadas).
+        centers (numpy.ndarray): Centróides (médias no espaço PCA) dos clusters de consenso.
+        inertia (float): Inércia (WSS) dos rótulos de consenso em relação a centers.
+        agreement (numpy.ndarray): Fração das execuções que atribuem cada modelo ao seu cluster de consenso.
+        stability (pd.DataFrame): Por cluster: tamanho, índice de consenso, Jaccard médio e concordância média.
+        adjusted_rand (numpy.ndarray): Índice de Rand ajustado de cada execução em relação ao consenso.
+        n_changed (int): Modelos cujo rótulo de consenso difere do K-Means de referência.
+        n_runs (int): Número de execuções.
+        sample_fraction (float): Fração das linhas usada no ajuste de cada execução.
+        seconds (float): Tempo total das execuções e da consolidação.
+    """
+    labels: np.ndarray
+    centers: np.ndarray
+    inertia: float
+    agreement: np.ndarray
+    stability: pd.DataFrame
+    adjusted_rand: np.ndarray
+    n_changed: int
+    n_runs: int
+    sample_fraction: float
+    seconds: float
+
+# Dados compartilhados (somente leitura) de cada processo do pool
+_worker_X = None
+
+def _init_consensus_worker(X_pca, n_threads):
+    """Inicializa um processo do pool: recebe os dados uma vez e limita os threads."""
+    from threadpoolctl import threadpool_limits
+
+    global _worker_X
+    _worker_X = X_pca
+    threadpool_limits(limits=n_threads)
+
+def _consensus_run(seed, X_pca=None, k=None, sample_fraction=1.0, backend=None, batch_size=None):
+    """Uma execução: K-Means (uma inicialização) em uma subamostra e rótulos de todas as linhas."""
+    X_pca = _worker_X if X_pca is None else X_pca
+    n_rows = len(X_pca)
+    X_fit = X_pca
+    if sample_fraction < 1.0:
+        rng = np.random.default_rng(seed)
+        size = max(k, int(round(n_rows * sample_fraction)))
+        X_fit = X_pca[rng.choice(n_rows, size=size, replace=False)]
+    model = clustering._make_kmeans(k, backend, random_state=seed, n_init=1, batch_size=batch_size).fit(X_fit)
+    return model.predict(X_pca).astype(np.int16)
+
+def _contingency(labels_a, labels_b, k):
+    """Tabela de contingência k x k entre dois conjuntos de rótulos."""
+    return np.bincount(labels_a.astype(np.int64) * k + labels_b, minlength=k * k).reshape(k, k)
+
+def _align(run_labels, target_labels, k):
+    """Renomeia os clusters de uma execução para maximizar a concordância com target_labels."""
+    from scipy.optimize import linear_sum_assignment # Importado sob demanda (início mais rápido)
+
+    target_ids, run_ids = linear_sum_assignment(_contingency(target_labels, run_labels, k), maximize=True)
+    mapping = np.empty(k, dtype=run_labels.dtype)
+    mapping[run_ids] = target_ids
+    return mapping[run_labels]
+
+def _majority_votes(runs, target_labels, k):
+    """Votos (n, k) das execuções alinhadas a target_labels."""
+    votes = np.zeros((runs.shape[1], k), dtype=np.int32)
+    rows = np.arange(runs.shape[1])
+    for run_labels in runs:
+        votes[rows, _align(run_labels, target_labels, k)] += 1
+    return votes
+
+def _adjusted_rand(contingency):
+    """Índice de Rand ajustado a partir da tabela de contingência."""
+    contingency = contingency.astype(np.float64)
+    pairs = lambda x: x * (x - 1) / 2
+    sum_cells = pairs(contingency).sum()
+    sum_rows = pairs(contingency.sum(axis=1)).sum()
+    sum_cols = pairs(contingency.sum(axis=0)).sum()
+    total = pairs(contingency.sum())
+    expected = sum_rows * sum_cols / total if total > 0 else 0.0
+    max_index = (sum_rows + sum_cols) / 2
+    if max_index == expected:
+        return 1.0
+    return float((sum_cells - expected) / (max_index - expected))
+
+def _stability(runs, labels, agreement, k):
+    """Índice de consenso, Jaccard médio e concordância média por cluster, e ARI de cada execução."""
+    sizes = np.bincount(labels, minlength=k).astype(np.float64)
+    pair_sums = np.zeros(k)
+    jaccard = np.zeros(k)
+    adjusted_rand = np.empty(len(runs))
+    for i, run_labels in enumerate(runs):
+        contingency = _contingency(labels, run_labels, k)
+        # Soma do bloco da co-associação do cluster c nesta execução: sum_l n(c, l)²
+        pair_sums += (contingency.astype(np.float64) ** 2).sum(axis=1)
+        union = sizes[:, None] + contingency.sum(axis=0)[None, :] - contingency
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard += np.where(union > 0, contingency / union, 0.0).max(axis=1)
+        adjusted_rand[i] = _adjusted_rand(contingency)
+
+    n_runs = len(runs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A diagonal (cada modelo com ele mesmo) vale 1 e é descontada
+        consensus_index = np.where(sizes > 1, (pair_sums / n_runs - sizes) / (sizes * (sizes - 1)), np.nan)
+        mean_agreement = np.bincount(labels, weights=agreement, minlength=k) / sizes
+    stability = pd.DataFrame({'Tamanho': sizes.astype(int),
+                              'Índice de Consenso': consensus_index,
+                              'Jaccard Médio': jaccard / n_runs,
+                              'Concordância Média': mean_agreement})
+    stability.index.name = 'Cluster'
+    return stability, adjusted_rand
+
+def run_consensus(X_pca, reference_labels, reference_centers, n_runs=None, sample_fraction=None,
+                  n_jobs=None, backend=None, random_state=42):
+    """
+    Executa o clustering de consenso com k igual ao do K-Means de referência.
+
+    Args:
+        X_pca (numpy.ndarray): Dados após PCA.
+        reference_labels (numpy.ndarray): Rótulos do K-Means de referência (definem a numeração dos clusters).
+        reference_centers (numpy.ndarray): Centróides de referência (usados para clusters que ficarem vazios).
+        n_runs (int, optional): Número de execuções. Padrão: config.CONSENSUS_RUNS.
+        sample_fraction (float, optional): Fração das linhas em cada execução.
+                                           Padrão: config.CONSENSUS_SAMPLE_FRACTION.
+        n_jobs (int, optional): Número de processos. Padrão: config.N_JOBS.
+        backend (str, optional): 'kmeans' ou 'minibatch'. Padrão: config.CLUSTERING_BACKEND.
+        random_state (int): Semente das sementes de cada execução.
+
+    Returns:
+        ConsensusResult: Rótulos, centróides e estabilidade do consenso.
+    """
+    start = time.perf_counter()
+    n_runs = n_runs or config.CONSENSUS_RUNS
+    sample_fraction = sample_fraction if sample_fraction is not None else config.CONSENSUS_SAMPLE_FRACTION
+    backend = backend or config.CLUSTERING_BACKEND
+    reference_labels = np.asarray(reference_labels)
+    k = len(reference_centers)
+
+    n_jobs = n_jobs if n_jobs is not None else config.N_JOBS
+    n_workers = min(n_jobs or os.cpu_count() or 1, n_runs)
+    print(f"\n--- Clustering de Consenso ({n_runs} execuções, {sample_fraction:.0%} das linhas, "
+          f"{n_workers} processo(s)) ---")
+
+    seeds = [int(seed) for seed in np.random.SeedSequence(random_state).generate_state(n_runs)]
+    # batch_size explícito: processos iniciados por 'spawn' não veem as alterações em config
+    run = partial(_consensus_run, k=k, sample_fraction=sample_fraction, backend=backend,
+                  batch_size=config.MINIBATCH_SIZE)
+    if n_workers <= 1:
+        runs = [run(seed, X_pca) for seed in seeds]
+    else:
+        n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_consensus_worker,
+                                 initargs=(X_pca, n_threads)) as executor:
+            runs = list(executor.map(run, seeds, chunksize=max(1, n_runs // (4 * n_workers))))
+    runs = np.vstack(runs)
+
+    # Votação alinhada à referência e, em seguida, ao próprio consenso (a referência é uma única semente)
+    labels = reference_labels
+    for _ in range(2):
+        votes = _majority_votes(runs, labels, k)
+        labels = votes.argmax(axis=1)
+    agreement = votes[np.arange(len(labels)), labels] / n_runs
+
+    counts = np.bincount(labels, minlength=k)
+    centers = np.array(reference_centers, dtype=np.float64)
+    sums = np.zeros_like(centers)
+    np.add.at(sums, labels, X_pca)
+    centers[counts > 0] = sums[counts > 0] / counts[counts > 0, None]
+    inertia = float(((X_pca - centers[labels]) ** 2).sum())
+
+    stability, adjusted_rand = _stability(runs, labels, agreement, k)
+    result = ConsensusResult(labels=labels, centers=centers, inertia=inertia, agreement=agreement,
+                             stability=stability, adjusted_rand=adjusted_rand,
+                             n_changed=int((labels != reference_labels).sum()), n_runs=n_runs,
+                             sample_fraction=sample_fraction, seconds=time.perf_counter() - start)
+    print(f"  Índice de Rand ajustado (execuções vs. consenso): {adjusted_rand.mean():.4f} "
+          f"± {adjusted_rand.std():.4f}")
+    print(f"  Modelos com rótulo diferente do K-Means de referência: {result.n_changed}")
+    print(f"  Tempo: {result.seconds:.2f} s ({n_runs / result.seconds:.1f} execuções/s)")
+    return result
+
+def consensus_model(model, result):
+    """
+    Cópia do modelo de clustering com os centróides e rótulos de consenso,
+    para que analyze_clusters, predict e o pacote do modelo usem o consenso.
+    """
+    model = copy.copy(model)
+    model.cluster_centers_ = result.centers
+    model.labels_ = result.labels
+    model.inertia_ = result.inertia
+    return model
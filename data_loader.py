@@ -2,35 +2,48 @@
 """
 Módulo para carregar e limpar os dados de calibração do arquivo Excel.
 Utiliza as configurações definidas em config.py.
+
+Os dados já limpos são guardados em cache (formato colunar Parquet) dentro de
+config.DATA_CACHE_DIR, de modo que execuções repetidas sobre o mesmo arquivo
+não precisem ler o Excel novamente. Para ensembles maiores que a memória,
+iter_data_chunks lê o arquivo em blocos de linhas com tipos compactos.
 """
 
+import os
+import json
+import glob
+import hashlib
+import numpy as np
 import pandas as pd
 import config # Importa as configurações do arquivo config.py
 
-def load_and_clean_data(file_path):
+# Versão do formato do cache. Incremente ao mudar a lógica de limpeza,
+# para que entradas antigas sejam descartadas automaticamente.
+CACHE_FORMAT_VERSION = 1
+
+def _clean_dataframe(df, verbose=True):
     """
-    Carrega os dados do arquivo Excel, limpa colunas desnecessárias e define o índice.
+    Aplica a limpeza padrão ao DataFrame bruto lido do arquivo de entrada.
 
     Args:
-        file_path (str): O caminho para o arquivo Excel de entrada.
+        df (pandas.DataFrame): DataFrame bruto.
+        verbose (bool): Se deve imprimir as mensagens de cada passo da limpeza.
 
     Returns:
-        pandas.DataFrame: O DataFrame limpo com os dados de calibração
+        pandas.DataFrame: O DataFrame limpo, ou None se faltarem colunas essenciais.
     """
-   
-    # Carrega o arquivo Excel
-    df = pd.read_excel(file_path)
-    print(f"Arquivo '{file_path}' carregado com sucesso.")
 
     # Limpa colunas desnecessárias (ignora se não existirem)
     df_cleaned = df.drop(['OutputPath', 'Ambiguity'], axis=1, errors='ignore')
-    print("Colunas 'OutputPath' e 'Ambiguity' removidas (se existiam).")
+    if verbose:
+        print("Colunas 'OutputPath' e 'Ambiguity' removidas (se existiam).")
 
     # Renomeia 'Unnamed: 0' para 'Simulation_ID' e define como índice
     if 'Unnamed: 0' in df_cleaned.columns:
         df_cleaned = df_cleaned.rename(columns={'Unnamed: 0': 'Simulation_ID'})
         df_cleaned = df_cleaned.set_index('Simulation_ID')
-        print("Coluna 'Unnamed: 0' renomeada para 'Simulation_ID' e definida como índice.")
+        if verbose:
+            print("Coluna 'Unnamed: 0' renomeada para 'Simulation_ID' e definida como índice.")
 
     # Verifica se as colunas essenciais 'OF Value' e 'Simulation' existem
     essential_cols = ['OF Value', 'Simulation']
@@ -39,5 +52,313 @@ def load_and_clean_data(file_path):
         print(f"Erro Crítico: Colunas essenciais não encontradas no DataFrame: {missing_essentials}")
         return None
 
+    return df_cleaned
+
+def _file_sha256(file_path, block_size=1 << 20):
+    """Calcula o hash SHA-256 do conteúdo do arquivo, lendo em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_fingerprint(file_path, cache_dir=None):
+    """
+    Retorna o hash SHA-256 do conteúdo do arquivo de entrada, reaproveitando o
+    valor salvo nos metadados do cache quando tamanho e data de modificação coincidem.
+    Usado como chave de entrada do cache de etapas (stage_cache.py).
+
+    Args:
+        file_path (str): O caminho para o arquivo de entrada.
+        cache_dir (str, optional): Diretório do cache. Padrão: config.DATA_CACHE_DIR.
+
+    Returns:
+        str: O hash do conteúdo em hexadecimal.
+    """
+    _, meta_path = _cache_paths(file_path, cache_dir or config.DATA_CACHE_DIR)
+    stat = os.stat(file_path)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+            return meta['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+    return _file_sha256(file_path)
+
+def _cache_paths(file_path, cache_dir):
+    """
+    Retorna os caminhos (dados, metadados) da entrada de cache de um arquivo.
+    O nome da entrada é derivado do caminho absoluto do arquivo de entrada.
+    """
+    abs_path = os.path.abspath(file_path)
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    path_hash = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:12]
+    base = os.path.join(cache_dir, f"{stem}_{path_hash}")
+    return base + '.parquet', base + '.json'
+
+def _read_cache(file_path, cache_dir):
+    """
+    Tenta ler o DataFrame limpo do cache.
+
+    A entrada é válida se o caminho, o tamanho e a data de modificação do
+    arquivo coincidirem com os metadados salvos. Se apenas a data de
+    modificação mudou (ex.: arquivo copiado), o hash do conteúdo é usado
+    para confirmar que os dados são os mesmos.
+
+    Returns:
+        pandas.DataFrame or None: O DataFrame em cache, ou None se inválido/ausente.
+    """
+    data_path, meta_path = _cache_paths(file_path, cache_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(file_path)
+    if (meta.get('version') != CACHE_FORMAT_VERSION
+            or meta.get('source') != os.path.abspath(file_path)
+            or meta.get('size') != stat.st_size):
+        return None
+
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        # Data de modificação diferente: confirma pelo conteúdo
+        if meta.get('sha256') != _file_sha256(file_path):
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    try:
+        return pd.read_parquet(data_path)
+    except Exception as e:
+        print(f"Aviso: Não foi possível ler o cache '{data_path}': {e}")
+        return None
+
+def _write_cache(df_cleaned, file_path, cache_dir):
+    """Salva o DataFrame limpo no cache, junto com os metadados de validação."""
+    data_path, meta_path = _cache_paths(file_path, cache_dir)
+    stat = os.stat(file_path)
+    meta = {
+        'version': CACHE_FORMAT_VERSION,
+        'source': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': _file_sha256(file_path),
+    }
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df_cleaned.to_parquet(data_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        print(f"Dados limpos salvos em cache em '{data_path}'.")
+    except Exception as e:
+        # Sem pyarrow/fastparquet ou sem permissão de escrita: segue sem cache
+        print(f"Aviso: Não foi possível salvar o cache dos dados: {e}")
+        for path in (data_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def invalidate_cache(file_path=None, cache_dir=None):
+    """
+    Remove entradas do cache de dados.
+
+    Args:
+        file_path (str, optional): Arquivo de entrada cuja entrada deve ser removida.
+                                   Se None, remove todo o cache de dados.
+        cache_dir (str, optional): Diretório do cache. Padrão: config.DATA_CACHE_DIR.
+
+    Returns:
+        int: Número de arquivos removidos.
+    """
+    cache_dir = cache_dir or config.DATA_CACHE_DIR
+    if file_path is not None:
+        paths = _cache_paths(file_path, cache_dir)
+    else:
+        paths = glob.glob(os.path.join(cache_dir, '*.parquet')) + glob.glob(os.path.join(cache_dir, '*.json'))
+
+    removed = 0
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    print(f"Cache de dados invalidado ({removed} arquivo(s) removido(s)).")
+    return removed
+
+def load_and_clean_data(file_path, use_cache=None, cache_dir=None):
+    """
+    Carrega os dados do arquivo Excel, limpa colunas desnecessárias e define o índice.
+
+    Args:
+        file_path (str): O caminho para o arquivo Excel de entrada.
+        use_cache (bool, optional): Se deve usar o cache colunar dos dados limpos.
+                                    Padrão: config.USE_DATA_CACHE.
+        cache_dir (str, optional): Diretório do cache. Padrão: config.DATA_CACHE_DIR.
+
+    Returns:
+        pandas.DataFrame: O DataFrame limpo com os dados de calibração
+    """
+
+    if use_cache is None:
+        use_cache = config.USE_DATA_CACHE
+    cache_dir = cache_dir or config.DATA_CACHE_DIR
+
+    if use_cache:
+        df_cached = _read_cache(file_path, cache_dir)
+        if df_cached is not None:
+            print(f"Arquivo '{file_path}' carregado do cache ({len(df_cached)} linhas).")
+            return df_cached
+
+    # Carrega o arquivo Excel
+    df = pd.read_excel(file_path)
+    print(f"Arquivo '{file_path}' carregado com sucesso.")
+
+    df_cleaned = _clean_dataframe(df)
+    if df_cleaned is None:
+        return None
+
+    if use_cache:
+        _write_cache(df_cleaned, file_path, cache_dir)
+
     print("Limpeza inicial dos dados concluída.")
     return df_cleaned
+
+
+def _compact_dtypes(df):
+    """
+    Converte um bloco limpo para tipos compactos: parâmetros em float32 e
+    'Simulation' no menor tipo inteiro possível (ou categórico, se não for numérico).
+    A coluna 'OF Value' é mantida em float64 para não alterar o corte por percentil.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col == 'OF Value':
+            continue
+        if col == 'Simulation':
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+            else:
+                df[col] = df[col].astype('category')
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+def _infer_numeric(df):
+    """
+    Converte para número as colunas de texto que contêm apenas valores numéricos,
+    como faz pd.read_excel (algumas planilhas guardam os multiplicadores como texto).
+    """
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                pass
+    return df
+
+def _iter_raw_excel(file_path, chunk_size):
+    """Lê um arquivo .xlsx em blocos de linhas usando o modo read-only do openpyxl."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Reproduz os nomes gerados pelo pandas para colunas sem cabeçalho
+        columns = [name if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == chunk_size:
+                yield _infer_numeric(pd.DataFrame(buffer, columns=columns))
+                buffer = []
+        if buffer:
+            yield _infer_numeric(pd.DataFrame(buffer, columns=columns))
+    finally:
+        workbook.close()
+
+def _iter_raw_parquet(file_path, chunk_size, part=None):
+    """
+    Lê um arquivo Parquet em blocos de linhas (requer pyarrow). Com part, lê
+    só os row groups da parte (sem decodificar os demais).
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    row_groups = None
+    if part is not None:
+        row_groups = list(range(part[0], parquet_file.num_row_groups, part[1]))
+        if not row_groups:
+            return
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+        yield batch.to_pandas()
+
+def iter_data_chunks(file_path, chunk_size=None, part=None):
+    """
+    Lê o arquivo de entrada em blocos de tamanho fixo, já limpos e com tipos compactos.
+
+    Suporta arquivos .xlsx, .csv e .parquet. Cada bloco passa pela mesma limpeza
+    de load_and_clean_data, de modo que o pico de memória depende apenas de
+    chunk_size e não do tamanho do ensemble.
+
+    Args:
+        file_path (str): O caminho para o arquivo de entrada.
+        chunk_size (int, optional): Número de linhas por bloco.
+                                    Padrão: config.STREAMING_CHUNK_SIZE.
+        part (tuple, optional): (índice, número de partes): lê só uma parte das linhas
+                                (ver sharding.py). Em Parquet, a parte são os row groups
+                                índice, índice + partes, ...; nos demais formatos, os
+                                blocos nessas posições (os outros são lidos e descartados).
+
+    Yields:
+        pandas.DataFrame: Blocos limpos do DataFrame de calibração.
+    """
+    chunk_size = chunk_size or config.STREAMING_CHUNK_SIZE
+    if not chunk_size or chunk_size <= 0:
+        raise ValueError("chunk_size deve ser um inteiro positivo para a leitura em blocos.")
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.csv':
+        raw_chunks = pd.read_csv(file_path, chunksize=chunk_size)
+    elif extension == '.parquet':
+        raw_chunks = _iter_raw_parquet(file_path, chunk_size, part)
+    elif extension in ('.xlsx', '.xlsm'):
+        raw_chunks = _iter_raw_excel(file_path, chunk_size)
+    else:
+        raise ValueError(f"Formato de arquivo não suportado para leitura em blocos: '{extension}'")
+
+    if part is not None and extension != '.parquet':
+        index, n_parts = part
+        raw_chunks = (raw_chunk for i, raw_chunk in enumerate(raw_chunks) if i % n_parts == index)
+    for raw_chunk in raw_chunks:
+        chunk = _clean_dataframe(raw_chunk, verbose=False)
+        if chunk is None:
+            return
+        yield _compact_dtypes(chunk)
+
+def load_columns(file_path, columns, chunk_size=None):
+    """
+    Carrega apenas algumas colunas do arquivo de entrada, lendo-o em blocos.
+    Útil para obter 'Simulation' e 'OF Value' de todo o ensemble sem
+    materializar os parâmetros.
+
+    Args:
+        file_path (str): O caminho para o arquivo de entrada.
+        columns (list): Colunas a manter (o índice 'Simulation_ID' é mantido sempre).
+        chunk_size (int, optional): Número de linhas por bloco.
+
+    Returns:
+        pandas.DataFrame: DataFrame com as colunas solicitadas para todas as linhas.
+    """
+    parts = [chunk[columns] for chunk in iter_data_chunks(file_path, chunk_size)]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(parts)
+    print(f"Colunas {columns} carregadas em blocos de '{file_path}' ({len(df)} linhas).")
+    return df
@@ -0,0 +1,71 @@
+# data_model.py
+"""
+Modelo de dados compacto do caminho principal (filtragem -> escalonamento ->
+PCA -> clustering).
+
+Os parâmetros dos melhores modelos ficam em uma única matriz contígua
+(float64 ou float32, ver config.DATA_DTYPE), com o índice (Simulation_ID), a
+OF e os rótulos de cluster guardados à parte, como arrays paralelos. A matriz
+é preenchida coluna a coluna a partir do DataFrame (sem cópias intermediárias
+do tamanho da tabela) e é escalonada no próprio lugar por
+analysis_steps.scale_data; os rótulos são guardados uma única vez em labels.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+
+@dataclass
+class CalibrationMatrix:
+    """
+    Parâmetros de um conjunto de simulações em uma matriz contígua.
+
+    Attributes:
+        values (numpy.ndarray): Matriz (n, n_parâmetros) C-contígua. Após
+                                analysis_steps.scale_data, contém os valores escalados.
+        index (pd.Index): Simulation_ID de cada linha.
+        columns (list): Nomes das colunas de parâmetros, na ordem das colunas de values.
+        of_values (numpy.ndarray): 'OF Value' de cada linha (float64).
+        labels (numpy.ndarray, optional): Rótulo de cluster de cada linha.
+    """
+    values: np.ndarray
+    index: pd.Index
+    columns: list
+    of_values: np.ndarray
+    labels: np.ndarray = None
+
+    @classmethod
+    def from_frame(cls, df, parameter_columns, dtype=None, of_column='OF Value'):
+        """
+        Monta a matriz a partir das colunas de parâmetros de um DataFrame.
+
+        Args:
+            df (pandas.DataFrame): DataFrame com as colunas de parâmetros e a OF.
+            parameter_columns (list): Colunas de parâmetros, na ordem desejada.
+            dtype (str, optional): Tipo da matriz. Padrão: config.DATA_DTYPE.
+            of_column (str): Nome da coluna da Função Objetivo.
+
+        Returns:
+            CalibrationMatrix: A matriz compacta.
+        """
+        dtype = np.dtype(dtype or config.DATA_DTYPE)
+        values = np.empty((len(df), len(parameter_columns)), dtype=dtype)
+        for j, col in enumerate(parameter_columns):
+            values[:, j] = df[col].to_numpy()
+        return cls(values=values, index=df.index, columns=list(parameter_columns),
+                   of_values=df[of_column].to_numpy(dtype=np.float64))
+
+    @property
+    def n_rows(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pela matriz, pela OF e pelos rótulos."""
+        labels_bytes = self.labels.nbytes if self.labels is not None else 0
+        return self.values.nbytes + self.of_values.nbytes + labels_bytes
+
+    def frame(self):
+        """DataFrame sobre a mesma memória de values (sem cópia), para relatórios e gráficos."""
+        return pd.DataFrame(self.values, index=self.index, columns=self.columns, copy=False)
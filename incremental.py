@@ -0,0 +1,360 @@
+# incremental.py
+"""
+Módulo de re-clustering incremental para ensembles que recebem novas simulações.
+
+Ao fim de cada execução com config.INCREMENTAL_MODE, o estado do ajuste
+(scaler, PCA, modelo de clustering, Simulation_IDs já vistos, esboço KLL da OF,
+estatísticas dos melhores modelos e somas dos clusters) é salvo em
+config.INCREMENTAL_STATE_FILE. Na execução seguinte, se o arquivo só tiver
+ganho linhas novas, prepare_update:
+
+- atualiza o esboço da OF e o valor de corte do percentil;
+- identifica os modelos que entraram e saíram do conjunto dos melhores;
+- atualiza as estatísticas (média e variância) dos parâmetros e as somas dos
+  clusters só com essas linhas, e recalcula os centróides como médias;
+- atribui apenas os modelos que entraram, com predict.
+
+O scaler e o PCA ficam congelados entre ajustes completos, para que os
+rótulos continuem comparáveis; as estatísticas atualizadas servem para medir
+o desvio (drift). Se o desvio, a piora da inércia ou a fração de linhas novas
+passarem dos limites configurados, prepare_update retorna None e o pipeline
+faz o ajuste completo.
+"""
+
+import os
+import pickle
+import hashlib
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+import analysis_steps
+import stage_cache
+from quantile_sketch import KLLSketch
+
+# Versão do formato do estado salvo. Incremente ao mudar os campos de IncrementalState.
+INCREMENTAL_STATE_VERSION = 2
+
+@dataclass
+class IncrementalState:
+    """
+    Estado persistido entre execuções do modo incremental.
+
+    Attributes:
+        settings_key (str): Chave das configurações que afetam o ajuste (ver _settings_key).
+        simulation_ids (numpy.ndarray): Simulation_IDs de todas as simulações já vistas.
+        of_digest (str): Hash dos valores de OF dessas simulações (detecta alterações).
+        of_sketch (KLLSketch): Esboço da OF de todas as simulações vistas.
+        parameter_columns (list): Ordem das colunas de parâmetros.
+        best_ids (numpy.ndarray): Simulation_IDs dos melhores modelos atuais.
+        best_labels (numpy.ndarray): Rótulo de cluster de cada um deles.
+        param_count (int): Número de melhores modelos nas estatísticas abaixo.
+        param_mean (numpy.ndarray): Média dos parâmetros dos melhores modelos.
+        param_m2 (numpy.ndarray): Soma dos quadrados dos desvios (variância * n).
+        cluster_sums (numpy.ndarray): Soma das coordenadas PCA por cluster (k x componentes).
+        cluster_counts (numpy.ndarray): Número de modelos por cluster.
+        reference_inertia (float): Inércia média por modelo no último ajuste completo.
+        scaler, pca, model: Transformações e modelo de clustering do último ajuste completo.
+        k_sweep (clustering.KSweepResult): Métricas da varredura de k (sem modelos).
+        k_selection_reason (str): Justificativa da escolha de k no último ajuste completo.
+        n_updates (int): Atualizações incrementais desde o último ajuste completo.
+    """
+    settings_key: str
+    simulation_ids: np.ndarray
+    of_digest: str
+    of_sketch: KLLSketch
+    parameter_columns: list
+    best_ids: np.ndarray
+    best_labels: np.ndarray
+    param_count: int
+    param_mean: np.ndarray
+    param_m2: np.ndarray
+    cluster_sums: np.ndarray
+    cluster_counts: np.ndarray
+    reference_inertia: float
+    scaler: object
+    pca: object
+    model: object
+    k_sweep: object = None
+    k_selection_reason: str = None
+    n_updates: int = 0
+    version: int = field(default=INCREMENTAL_STATE_VERSION)
+
+@dataclass
+class IncrementalUpdate:
+    """
+    Resultado de uma atualização incremental, no formato usado pelas etapas seguintes do pipeline.
+
+    Attributes:
+        df_best (pd.DataFrame): Melhores modelos atuais (sem a coluna 'Cluster').
+        X_scaled (numpy.ndarray): Parâmetros escalonados com o scaler congelado.
+        X_pca (numpy.ndarray): Coordenadas no PCA congelado.
+        labels (numpy.ndarray): Rótulos de cluster dos melhores modelos.
+        state (IncrementalState): Estado atualizado, a ser salvo ao fim da execução.
+        summary (dict): Contagens e métricas da atualização (para o relatório).
+    """
+    df_best: pd.DataFrame
+    X_scaled: np.ndarray
+    X_pca: np.ndarray
+    labels: np.ndarray
+    state: IncrementalState
+    summary: dict
+
+def _settings_key():
+    """Chave das configurações que, se alteradas, exigem um ajuste completo."""
+    # Todas as configurações que mudam o scaler, o PCA, o k escolhido ou o modelo ajustado
+    return stage_cache.make_key('incremental', config.BEST_MODEL_PERCENTILE, config.QUANTILE_METHOD,
+                                config.QUANTILE_SKETCH_ERROR, config.SELECTION_MODE, config.OBJECTIVE_COLUMNS,
+                                config.DATA_DTYPE, config.PCA_VARIANCE_THRESHOLD, config.PCA_ENGINE,
+                                config.PCA_BATCH_SIZE, config.K_RANGE, config.OPTIMAL_K, config.K_SELECTION_STRATEGY,
+                                config.GAP_N_REFERENCES, config.CLUSTERING_BACKEND, config.MINIBATCH_SIZE,
+                                config.DENSITY_MIN_CLUSTER_SIZE, config.DENSITY_MIN_SAMPLES, config.DBSCAN_EPS,
+                                config.SILHOUETTE_MODE, config.SILHOUETTE_SAMPLE_SIZE, config.SILHOUETTE_CONFIDENCE,
+                                config.DUPLICATE_RADIUS, config.CONSENSUS_MODE, config.CONSENSUS_RUNS,
+                                config.CONSENSUS_SAMPLE_FRACTION)
+
+def _of_digest(of_values):
+    return hashlib.sha256(np.ascontiguousarray(of_values, dtype=np.float64).tobytes()).hexdigest()
+
+def _moments(X):
+    """Contagem, média e soma dos quadrados dos desvios de cada coluna."""
+    X = np.asarray(X, dtype=np.float64)
+    if len(X) == 0:
+        return 0, np.zeros(X.shape[1]), np.zeros(X.shape[1])
+    mean = X.mean(axis=0)
+    return len(X), mean, ((X - mean) ** 2).sum(axis=0)
+
+def _combine_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b, sign=1):
+    """
+    Combina (sign=1) ou remove (sign=-1) as estatísticas de um subconjunto
+    (fórmulas de Chan et al.), sem revisitar as demais linhas.
+    """
+    n = n_a + sign * n_b
+    if n <= 0:
+        return 0, np.zeros_like(mean_a), np.zeros_like(m2_a)
+    if sign > 0:
+        delta = mean_b - mean_a
+        mean = mean_a + delta * n_b / n
+        return n, mean, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+    mean = (n_a * mean_a - n_b * mean_b) / n
+    delta = mean_b - mean
+    return n, mean, np.maximum(m2_a - m2_b - delta ** 2 * n * n_b / n_a, 0.0)
+
+def _cluster_sums(X_pca, labels, n_clusters):
+    """Soma das coordenadas e contagem de modelos por cluster."""
+    sums = np.zeros((n_clusters, X_pca.shape[1]))
+    np.add.at(sums, labels, X_pca)
+    return sums, np.bincount(labels, minlength=n_clusters)
+
+def _mean_inertia(X_pca, labels, centers):
+    return float(((X_pca - centers[labels]) ** 2).sum() / max(len(X_pca), 1))
+
+def _transform(state, X_parameters):
+    # Como no ajuste completo: matriz no tipo config.DATA_DTYPE, escalada no próprio lugar
+    X_scaled = np.array(X_parameters[state.parameter_columns], dtype=config.DATA_DTYPE)
+    X_scaled = state.scaler.transform(X_scaled, copy=False)
+    return X_scaled, state.pca.transform(X_scaled)
+
+def build_state(df_cleaned, df_best, X_parameters, X_pca, labels, scaler, pca, model,
+                k_sweep=None, k_selection_reason=None):
+    """
+    Monta o estado incremental ao fim de um ajuste completo. (Após uma atualização
+    incremental, o estado já atualizado está em IncrementalUpdate.state.)
+
+    Args:
+        df_cleaned (pd.DataFrame): Todas as simulações, indexadas por Simulation_ID.
+        df_best (pd.DataFrame): Melhores modelos.
+        X_parameters (pd.DataFrame): Parâmetros originais dos melhores modelos (sem 'Cluster').
+        X_pca (numpy.ndarray): Coordenadas PCA dos melhores modelos.
+        labels (numpy.ndarray): Rótulos de cluster.
+        scaler, pca, model: Transformações e modelo ajustados.
+        k_sweep (clustering.KSweepResult, optional): Varredura de k (os modelos não são salvos).
+        k_selection_reason (str, optional): Justificativa da escolha de k.
+
+    Returns:
+        IncrementalState: O estado pronto para save_state.
+    """
+    of_values = df_cleaned['OF Value'].to_numpy()
+    labels = np.asarray(labels)
+    n_clusters = len(model.cluster_centers_)
+    sketch = KLLSketch(config.QUANTILE_SKETCH_ERROR).update(of_values)
+    n, mean, m2 = _moments(X_parameters)
+    sums, counts = _cluster_sums(X_pca, labels, n_clusters)
+    return IncrementalState(
+        settings_key=_settings_key(),
+        simulation_ids=df_cleaned.index.to_numpy(),
+        of_digest=_of_digest(of_values),
+        of_sketch=sketch,
+        parameter_columns=list(X_parameters.columns),
+        best_ids=df_best.index.to_numpy(),
+        best_labels=labels,
+        param_count=n, param_mean=mean, param_m2=m2,
+        cluster_sums=sums, cluster_counts=counts,
+        reference_inertia=_mean_inertia(X_pca, labels, model.cluster_centers_),
+        scaler=scaler, pca=pca, model=model,
+        k_sweep=k_sweep.without_models() if k_sweep is not None else None,
+        k_selection_reason=k_selection_reason)
+
+def save_state(state, path=None):
+    """Grava o estado incremental (escrita atômica)."""
+    path = path or config.INCREMENTAL_STATE_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    print(f"  - Estado incremental salvo em '{path}'")
+
+def load_state(path=None):
+    """Lê o estado incremental; retorna None se não existir ou for incompatível."""
+    path = path or config.INCREMENTAL_STATE_FILE
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except Exception as e:
+        print(f"Aviso: Estado incremental '{path}' inválido: {e}")
+        return None
+    if getattr(state, 'version', None) != INCREMENTAL_STATE_VERSION:
+        return None
+    return state
+
+def prepare_update(df_cleaned, state=None):
+    """
+    Tenta atualizar incrementalmente o ajuste anterior com as simulações acrescentadas.
+
+    Args:
+        df_cleaned (pd.DataFrame): Todas as simulações (as antigas e as novas).
+        state (IncrementalState, optional): Estado anterior. Padrão: load_state().
+
+    Returns:
+        IncrementalUpdate or None: A atualização, ou None quando é preciso um ajuste
+        completo (seleção por Pareto, sem estado salvo, configurações ou simulações antigas alteradas,
+        muitas linhas novas, desvio ou piora de qualidade acima dos limites).
+    """
+    if config.SELECTION_MODE != 'percentile':
+        # As frentes de Pareto dos modelos antigos mudam quando chegam modelos novos
+        print("Modo incremental: disponível só com SELECTION_MODE = 'percentile'; ajuste completo.")
+        return None
+    state = state if state is not None else load_state()
+    if state is None:
+        print("Modo incremental: nenhum estado anterior; será feito o ajuste completo.")
+        return None
+    if state.settings_key != _settings_key():
+        print("Modo incremental: configurações alteradas desde o último ajuste; ajuste completo.")
+        return None
+
+    known = df_cleaned.index.isin(state.simulation_ids)
+    of_values = df_cleaned['OF Value'].to_numpy()
+    if known.sum() != len(state.simulation_ids) or \
+            _of_digest(df_cleaned.loc[state.simulation_ids, 'OF Value'].to_numpy()) != state.of_digest:
+        print("Modo incremental: simulações anteriores foram removidas ou alteradas; ajuste completo.")
+        return None
+    n_new = int((~known).sum())
+    new_fraction = n_new / max(len(state.simulation_ids), 1)
+    if new_fraction > config.INCREMENTAL_MAX_NEW_FRACTION:
+        print(f"Modo incremental: {n_new} simulações novas ({new_fraction:.0%}) excedem o limite; ajuste completo.")
+        return None
+
+    # Valor de corte: o esboço é atualizado só com as novas simulações
+    sketch = state.of_sketch
+    if n_new:
+        sketch.update(of_values[~known])
+    percentile = config.BEST_MODEL_PERCENTILE
+    threshold_source = sketch if config.QUANTILE_METHOD == 'sketch' else of_values
+    of_threshold = analysis_steps.compute_of_threshold(threshold_source, percentile)
+    best_positions = np.flatnonzero(of_values <= of_threshold)
+    df_best = df_cleaned.iloc[best_positions].copy()
+
+    X_parameters = analysis_steps.select_parameters(df_best)
+    if list(X_parameters.columns) != state.parameter_columns:
+        print("Modo incremental: colunas de parâmetros diferentes do último ajuste; ajuste completo.")
+        return None
+
+    previous_labels = pd.Series(state.best_labels, index=state.best_ids)
+    staying = df_best.index.isin(previous_labels.index)
+    entering_ids = df_best.index[~staying]
+    leaving_ids = previous_labels.index.difference(df_best.index)
+
+    # Estatísticas dos parâmetros dos melhores modelos: soma os que entraram e remove os que saíram
+    n, mean, m2 = state.param_count, state.param_mean, state.param_m2
+    n, mean, m2 = _combine_moments(n, mean, m2, *_moments(X_parameters.loc[entering_ids]))
+    if len(leaving_ids):
+        X_leaving = df_cleaned.loc[leaving_ids, state.parameter_columns]
+        n, mean, m2 = _combine_moments(n, mean, m2, *_moments(X_leaving), sign=-1)
+    std = np.sqrt(m2 / max(n, 1))
+    # Colunas constantes no último ajuste (var_ == 0, ou só resíduo de arredondamento do
+    # partial_fit; scale_ == 1) ficam fora do desvio enquanto continuarem constantes, com
+    # o mesmo valor: nelas std / scale_ - 1 seria sempre -1. Se passarem a variar, o
+    # scaler congelado não as representa mais e é preciso um ajuste completo
+    tolerance = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(state.scaler.mean_), 1.0)
+    varying = state.scaler.var_ > np.finfo(float).eps * np.maximum(state.scaler.mean_ ** 2, 1.0)
+    changed = ~varying & ((std > tolerance) | (np.abs(mean - state.scaler.mean_) > tolerance))
+    if changed.any():
+        columns = [col for col, flag in zip(state.parameter_columns, changed) if flag]
+        print(f"Modo incremental: parâmetros constantes no último ajuste mudaram ({columns}); ajuste completo.")
+        return None
+    # Desvio em relação ao scaler congelado: deslocamento da média (em desvios padrão)
+    # e variação relativa da escala
+    scale = state.scaler.scale_[varying]
+    drift = max(float(np.max(np.abs(mean[varying] - state.scaler.mean_[varying]) / scale, initial=0.0)),
+                float(np.max(np.abs(std[varying] / scale - 1.0), initial=0.0)))
+    if drift > config.INCREMENTAL_DRIFT_THRESHOLD:
+        print(f"Modo incremental: desvio dos parâmetros ({drift:.3f}) acima do limite; ajuste completo.")
+        return None
+
+    # Coordenadas PCA de todos os melhores modelos (transformações lineares, sem reajuste)
+    X_scaled, X_pca = _transform(state, X_parameters)
+
+    # Só os modelos que entraram são atribuídos; os demais mantêm o rótulo anterior
+    labels = np.empty(len(df_best), dtype=np.int64)
+    labels[staying] = previous_labels.loc[df_best.index[staying]].to_numpy()
+    if len(entering_ids):
+        labels[~staying] = state.model.predict(X_pca[~staying])
+
+    # Centróides como médias: soma os que entraram e remove os que saíram
+    n_clusters = len(state.cluster_counts)
+    sums, counts = state.cluster_sums.copy(), state.cluster_counts.copy()
+    entering_sums, entering_counts = _cluster_sums(X_pca[~staying], labels[~staying], n_clusters)
+    sums += entering_sums
+    counts += entering_counts
+    if len(leaving_ids):
+        _, X_pca_leaving = _transform(state, df_cleaned.loc[leaving_ids, state.parameter_columns])
+        leaving_sums, leaving_counts = _cluster_sums(X_pca_leaving, previous_labels.loc[leaving_ids].to_numpy(),
+                                                     n_clusters)
+        sums -= leaving_sums
+        counts -= leaving_counts
+    centers = state.model.cluster_centers_.copy()
+    occupied = counts > 0
+    centers[occupied] = sums[occupied] / counts[occupied, None]
+
+    inertia = _mean_inertia(X_pca, labels, centers)
+    inertia_increase = inertia / state.reference_inertia - 1.0 if state.reference_inertia > 0 else 0.0
+    if inertia_increase > config.INCREMENTAL_QUALITY_TOLERANCE:
+        print(f"Modo incremental: inércia média subiu {inertia_increase:.1%} em relação ao último ajuste "
+              f"completo; ajuste completo.")
+        return None
+
+    model = state.model
+    model.cluster_centers_ = centers
+    model.labels_ = labels
+    model.inertia_ = inertia * len(X_pca)
+
+    state.simulation_ids = df_cleaned.index.to_numpy()
+    state.of_digest = _of_digest(of_values)
+    state.of_sketch = sketch
+    state.best_ids = df_best.index.to_numpy()
+    state.best_labels = labels
+    state.param_count, state.param_mean, state.param_m2 = n, mean, m2
+    state.cluster_sums, state.cluster_counts = sums, counts
+    state.n_updates += 1
+
+    summary = {'n_new': n_new, 'n_entering': len(entering_ids), 'n_leaving': len(leaving_ids),
+               'of_threshold': float(of_threshold), 'drift': drift,
+               'inertia_increase': inertia_increase, 'n_updates': state.n_updates}
+    print(f"Modo incremental: {n_new} simulações novas; {len(entering_ids)} modelos entraram e "
+          f"{len(leaving_ids)} saíram do conjunto dos melhores (corte da OF: {of_threshold:.4f}).")
+    print(f"  Desvio dos parâmetros: {drift:.3f}; variação da inércia média: {inertia_increase:+.1%}.")
+    return IncrementalUpdate(df_best=df_best, X_scaled=X_scaled, X_pca=X_pca, labels=labels,
+                             state=state, summary=summary)
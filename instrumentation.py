@@ -0,0 +1,214 @@
+# instrumentation.py
+"""
+Módulo de medição de desempenho do pipeline.
+
+Registra, para cada etapa de main.main, o tempo de relógio, o tempo de CPU
+(incluindo processos filhos já encerrados, como os pools da varredura de k e
+dos gráficos), o pico de memória residente (RSS) e a vazão em linhas por
+segundo. Os resultados são gravados em JSON e CSV no diretório de resultados
+e resumidos na seção "Desempenho" do relatório.
+
+Opcionalmente (config.PROFILE_MODE), cada etapa é perfilada com cProfile
+(um arquivo .prof por etapa) ou com tracemalloc (pico de memória alocada
+pelo Python).
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+
+try:
+    import resource # Indisponível no Windows
+except ImportError:
+    resource = None
+
+PROFILE_MODES = (None, 'cprofile', 'tracemalloc')
+
+@dataclass
+class StageMetrics:
+    """
+    Medidas de uma etapa do pipeline.
+
+    Attributes:
+        stage (str): Número da etapa (ex.: '5').
+        title (str): Descrição da etapa.
+        wall_seconds (float): Tempo de relógio.
+        cpu_seconds (float): Tempo de CPU do processo e dos processos filhos encerrados.
+        peak_rss_mb (float): Pico de RSS do processo durante a etapa (no Linux) ou desde
+                             o início do processo (demais sistemas); NaN se indisponível.
+        rows (int): Linhas processadas pela etapa (0 se não se aplica).
+        rows_per_second (float): rows / wall_seconds (NaN se rows == 0).
+        traced_peak_mb (float): Pico de memória alocada pelo Python (modo 'tracemalloc').
+    """
+    stage: str
+    title: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_mb: float
+    rows: int = 0
+    rows_per_second: float = np.nan
+    traced_peak_mb: float = np.nan
+
+def _cpu_seconds():
+    """Tempo de CPU (usuário + sistema) do processo e dos filhos já encerrados."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def _reset_peak_rss():
+    """Zera o pico de RSS do processo (Linux), para medir o pico de cada etapa."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    """Pico de RSS do processo em MB (VmHWM no Linux; ru_maxrss nos demais)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está em KB no Linux e em bytes no macOS
+        return max_rss / 1024**2 if sys.platform == 'darwin' else max_rss / 1024
+    return np.nan
+
+class PipelineProfiler:
+    """
+    Mede as etapas sequenciais do pipeline. Cada chamada a start_stage encerra
+    a etapa anterior e imprime o cabeçalho "--- Etapa N: ... ---" da nova.
+
+    Uso:
+        profiler = PipelineProfiler()
+        profiler.start_stage(1, "Carregando e Limpando Dados")
+        ...
+        profiler.set_rows(len(df))
+        profiler.start_stage(2, "Filtrando Melhores Modelos", rows=len(df))
+        ...
+        profiler.finish()
+    """
+
+    def __init__(self, profile_mode=None, profile_dir=None):
+        """
+        Args:
+            profile_mode (str, optional): None, 'cprofile' ou 'tracemalloc'.
+                                          Padrão: config.PROFILE_MODE.
+            profile_dir (str, optional): Diretório dos arquivos .prof. Padrão: config.PROFILE_DIR.
+        """
+        self.profile_mode = profile_mode if profile_mode is not None else config.PROFILE_MODE
+        if self.profile_mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfil desconhecido: '{self.profile_mode}'. Use um de {PROFILE_MODES}.")
+        self.profile_dir = profile_dir or config.PROFILE_DIR
+        self.stages = []
+        self.k_timings = {}
+        self._current = None
+
+    def start_stage(self, number, title, rows=0):
+        """
+        Encerra a etapa em andamento (se houver) e inicia a medição de uma nova.
+
+        Args:
+            number (int or str): Número da etapa.
+            title (str): Descrição da etapa (impressa no cabeçalho).
+            rows (int, optional): Linhas processadas, se já conhecidas (ver set_rows).
+        """
+        self._end_stage()
+        print(f"\n--- Etapa {number}: {title} ---")
+        profile = None
+        if self.profile_mode == 'cprofile':
+            profile = cProfile.Profile()
+        elif self.profile_mode == 'tracemalloc':
+            tracemalloc.start()
+        rss_reset = _reset_peak_rss()
+        self._current = {'stage': str(number), 'title': title, 'rows': rows,
+                         'profile': profile, 'rss_reset': rss_reset,
+                         'wall': time.perf_counter(), 'cpu': _cpu_seconds()}
+        if profile is not None:
+            profile.enable()
+
+    def set_rows(self, rows):
+        """Define o número de linhas processadas pela etapa em andamento."""
+        if self._current is not None:
+            self._current['rows'] = int(rows)
+
+    def record_k_sweep(self, k_sweep):
+        """Guarda os tempos por k de uma varredura (clustering.KSweepResult.timings)."""
+        self.k_timings = dict(getattr(k_sweep, 'timings', {}))
+
+    def _end_stage(self):
+        current, self._current = self._current, None
+        if current is None:
+            return
+        wall = time.perf_counter() - current['wall']
+        cpu = _cpu_seconds() - current['cpu']
+        profile = current['profile']
+        traced_peak_mb = np.nan
+        if profile is not None:
+            profile.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile_path = os.path.join(self.profile_dir, f"etapa_{current['stage']}.prof")
+            profile.dump_stats(profile_path)
+            print(f"  Perfil da etapa salvo em '{profile_path}'")
+        elif self.profile_mode == 'tracemalloc':
+            traced_peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+            tracemalloc.stop()
+
+        rows = current['rows']
+        self.stages.append(StageMetrics(
+            stage=current['stage'], title=current['title'],
+            wall_seconds=wall, cpu_seconds=cpu, peak_rss_mb=_peak_rss_mb(),
+            rows=rows, rows_per_second=rows / wall if rows and wall > 0 else np.nan,
+            traced_peak_mb=traced_peak_mb))
+
+    def finish(self):
+        """Encerra a etapa em andamento."""
+        self._end_stage()
+
+    def stage_frame(self):
+        """DataFrame com uma linha por etapa concluída."""
+        return pd.DataFrame([asdict(s) for s in self.stages], columns=list(StageMetrics.__dataclass_fields__))
+
+    def k_sweep_frame(self):
+        """DataFrame com os tempos de ajuste e de métricas por k."""
+        frame = pd.DataFrame.from_dict(self.k_timings, orient='index')
+        frame.index.name = 'k'
+        return frame.sort_index()
+
+    def write(self, json_path=None, csv_path=None):
+        """
+        Grava as medidas em JSON (etapas e varredura de k) e CSV (etapas).
+
+        Args:
+            json_path (str, optional): Padrão: config.OUTPUT_PERFORMANCE_JSON.
+            csv_path (str, optional): Padrão: config.OUTPUT_PERFORMANCE_CSV.
+
+        Returns:
+            tuple: (json_path, csv_path).
+        """
+        json_path = json_path or config.OUTPUT_PERFORMANCE_JSON
+        csv_path = csv_path or config.OUTPUT_PERFORMANCE_CSV
+        stages = self.stage_frame()
+        payload = {
+            'input_file': config.INPUT_FILE,
+            'profile_mode': self.profile_mode,
+            'total_wall_seconds': float(stages['wall_seconds'].sum()),
+            # NaN não é JSON válido: vira null
+            'stages': json.loads(stages.to_json(orient='records')),
+            'k_sweep': {str(k): timing for k, timing in self.k_timings.items()},
+        }
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        stages.to_csv(csv_path, index=False)
+        return json_path, csv_path
@@ -1,87 +1,302 @@
 # main.py
 """
 Importa e executa funções dos módulos:
-- config: Carrega configurações.
+- config: Carrega configurações (padrões, arquivo, ambiente e linha de comando).
 - data_loader: Carrega e limpa os dados.
+- data_model: Matriz contígua e compacta dos parâmetros dos melhores modelos.
 - analysis_steps: Filtra, seleciona parâmetros, escala e aplica PCA.
-- clustering: Determina k, aplica K-Means, analisa clusters.
+- clustering: Determina k, aplica K-Means (ou HDBSCAN/DBSCAN), analisa clusters.
+- pareto: Frentes de Pareto e distância de aglomeração (seleção multiobjetivo).
+- spatial_index: KD-tree para quase-duplicados e campeões diversos por cluster.
 - plotting: Gera os gráficos da análise.
 - report_generator: Cria o relatório final em Markdown.
+- stage_cache: Reaproveita etapas já calculadas em execuções anteriores.
+- instrumentation: Mede tempo, CPU, memória e vazão de cada etapa.
+- sensitivity: Sensibilidade dos parâmetros em relação à OF (correlações, faixas, testes entre clusters).
+- consensus: Clustering de consenso (várias sementes/subamostras) e estabilidade dos clusters.
+- model_bundle: Salva a cadeia ajustada para classificar novas simulações sem rodar o pipeline.
+- incremental: Atualiza o ajuste anterior quando o arquivo só ganhou simulações novas.
+- output_writer: Grava os resultados por simulação (Parquet/CSV.gz e Excel opcional).
 """
 
+import argparse
 import config
 import data_loader
 import analysis_steps
+import data_model
 import clustering
 import plotting
 import report_generator
-import pandas as pd # Necessário para salvar arquivos Excel aqui
+import stage_cache
+import output_writer
+import instrumentation
+import incremental
+import model_bundle
+import consensus
+import sensitivity
+import pareto
+import spatial_index
 
 def main():
-    """Função principal que executa a análise."""
+    """
+    Função principal que executa a análise.
+
+    Returns:
+        dict: Resumo da execução ('input_file', 'results_dir', 'n_simulations',
+              'n_best', 'n_clusters'), usado por batch_runner.py.
+    """
+
+    config.ensure_results_dir()
+    print(f"Configurações carregadas (entrada: '{config.INPUT_FILE}', resultados: '{config.RESULTS_DIR}').")
+    profiler = instrumentation.PipelineProfiler()
 
     # 1. Carregar e Limpar Dados
-    print("\n--- Etapa 1: Carregando e Limpando Dados ---")
-    df_cleaned = data_loader.load_and_clean_data(config.INPUT_FILE)
+    profiler.start_stage(1, "Carregando e Limpando Dados")
+    chunk_size = config.STREAMING_CHUNK_SIZE
+    # Chaves do cache de etapas: cada uma combina a chave anterior com as configurações da etapa
+    data_key = stage_cache.make_key('dados', data_loader.source_fingerprint(config.INPUT_FILE), chunk_size)
+    if chunk_size:
+        # Modo em blocos: do ensemble completo só são mantidas 'Simulation' e 'OF Value'
+        df_cleaned = stage_cache.cached_stage('dados', data_key, lambda: data_loader.load_columns(
+            config.INPUT_FILE, ['Simulation', 'OF Value'], chunk_size))
+    else:
+        # O DataFrame completo já tem cache próprio (Parquet) em data_loader
+        df_cleaned = data_loader.load_and_clean_data(config.INPUT_FILE)
+    profiler.set_rows(len(df_cleaned))
+    # Modo incremental: se o arquivo só ganhou simulações, reaproveita scaler, PCA e modelo da última execução
+    density_backend = clustering.is_density_backend()
+    incremental_mode = config.INCREMENTAL_MODE and not chunk_size and not density_backend
+    if config.INCREMENTAL_MODE and chunk_size:
+        print("Aviso: O modo incremental requer os dados em memória (STREAMING_CHUNK_SIZE = None); ignorado.")
+    if config.INCREMENTAL_MODE and density_backend:
+        print("Aviso: O modo incremental requer um backend K-Means (os clusters por densidade não "
+              "atribuem modelos novos); ignorado.")
+    update = None
 
     # 2. Filtrar Melhores Modelos
-    print("\n--- Etapa 2: Filtrando Melhores Modelos ---")
-    df_best = analysis_steps.filter_best_models(df_cleaned, 'OF Value', config.BEST_MODEL_PERCENTILE)
+    profiler.start_stage(2, "Filtrando Melhores Modelos", rows=len(df_cleaned))
+    pareto_mode = config.SELECTION_MODE == 'pareto'
+    objective_columns = list(config.OBJECTIVE_COLUMNS or ['OF Value'])
+    best_key = stage_cache.make_key(data_key, config.BEST_MODEL_PERCENTILE,
+                                    config.QUANTILE_METHOD, config.QUANTILE_SKETCH_ERROR)
+    if pareto_mode:
+        best_key = stage_cache.make_key(best_key, 'pareto', objective_columns, config.PARETO_TARGET_COUNT)
+    elif config.SELECTION_MODE != 'percentile':
+        raise ValueError(f"SELECTION_MODE desconhecido: '{config.SELECTION_MODE}'. Use 'percentile' ou 'pareto'.")
+    pareto_summary = None
+    if incremental_mode:
+        update = incremental.prepare_update(df_cleaned)
+    if update is not None:
+        df_best = update.df_best
+    elif pareto_mode:
+        if chunk_size:
+            # Só os objetivos são lidos para a ordenação; os parâmetros vêm de uma segunda passada
+            missing = [col for col in objective_columns if col not in df_cleaned.columns]
+            df_objectives = df_cleaned if not missing else stage_cache.cached_stage(
+                'objetivos', stage_cache.make_key(data_key, objective_columns), lambda: data_loader.load_columns(
+                    config.INPUT_FILE, objective_columns, chunk_size))
+        else:
+            df_objectives = df_cleaned
+        best_positions, fronts = stage_cache.cached_stage('melhores_modelos', best_key, lambda: analysis_steps.select_best_pareto(
+            df_objectives, objective_columns, return_indices=True))
+        if chunk_size:
+            df_best = analysis_steps.select_rows_chunked(
+                lambda: data_loader.iter_data_chunks(config.INPUT_FILE, chunk_size), best_positions)
+        else:
+            df_best = df_cleaned.iloc[best_positions]
+        df_best['Frente_Pareto'] = fronts[best_positions]
+        pareto_summary = pareto.summarize_selection(fronts, best_positions, objective_columns)
+    elif chunk_size:
+        df_best = stage_cache.cached_stage('melhores_modelos', best_key, lambda: analysis_steps.filter_best_models_chunked(
+            lambda: data_loader.iter_data_chunks(config.INPUT_FILE, chunk_size),
+            'OF Value', config.BEST_MODEL_PERCENTILE,
+            of_values=df_cleaned['OF Value'].to_numpy()))
+    else:
+        best_positions = stage_cache.cached_stage('melhores_modelos', best_key, lambda: analysis_steps.filter_best_models(
+            df_cleaned, 'OF Value', config.BEST_MODEL_PERCENTILE, return_indices=True))
+        df_best = df_cleaned.iloc[best_positions] # iloc já gera um novo DataFrame
 
     # 3. Selecionar Parâmetros
-    print("\n--- Etapa 3: Selecionando Parâmetros ---")
-    X_parameters = analysis_steps.select_parameters(df_best)
+    profiler.start_stage(3, "Selecionando Parâmetros", rows=len(df_best))
+    parameter_columns = list(analysis_steps.select_parameters(df_best).columns)
+    # Uma única matriz contígua (config.DATA_DTYPE), escalada no próprio lugar na Etapa 4
+    data = data_model.CalibrationMatrix.from_frame(df_best, parameter_columns)
 
     # 4. Escalonar Dados
-    print("\n--- Etapa 4: Escalonando Dados ---")
-    X_scaled_data, fitted_scaler = analysis_steps.scale_data(X_parameters)
+    profiler.start_stage(4, "Escalonando Dados", rows=len(df_best))
+    # No PCA incremental o scaler também é ajustado em lotes (partial_fit)
+    scale_chunk_size = chunk_size or (config.PCA_BATCH_SIZE if config.PCA_ENGINE == 'incremental' else None)
+    # OBJECTIVE_COLUMNS também define as colunas de parâmetros (select_parameters as exclui)
+    scale_key = stage_cache.make_key(best_key, config.OBJECTIVE_COLUMNS, config.DATA_DTYPE, config.PCA_ENGINE,
+                                     config.PCA_BATCH_SIZE, scale_chunk_size)
+    if update is not None:
+        # Scaler e PCA congelados desde o último ajuste completo
+        X_scaled_data, fitted_scaler = update.X_scaled, update.state.scaler
+    else:
+        X_scaled_data, fitted_scaler = stage_cache.cached_stage('escalonamento', scale_key, lambda: analysis_steps.scale_data(
+            data.values, chunk_size=scale_chunk_size))
 
     # 5. Aplicar PCA
-    print("\n--- Etapa 5: Aplicando PCA ---")
-    X_pca_data, fitted_pca = analysis_steps.apply_pca(X_scaled_data, config.PCA_VARIANCE_THRESHOLD)
+    profiler.start_stage(5, "Aplicando PCA", rows=len(df_best))
+    pca_key = stage_cache.make_key(scale_key, config.PCA_VARIANCE_THRESHOLD)
+    if update is not None:
+        X_pca_data, fitted_pca = update.X_pca, update.state.pca
+    else:
+        X_pca_data, fitted_pca = stage_cache.cached_stage('pca', pca_key, lambda: analysis_steps.apply_pca(
+            X_scaled_data, config.PCA_VARIANCE_THRESHOLD))
+    data.values = X_scaled_data
+    # Quase-duplicados (DUPLICATE_RADIUS): k e o K-Means são ajustados só sobre os representantes
+    duplicates = None
+    X_fit = X_pca_data
+    if config.DUPLICATE_RADIUS and update is None:
+        duplicates = spatial_index.find_near_duplicates(X_pca_data, config.DUPLICATE_RADIUS, data.of_values)
+        X_fit = X_pca_data[duplicates.representatives]
+        print(f"Quase-duplicados (raio {config.DUPLICATE_RADIUS}): {duplicates.n_collapsed} simulações unidas; "
+              f"{duplicates.n_groups} representantes usados no clustering.")
 
-    # 6. Determinar k Ótimo (Gerar Gráficos de Análise)
-    print("\n--- Etapa 6: Gerando Gráficos para Determinar k ---")
-    clustering.plot_elbow_method(X_pca_data, config.K_RANGE, config.PLOT_ELBOW)
-    clustering.plot_silhouette_scores(X_pca_data, config.K_RANGE, config.PLOT_SILHOUETTE)
-    # Nota: A escolha de OPTIMAL_K é feita manualmente no config.py
+    # 6. Determinar k Ótimo (os gráficos do Cotovelo e da Silhueta são gerados na Etapa 10)
+    profiler.start_stage(6, "Determinando k", rows=len(df_best))
+    # Cada k é ajustado uma única vez e reutilizado pelos dois gráficos e pelo K-Means final
+    sweep_key = stage_cache.make_key(pca_key, config.K_RANGE, config.CLUSTERING_BACKEND, config.MINIBATCH_SIZE,
+                                     config.SILHOUETTE_MODE, config.SILHOUETTE_SAMPLE_SIZE, config.SILHOUETTE_CONFIDENCE,
+                                     config.DUPLICATE_RADIUS)
+    if density_backend:
+        # O clustering por densidade não escolhe k: a varredura não é feita
+        k_sweep, k_selection_reason = None, None
+        print(f"Backend '{config.CLUSTERING_BACKEND}': número de clusters definido pela densidade (sem varredura de k).")
+    elif update is not None:
+        # A varredura e a escolha de k do último ajuste completo são mantidas
+        k_sweep = update.state.k_sweep
+        k_selection_reason = (f"{update.state.k_selection_reason} (mantido na atualização incremental "
+                              f"nº {update.state.n_updates})")
+        print(f"Número de clusters mantido do último ajuste completo: k={update.state.model.n_clusters}.")
+    else:
+        k_sweep = stage_cache.cached_stage('varredura_k', sweep_key,
+                                           lambda: clustering.run_k_sweep(X_fit, config.K_RANGE))
+        # A escolha de k segue config.K_SELECTION_STRATEGY ('manual' usa config.OPTIMAL_K)
+        optimal_k, k_selection_reason = clustering.select_optimal_k(k_sweep, X_pca=X_fit)
+    profiler.record_k_sweep(k_sweep)
 
-    # 7. Aplicar K-Means
-    print("\n--- Etapa 7: Aplicando K-Means ---")
-    cluster_labels, kmeans_model = clustering.apply_kmeans(X_pca_data, config.OPTIMAL_K)
+    # 7. Aplicar K-Means (ou o clustering por densidade)
+    profiler.start_stage(7, "Aplicando Clustering por Densidade" if density_backend else "Aplicando K-Means",
+                         rows=len(df_best))
+    if update is not None:
+        # Só os modelos que entraram no conjunto dos melhores foram atribuídos (predict)
+        cluster_labels, kmeans_model = update.labels, update.state.model
+    else:
+        if density_backend:
+            kmeans_key = stage_cache.make_key(pca_key, config.CLUSTERING_BACKEND, config.DENSITY_MIN_CLUSTER_SIZE,
+                                              config.DENSITY_MIN_SAMPLES, config.DBSCAN_EPS, config.DUPLICATE_RADIUS)
+            cluster_labels, kmeans_model = stage_cache.cached_stage('densidade', kmeans_key,
+                                                                    lambda: clustering.apply_density_clustering(X_fit))
+        elif chunk_size and config.CLUSTERING_BACKEND == 'minibatch':
+            # Modo em blocos: o MiniBatchKMeans consome os dados em blocos de chunk_size linhas
+            # (partial_fit) e atribui os rótulos em uma segunda passada
+            kmeans_key = stage_cache.make_key(sweep_key, optimal_k, 'blocos')
+            cluster_labels, kmeans_model = stage_cache.cached_stage('kmeans', kmeans_key, lambda: clustering.fit_minibatch_kmeans_stream(
+                lambda: (X_fit[start:start + chunk_size] for start in range(0, len(X_fit), chunk_size)), optimal_k))
+        else:
+            kmeans_key = stage_cache.make_key(sweep_key, optimal_k)
+            cluster_labels, kmeans_model = stage_cache.cached_stage('kmeans', kmeans_key,
+                                                                    lambda: clustering.apply_kmeans(X_fit, optimal_k, sweep=k_sweep))
+        if duplicates is not None:
+            # Cada simulação recebe o rótulo do representante do seu grupo
+            cluster_labels = cluster_labels[duplicates.group_of_row]
+    consensus_result = None
+    if config.CONSENSUS_MODE and density_backend:
+        print("Aviso: O clustering de consenso usa o K-Means; ignorado com o backend por densidade.")
+    elif config.CONSENSUS_MODE and update is None:
+        # Rótulos por votação de várias execuções, alinhadas ao K-Means acima
+        consensus_key = stage_cache.make_key(kmeans_key, config.CONSENSUS_RUNS, config.CONSENSUS_SAMPLE_FRACTION)
+        consensus_result = stage_cache.cached_stage('consenso', consensus_key,
+                                                    lambda: consensus.run_consensus(X_pca_data, cluster_labels,
+                                                                                    kmeans_model.cluster_centers_))
+        cluster_labels = consensus_result.labels
+        kmeans_model = consensus.consensus_model(kmeans_model, consensus_result)
+    clustering_quality = None
+    if config.CLUSTERING_BACKEND == 'minibatch':
+        clustering_quality = clustering.evaluate_clustering_quality(X_pca_data, kmeans_model)
 
-    # Adiciona rótulos aos DataFrames relevantes
-    df_best['Cluster'] = cluster_labels
-    X_scaled_data['Cluster'] = cluster_labels # Adicionado ao escalado também
-    X_parameters['Cluster'] = cluster_labels  # Adicionado ao original (não escalado)
+    # Os rótulos são guardados uma única vez; df_best recebe a coluna para gráficos e relatórios
+    data.labels = cluster_labels
+    df_best['Cluster'] = data.labels
+    X_parameters = df_best[parameter_columns + ['Cluster']] # Parâmetros originais (não escalados), sem cópia
+    if consensus_result is not None:
+        df_best['Concordancia_Consenso'] = consensus_result.agreement
 
     # 8. Analisar Clusters
-    print("\n--- Etapa 8: Analisando Clusters ---")
-    parameter_columns = [col for col in X_parameters.columns if col != 'Cluster'] # Nomes originais
-    centroids_df = clustering.analyze_clusters(df_best, X_scaled_data, kmeans_model, fitted_scaler, fitted_pca, parameter_columns)
+    profiler.start_stage(8, "Analisando Clusters", rows=len(df_best))
+    centroids_df = clustering.analyze_clusters(df_best, X_scaled_data, kmeans_model, fitted_scaler, fitted_pca, parameter_columns,
+                                               stability=consensus_result.stability if consensus_result is not None else None)
+    # df_best está em memória (também no modo em blocos): estatísticas exatas
     of_stats_df = clustering.analyze_of_by_cluster(df_best, 'OF Value')
 
-    # 9. Gerar Gráficos de Visualização
-    print("\n--- Etapa 9: Gerando Gráficos de Visualização ---")
-    plotting.plot_of_scatter(df_cleaned, df_best, 'Simulation', 'OF Value', config.PLOT_OF_SCATTER)
-    plotting.plot_pca_clusters(X_pca_data, cluster_labels, fitted_pca, config.PLOT_PCA_CLUSTERS)
-    plotting.plot_parameter_boxplots(X_parameters, config.PLOT_BOXPLOTS) # Usa X_parameters original com 'Cluster'
-
-    # 10. Salvar Resultados Intermediários e Finais (Arquivos Excel)
-    print("\n--- Etapa 10: Salvando Resultados em Excel ---")
-    # Salva todos os melhores modelos com seus clusters
-    df_best_sorted = df_best.sort_values(by=['Cluster', 'OF Value'])
-    df_best_sorted.to_excel(config.OUTPUT_CLUSTER_RESULTS)
-    print(f"  - DataFrame com clusters salvo em '{config.OUTPUT_CLUSTER_RESULTS}'")
-
-    # Encontra e salva os melhores de cada cluster
-    idx_best = df_best.groupby('Cluster')['OF Value'].idxmin()
-    best_per_cluster_df = df_best.loc[idx_best]
+    # 9. Analisar a Sensibilidade dos Parâmetros (ensemble completo e melhores modelos)
+    sensitivity_result = None
+    if config.SENSITIVITY_ANALYSIS:
+        profiler.start_stage(9, "Analisando Sensibilidade dos Parâmetros", rows=len(df_cleaned))
+        sensitivity_result = sensitivity.run_sensitivity(df_cleaned, df_best, data.labels, fitted_pca, parameter_columns)
+
+    # 10. Gerar Gráficos de Visualização
+    profiler.start_stage(10, "Gerando Gráficos de Visualização", rows=len(df_best))
+    # Figuras independentes são renderizadas em paralelo; cada job recebe só os dados que desenha
+    if len(X_parameters) > config.BOXPLOT_QUANTILE_THRESHOLD:
+        # Muitos modelos: boxplots desenhados a partir de quartis pré-calculados
+        boxplot_job = (plotting.plot_parameter_boxplots, (None, config.PLOT_BOXPLOTS),
+                       {'boxplot_stats': plotting.compute_boxplot_stats(X_parameters)})
+    else:
+        boxplot_job = (plotting.plot_parameter_boxplots, (X_parameters, config.PLOT_BOXPLOTS), {}) # Usa X_parameters original com 'Cluster'
+    plot_jobs = []
+    if k_sweep is not None:
+        sweep_metrics = k_sweep.without_models()
+        plot_jobs += [
+            (clustering.plot_elbow_method, (None, config.K_RANGE, config.PLOT_ELBOW), {'sweep': sweep_metrics}),
+            (clustering.plot_silhouette_scores, (None, config.K_RANGE, config.PLOT_SILHOUETTE), {'sweep': sweep_metrics}),
+        ]
+    plotting.render_plots(plot_jobs + [
+        (plotting.plot_of_scatter, (df_cleaned[['Simulation', 'OF Value']], df_best[['Simulation', 'OF Value']],
+                                    'Simulation', 'OF Value', config.PLOT_OF_SCATTER),
+         {'best_label': f"Frentes de Pareto 0 a {pareto_summary['last_front']}"} if pareto_summary else {}),
+        (plotting.plot_pca_clusters, (X_pca_data[:, :2], cluster_labels, fitted_pca, config.PLOT_PCA_CLUSTERS), {}),
+        boxplot_job,
+    ])
+
+    # 11. Salvar Resultados Intermediários e Finais
+    profiler.start_stage(11, "Salvando Resultados", rows=len(df_best))
+    # Salva todos os melhores modelos com seus clusters (em blocos, formato colunar; Excel opcional)
+    for path in output_writer.write_cluster_results(df_best):
+        print(f"  - DataFrame com clusters salvo em '{path}'")
+
+    # Encontra e salva os melhores de cada cluster (CHAMPIONS_PER_CLUSTER linhas por cluster,
+    # a pelo menos CHAMPION_MIN_DISTANCE uns dos outros no espaço PCA)
+    champion_positions, champion_ranks = spatial_index.select_champions(
+        X_pca_data, data.of_values, data.labels, config.CHAMPIONS_PER_CLUSTER, config.CHAMPION_MIN_DISTANCE)
+    best_per_cluster_df = df_best.iloc[champion_positions]
+    if config.CHAMPIONS_PER_CLUSTER > 1:
+        best_per_cluster_df.insert(0, 'Posto_no_Cluster', champion_ranks)
     best_per_cluster_df.to_excel(config.OUTPUT_BEST_PER_CLUSTER)
     print(f"  - Melhores modelos por cluster salvos em '{config.OUTPUT_BEST_PER_CLUSTER}'")
 
-    # 11. Gerar Relatório Final
-    print("\n--- Etapa 11: Gerando Relatório Markdown ---")
+    if sensitivity_result is not None:
+        for path in sensitivity.write_sensitivity(sensitivity_result):
+            print(f"  - Tabela de sensibilidade dos parâmetros salva em '{path}'")
+
+    if config.SAVE_MODEL_BUNDLE:
+        bundle_dir = model_bundle.save_pipeline_bundle(fitted_scaler, fitted_pca, kmeans_model, parameter_columns)
+        print(f"  - Pacote do modelo (scaler, PCA e centróides) salvo em '{bundle_dir}'")
+
+    if incremental_mode:
+        # Estado para a próxima execução incremental
+        if update is not None:
+            incremental_state = update.state
+        else:
+            incremental_state = incremental.build_state(df_cleaned, df_best, X_parameters[parameter_columns],
+                                                        X_pca_data, cluster_labels, fitted_scaler, fitted_pca,
+                                                        kmeans_model, k_sweep, k_selection_reason)
+        incremental.save_state(incremental_state)
+
+    # 12. Gerar Relatório Final
+    profiler.start_stage(12, "Gerando Relatório Markdown", rows=len(df_best))
     report_generator.generate_markdown_report(config.OUTPUT_REPORT,
                                                 df_cleaned,
                                                 df_best, # Já contém a coluna 'Cluster'
@@ -89,11 +304,40 @@ def main():
                                                 kmeans_model, # Passando o modelo kmeans
                                                 centroids_df,
                                                 of_stats_df,
-                                                best_per_cluster_df)
+                                                best_per_cluster_df,
+                                                k_sweep=k_sweep,
+                                                clustering_quality=clustering_quality,
+                                                k_selection_reason=k_selection_reason,
+                                                incremental_summary=update.summary if update is not None else None,
+                                                consensus_result=consensus_result,
+                                                sensitivity_result=sensitivity_result,
+                                                pareto_summary=pareto_summary,
+                                                duplicates=duplicates,
+                                                performance=profiler)
 
+    profiler.finish()
+    for path in profiler.write():
+        print(f"  - Medidas de desempenho salvas em '{path}'")
+    stage_cache.evict()
     print("\n--- Pipeline de Análise de Calibração Concluído ---")
+    return {
+        'input_file': config.INPUT_FILE,
+        'results_dir': config.RESULTS_DIR,
+        'n_simulations': len(df_cleaned),
+        'n_best': len(df_best),
+        'n_clusters': kmeans_model.n_clusters,
+    }
 
 # --- Ponto de Entrada do Script ---
 # Este código só será executado se você rodar este arquivo diretamente (python main.py)
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa a análise de calibração.")
+    parser.add_argument('input_file', nargs='?', default=None,
+                        help="Arquivo de calibração. Padrão: config.INPUT_FILE.")
+    parser.add_argument('--results-dir', default=None, help="Diretório de resultados.")
+    config.add_cli_arguments(parser)
+    args = parser.parse_args()
+    config.update(**config.load_overrides(args.config_file, args.assignments))
+    if args.input_file or args.results_dir:
+        config.configure(args.input_file or config.INPUT_FILE, args.results_dir)
     main()
\ No newline at end of file
@@ -0,0 +1,242 @@
+# model_bundle.py
+"""
+Módulo para salvar a cadeia ajustada (StandardScaler -> PCA -> centróides) como
+um pacote versionado e classificar novos vetores de parâmetros sem rodar o pipeline.
+
+O pacote é um diretório com arrays .npy (lidos com mmap) e um manifest.json com
+a versão do formato, a ordem das colunas de parâmetros, o dtype e as formas dos
+arrays. Escalonamento e PCA são lineares, então são fundidos em uma única
+projeção afim:
+
+    Z = ((X - média) / escala - média_pca) @ componentes.T = X @ projection + offset
+
+de modo que classificar um vetor custa um produto matriz-vetor e k distâncias.
+
+Uso típico (ex.: no laço de um otimizador):
+
+    scorer = model_bundle.load_bundle('results_.../modelo')
+    coords, label, distance = scorer.score_one(x)
+    result = scorer.score(X_candidates)   # lote (n, n_parâmetros) ou DataFrame
+"""
+
+import os
+import json
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+
+# Versão do formato do pacote. Incremente ao mudar os arrays ou o manifest.
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILENAME = 'manifest.json'
+BUNDLE_ARRAYS = ('projection', 'offset', 'centers')
+
+@dataclass
+class ScoreResult:
+    """
+    Resultado da classificação de um lote de vetores de parâmetros.
+
+    Attributes:
+        pca (numpy.ndarray): Coordenadas PCA, forma (n, n_componentes).
+        labels (numpy.ndarray): Cluster mais próximo de cada vetor.
+        distances (numpy.ndarray): Distância euclidiana (no espaço PCA) ao centróide do cluster.
+    """
+    pca: np.ndarray
+    labels: np.ndarray
+    distances: np.ndarray
+
+def _fused_projection(scaler, pca):
+    """Funde StandardScaler e PCA em X @ projection + offset."""
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.scale_ is not None else np.ones_like(mean)
+    components = np.asarray(pca.components_, dtype=np.float64)
+    if getattr(pca, 'whiten', False):
+        components = components / np.sqrt(pca.explained_variance_)[:, None]
+    projection = (components / scale).T
+    offset = -(mean / scale + np.asarray(pca.mean_, dtype=np.float64)) @ components.T
+    return projection, offset
+
+def save_bundle(bundle_dir, scaler, pca, model, parameter_columns, dtype='float64', metadata=None):
+    """
+    Salva a cadeia ajustada como pacote versionado (arrays .npy + manifest.json).
+
+    Args:
+        bundle_dir (str): Diretório do pacote (criado se não existir).
+        scaler (sklearn.preprocessing.StandardScaler): Scaler ajustado.
+        pca (sklearn.decomposition.PCA or IncrementalPCA): PCA ajustado.
+        model: Modelo de clustering com cluster_centers_ no espaço PCA.
+        parameter_columns (list): Nomes das colunas de parâmetros, na ordem do ajuste.
+        dtype (str): Dtype dos arrays e das entradas aceitas por Scorer ('float64' ou 'float32').
+        metadata (dict, optional): Informações extras gravadas no manifest (ex.: arquivo de entrada).
+
+    Returns:
+        str: O caminho do manifest gravado.
+    """
+    projection, offset = _fused_projection(scaler, pca)
+    centers = np.asarray(model.cluster_centers_, dtype=np.float64)
+    if projection.shape[0] != len(parameter_columns) or centers.shape[1] != projection.shape[1]:
+        raise ValueError("Dimensões incompatíveis entre scaler, PCA, centróides e colunas de parâmetros.")
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    arrays = {'projection': projection, 'offset': offset, 'centers': centers}
+    shapes = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=dtype)
+        np.save(os.path.join(bundle_dir, f"{name}.npy"), array)
+        shapes[name] = list(array.shape)
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'parameter_columns': list(parameter_columns),
+        'dtype': np.dtype(dtype).name,
+        'n_components': int(projection.shape[1]),
+        'n_clusters': int(centers.shape[0]),
+        'shapes': shapes,
+        'metadata': metadata or {},
+    }
+    # O manifest é gravado por último (e de forma atômica): um pacote sem manifest está incompleto
+    manifest_path = os.path.join(bundle_dir, MANIFEST_FILENAME)
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+def load_bundle(bundle_dir, mmap=True):
+    """
+    Carrega um pacote salvo por save_bundle, verificando versão, dtype e formas.
+
+    Args:
+        bundle_dir (str): Diretório do pacote.
+        mmap (bool): Se os arrays são mapeados em memória (mmap_mode='r') em vez de copiados.
+
+    Returns:
+        Scorer: O classificador pronto para uso.
+    """
+    manifest_path = os.path.join(bundle_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Manifest não encontrado em '{bundle_dir}'.")
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Versão do pacote incompatível: {manifest.get('format_version')} "
+                         f"(esperada: {BUNDLE_FORMAT_VERSION}).")
+
+    arrays = {}
+    for name in BUNDLE_ARRAYS:
+        array = np.load(os.path.join(bundle_dir, f"{name}.npy"), mmap_mode='r' if mmap else None,
+                        allow_pickle=False)
+        if array.dtype.name != manifest['dtype'] or list(array.shape) != manifest['shapes'][name]:
+            raise ValueError(f"Array '{name}' do pacote não corresponde ao manifest "
+                             f"({array.dtype.name} {list(array.shape)}).")
+        arrays[name] = array
+    return Scorer(arrays['projection'], arrays['offset'], arrays['centers'], manifest)
+
+class Scorer:
+    """
+    Classificador de vetores de parâmetros: projeção afim para o espaço PCA e
+    atribuição ao centróide mais próximo.
+
+    Args:
+        projection (numpy.ndarray): Matriz (n_parâmetros, n_componentes).
+        offset (numpy.ndarray): Deslocamento (n_componentes,).
+        centers (numpy.ndarray): Centróides no espaço PCA (k, n_componentes).
+        manifest (dict): Manifest do pacote (ordem das colunas e dtype).
+    """
+
+    def __init__(self, projection, offset, centers, manifest):
+        # np.asarray tira a subclasse memmap (cujas operações são mais lentas) sem copiar os dados
+        self.projection = np.asarray(projection)
+        self.offset = np.asarray(offset)
+        self.centers = np.asarray(centers)
+        self.manifest = manifest
+        self.parameter_columns = list(manifest['parameter_columns'])
+        self.dtype = np.dtype(manifest['dtype'])
+        # ||c||² pré-calculado para as distâncias em lote
+        self._center_sq_norms = np.einsum('ij,ij->i', self.centers, self.centers)
+
+    @property
+    def n_features(self):
+        return len(self.parameter_columns)
+
+    def _as_matrix(self, X):
+        """Converte a entrada para uma matriz (n, n_parâmetros) no dtype e na ordem do ajuste."""
+        if isinstance(X, pd.DataFrame):
+            missing = [col for col in self.parameter_columns if col not in X.columns]
+            if missing:
+                raise ValueError(f"Colunas de parâmetros ausentes: {missing}")
+            X = X[self.parameter_columns].to_numpy()
+        elif isinstance(X, pd.Series):
+            missing = [col for col in self.parameter_columns if col not in X.index]
+            if missing:
+                raise ValueError(f"Parâmetros ausentes: {missing}")
+            X = X[self.parameter_columns].to_numpy()
+        X = np.asarray(X)
+        if X.dtype.kind not in 'fiub':
+            raise TypeError(f"Os parâmetros devem ser numéricos (dtype recebido: {X.dtype}).")
+        X = np.atleast_2d(X).astype(self.dtype, copy=False)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Esperados {self.n_features} parâmetros por vetor "
+                             f"({', '.join(self.parameter_columns)}); recebida a forma {X.shape}.")
+        if not np.isfinite(X).all():
+            raise ValueError("Os parâmetros contêm NaN ou infinito.")
+        return X
+
+    def transform(self, X):
+        """Coordenadas PCA de um ou mais vetores de parâmetros."""
+        return self._as_matrix(X) @ self.projection + self.offset
+
+    def score(self, X):
+        """
+        Classifica um lote de vetores de parâmetros.
+
+        Args:
+            X (array-like or pandas.DataFrame): Vetor (n_parâmetros,), matriz (n, n_parâmetros)
+                                                ou DataFrame com as colunas de parâmetros.
+
+        Returns:
+            ScoreResult: Coordenadas PCA, cluster e distância ao centróide de cada vetor.
+        """
+        Z = self.transform(X)
+        # ||z - c||² = ||z||² - 2 z·c + ||c||², sem materializar o tensor (n, k, d)
+        sq_dist = Z @ self.centers.T
+        sq_dist *= -2.0
+        sq_dist += self._center_sq_norms
+        labels = sq_dist.argmin(axis=1)
+        nearest = sq_dist[np.arange(len(Z)), labels] + np.einsum('ij,ij->i', Z, Z)
+        return ScoreResult(pca=Z, labels=labels, distances=np.sqrt(np.maximum(nearest, 0.0)))
+
+    def score_one(self, x):
+        """
+        Classifica um único vetor de parâmetros (caminho de baixa latência: só a
+        forma é verificada; a ordem dos parâmetros deve ser a de parameter_columns).
+
+        Args:
+            x (array-like): Vetor com os parâmetros na ordem de parameter_columns.
+
+        Returns:
+            tuple: (coordenadas PCA, cluster, distância ao centróide).
+        """
+        x = np.asarray(x, dtype=self.dtype)
+        if x.shape != (self.n_features,):
+            raise ValueError(f"Esperado um vetor com {self.n_features} parâmetros; recebida a forma {x.shape}.")
+        z = x @ self.projection + self.offset
+        diff = self.centers - z
+        sq_dist = np.einsum('ij,ij->i', diff, diff)
+        label = int(sq_dist.argmin())
+        return z, label, float(np.sqrt(sq_dist[label]))
+
+def save_pipeline_bundle(scaler, pca, model, parameter_columns, bundle_dir=None):
+    """
+    Salva o pacote da execução atual em config.MODEL_BUNDLE_DIR. Com um backend por
+    densidade, os centróides são as médias dos clusters e o ruído não é representado:
+    o Scorer atribui todo vetor ao cluster de centróide mais próximo.
+    """
+    bundle_dir = bundle_dir or config.MODEL_BUNDLE_DIR
+    metadata = {'input_file': os.path.basename(config.INPUT_FILE),
+                'clustering_backend': config.CLUSTERING_BACKEND}
+    save_bundle(bundle_dir, scaler, pca, model, parameter_columns, dtype=config.MODEL_BUNDLE_DTYPE,
+                metadata=metadata)
+    return bundle_dir
@@ -0,0 +1,145 @@
+# output_writer.py
+"""
+Módulo de escrita dos resultados por simulação.
+
+Os resultados volumosos (todos os melhores modelos com seus clusters) são
+gravados em blocos de linhas, em formato colunar comprimido (Parquet) ou em
+CSV comprimido (gzip), com memória e tempo proporcionais a cada bloco. O Excel,
+bem mais lento de escrever com openpyxl, é opcional e limitado a
+config.EXCEL_MAX_ROWS linhas.
+"""
+
+import os
+import gzip
+import numpy as np
+import config # Importa as configurações
+
+OUTPUT_FORMATS = {'parquet': '.parquet', 'csv.gz': '.csv.gz'}
+
+def output_path(base_path, fmt=None):
+    """
+    Troca a extensão de um caminho de saída pela do formato colunar escolhido.
+
+    Args:
+        base_path (str): Caminho de referência (ex.: config.OUTPUT_CLUSTER_RESULTS).
+        fmt (str, optional): 'parquet' ou 'csv.gz'. Padrão: config.OUTPUT_FORMAT.
+
+    Returns:
+        str: O caminho com a nova extensão.
+    """
+    fmt = fmt or config.OUTPUT_FORMAT
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de saída desconhecido: '{fmt}'. Use um de {list(OUTPUT_FORMATS)}.")
+    return os.path.splitext(base_path)[0] + OUTPUT_FORMATS[fmt]
+
+def _iter_row_blocks(df, order, chunk_size):
+    """Gera blocos de df na ordem de linhas 'order', sem copiar o DataFrame inteiro."""
+    for start in range(0, len(order), chunk_size):
+        yield df.iloc[order[start:start + chunk_size]]
+
+def _write_parquet(blocks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for block in blocks:
+            table = pa.Table.from_pandas(block, preserve_index=True)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table) # Um row group por bloco
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _write_csv_gz(blocks, path):
+    with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6) as f:
+        for i, block in enumerate(blocks):
+            block.to_csv(f, header=(i == 0))
+
+def write_table(df, base_path, sort_by=None, fmt=None, chunk_size=None):
+    """
+    Grava um DataFrame em blocos, em formato colunar comprimido.
+
+    Args:
+        df (pd.DataFrame): Dados a gravar (o índice também é gravado).
+        base_path (str): Caminho de referência; a extensão é trocada pela do formato.
+        sort_by (list, optional): Colunas de ordenação. A ordenação é feita por
+                                  índices (np.lexsort), sem criar uma cópia ordenada.
+        fmt (str, optional): 'parquet' ou 'csv.gz'. Padrão: config.OUTPUT_FORMAT.
+        chunk_size (int, optional): Linhas por bloco. Padrão: config.OUTPUT_CHUNK_SIZE.
+
+    Returns:
+        str: O caminho do arquivo gravado.
+    """
+    fmt = fmt or config.OUTPUT_FORMAT
+    chunk_size = chunk_size or config.OUTPUT_CHUNK_SIZE
+    path = output_path(base_path, fmt)
+
+    if sort_by:
+        # np.lexsort ordena pela última chave primeiro; é estável como sort_values
+        order = np.lexsort([df[col].to_numpy() for col in reversed(sort_by)])
+    else:
+        order = np.arange(len(df))
+
+    if fmt == 'parquet':
+        try:
+            _write_parquet(_iter_row_blocks(df, order, chunk_size), path)
+            return path
+        except ImportError:
+            print("Aviso: pyarrow não está instalado; gravando em CSV comprimido.")
+            fmt, path = 'csv.gz', output_path(base_path, 'csv.gz')
+    _write_csv_gz(_iter_row_blocks(df, order, chunk_size), path)
+    return path
+
+def write_excel(df, path, max_rows=None):
+    """
+    Grava um DataFrame em Excel, limitado às primeiras max_rows linhas.
+
+    Args:
+        df (pd.DataFrame): Dados a gravar (já na ordem desejada).
+        path (str): Caminho do arquivo .xlsx.
+        max_rows (int, optional): Máximo de linhas. Padrão: config.EXCEL_MAX_ROWS.
+
+    Returns:
+        int: Número de linhas gravadas.
+    """
+    max_rows = max_rows if max_rows is not None else config.EXCEL_MAX_ROWS
+    if max_rows is not None and len(df) > max_rows:
+        print(f"  Aviso: Excel limitado às primeiras {max_rows} de {len(df)} linhas; "
+              f"a tabela completa está no arquivo colunar.")
+        df = df.iloc[:max_rows]
+    df.to_excel(path)
+    return len(df)
+
+def write_cluster_results(df_best, base_path=None, write_excel_copy=None):
+    """
+    Grava todos os melhores modelos ordenados por cluster e OF: sempre no formato
+    colunar e, opcionalmente, em Excel com limite de linhas.
+
+    Args:
+        df_best (pd.DataFrame): Melhores modelos com a coluna 'Cluster'.
+        base_path (str, optional): Caminho de referência. Padrão: config.OUTPUT_CLUSTER_RESULTS.
+        write_excel_copy (bool, optional): Se também grava o Excel. Padrão: config.WRITE_EXCEL.
+
+    Returns:
+        list: Caminhos dos arquivos gravados.
+    """
+    base_path = base_path or config.OUTPUT_CLUSTER_RESULTS
+    write_excel_copy = config.WRITE_EXCEL if write_excel_copy is None else write_excel_copy
+    sort_by = ['Cluster', 'OF Value']
+
+    paths = [write_table(df_best, base_path, sort_by=sort_by)]
+    if write_excel_copy:
+        max_rows = config.EXCEL_MAX_ROWS
+        if max_rows is not None and len(df_best) > max_rows:
+            # Copia só as primeiras max_rows linhas na ordem final
+            print(f"  Aviso: Excel limitado às primeiras {max_rows} de {len(df_best)} linhas; "
+                  f"a tabela completa está no arquivo colunar.")
+            order = np.lexsort([df_best['OF Value'].to_numpy(), df_best['Cluster'].to_numpy()])[:max_rows]
+            head = df_best.iloc[order]
+        else:
+            head = df_best.sort_values(by=sort_by)
+        write_excel(head, base_path, max_rows)
+        paths.append(base_path)
+    return paths
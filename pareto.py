@@ -0,0 +1,224 @@
+# pareto.py
+"""
+Ordenação não dominada (frentes de Pareto) e distância de aglomeração
+(crowding distance, NSGA-II) para a seleção multiobjetivo dos melhores modelos.
+
+Todos os objetivos são minimizados. Um modelo domina outro se não é pior em
+nenhum objetivo e é melhor em pelo menos um; a frente 0 contém os modelos não
+dominados, a frente 1 os que só são dominados pela frente 0, e assim por diante.
+
+- 1 objetivo: a frente é o posto denso do valor (O(n log n)).
+- 2 objetivos: varredura em ordem lexicográfica com busca binária sobre o
+  menor segundo objetivo de cada frente (O(n log n)).
+- 3 ou mais: Efficient Non-dominated Sort com busca binária (ENS-BS), com
+  as comparações de dominância vetorizadas em blocos de linhas. O custo cresce
+  com o número de linhas vezes o tamanho das frentes: objetivos correlacionados
+  (o caso usual de desajustes de poços) dão frentes pequenas e ordenação rápida.
+
+Linhas duplicadas (mesmos valores em todos os objetivos) não se dominam e
+são ordenadas uma única vez.
+"""
+
+from bisect import bisect_right
+import numpy as np
+
+# Limite de comparações (linhas x colunas) de cada bloco da comparação de dominância
+DOMINANCE_BLOCK_ELEMENTS = 4_000_000
+
+def _fronts_single(values):
+    """Frentes com um objetivo: posto denso do valor."""
+    return np.unique(values, return_inverse=True)[1]
+
+def _fronts_two(F):
+    """Frentes com dois objetivos, O(n log n)."""
+    order = np.lexsort((F[:, 1], F[:, 0]))
+    second = F[order, 1].tolist()
+    fronts_sorted = np.empty(len(order), dtype=np.int64)
+    # front_min[k]: menor segundo objetivo da frente k (não decrescente em k)
+    front_min = []
+    for i, value in enumerate(second):
+        # Com o primeiro objetivo já em ordem, a frente k domina o ponto se front_min[k] <= value
+        k = bisect_right(front_min, value)
+        if k == len(front_min):
+            front_min.append(value)
+        else:
+            front_min[k] = value
+        fronts_sorted[i] = k
+    fronts = np.empty_like(fronts_sorted)
+    fronts[order] = fronts_sorted
+    return fronts
+
+def _weakly_dominated(candidates, reference):
+    """
+    Máscara dos candidatos com algum ponto de reference <= em todas as colunas
+    (comparação vetorizada, em blocos de até DOMINANCE_BLOCK_ELEMENTS pares).
+    """
+    dominated = np.zeros(len(candidates), dtype=bool)
+    if len(reference) == 0:
+        return dominated
+    step = max(1, DOMINANCE_BLOCK_ELEMENTS // len(reference))
+    for start in range(0, len(candidates), step):
+        block = candidates[start:start + step]
+        not_worse = reference[None, :, 0] <= block[:, 0, None]
+        for d in range(1, candidates.shape[1]):
+            not_worse &= reference[None, :, d] <= block[:, d, None]
+        dominated[start:start + step] = not_worse.any(axis=1)
+    return dominated
+
+def _fronts_many(F, block_size=1024):
+    """
+    Frentes com três ou mais objetivos (Efficient Non-dominated Sort com busca
+    binária, vetorizado por blocos).
+
+    Com as linhas (sem duplicatas) em ordem lexicográfica, só uma linha anterior
+    pode dominar uma posterior, e basta comparar os demais objetivos (<=). A
+    frente de cada linha é a primeira que não a domina; como a frente k só domina
+    uma linha se a frente k-1 também a domina, ela é encontrada por busca binária
+    sobre as frentes já formadas, para todas as linhas do bloco de uma vez. A
+    dominância dentro do próprio bloco é resolvida em seguida, em ordem.
+    """
+    order = np.lexsort(F.T[::-1])
+    rest = np.ascontiguousarray(F[order, 1:])
+    fronts_sorted = np.empty(len(order), dtype=np.int64)
+    members = [] # members[k]: demais objetivos dos pontos da frente k
+
+    for start in range(0, len(order), block_size):
+        block = rest[start:start + block_size]
+        n_block = len(block)
+        lo = np.zeros(n_block, dtype=np.int64)
+        hi = np.full(n_block, len(members), dtype=np.int64)
+        active = np.flatnonzero(lo < hi)
+        while len(active):
+            mid = (lo[active] + hi[active]) // 2
+            for k in np.unique(mid):
+                rows = active[mid == k]
+                dominated = _weakly_dominated(block[rows], members[k])
+                lo[rows[dominated]] = k + 1
+                hi[rows[~dominated]] = k
+            active = active[lo[active] < hi[active]]
+
+        # Dominância dentro do bloco: a linha j pode ser dominada pelas linhas i < j
+        inner = block[None, :, 0] <= block[:, 0, None]
+        for d in range(1, block.shape[1]):
+            inner &= block[None, :, d] <= block[:, d, None]
+        inner &= np.tri(n_block, k=-1, dtype=bool)
+        for j in np.flatnonzero(inner.any(axis=1)):
+            lo[j] = max(lo[j], lo[:j][inner[j, :j]].max() + 1)
+
+        fronts_sorted[start:start + n_block] = lo
+        for k in np.unique(lo):
+            new_members = block[lo == k]
+            if k == len(members):
+                members.append(new_members)
+            else:
+                members[k] = np.concatenate([members[k], new_members])
+
+    fronts = np.empty_like(fronts_sorted)
+    fronts[order] = fronts_sorted
+    return fronts
+
+def non_dominated_fronts(F):
+    """
+    Frente de Pareto (0 = não dominada) de cada linha de F.
+
+    Args:
+        F (numpy.ndarray): Objetivos (n, n_objetivos), todos a minimizar.
+
+    Returns:
+        numpy.ndarray: Frente de cada linha.
+    """
+    F = np.asarray(F, dtype=np.float64)
+    if F.ndim == 1:
+        F = F[:, None]
+    if len(F) == 0:
+        return np.empty(0, dtype=np.int64)
+    unique_F, inverse = np.unique(F, axis=0, return_inverse=True)
+    if unique_F.shape[1] == 1:
+        fronts = _fronts_single(unique_F[:, 0])
+    elif unique_F.shape[1] == 2:
+        fronts = _fronts_two(unique_F)
+    else:
+        fronts = _fronts_many(unique_F)
+    return fronts[inverse.ravel()]
+
+def crowding_distance(F):
+    """
+    Distância de aglomeração (NSGA-II) de cada linha dentro do seu conjunto.
+    Os extremos de cada objetivo recebem distância infinita.
+
+    Args:
+        F (numpy.ndarray): Objetivos (n, n_objetivos) de uma mesma frente.
+
+    Returns:
+        numpy.ndarray: Distância de cada linha (maior = região menos povoada).
+    """
+    F = np.asarray(F, dtype=np.float64)
+    n_rows = len(F)
+    distance = np.zeros(n_rows)
+    if n_rows <= 2:
+        distance[:] = np.inf
+        return distance
+    for d in range(F.shape[1]):
+        order = np.argsort(F[:, d], kind='stable')
+        values = F[order, d]
+        spread = values[-1] - values[0]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if spread > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / spread
+    return distance
+
+def select_by_fronts(F, target_count):
+    """
+    Seleciona target_count linhas por frentes de Pareto; a última frente
+    necessária é truncada pelas maiores distâncias de aglomeração.
+
+    Args:
+        F (numpy.ndarray): Objetivos (n, n_objetivos), todos a minimizar.
+        target_count (int): Número de linhas a selecionar.
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Posições selecionadas (em ordem crescente).
+            - numpy.ndarray: Frente de cada linha de F.
+    """
+    F = np.asarray(F, dtype=np.float64)
+    target_count = int(min(max(target_count, 0), len(F)))
+    fronts = non_dominated_fronts(F)
+    if len(F) == 0:
+        return np.empty(0, dtype=np.int64), fronts
+    # Frente em que a contagem acumulada atinge target_count
+    cumulative = np.cumsum(np.bincount(fronts))
+    last_front = int(np.searchsorted(cumulative, target_count))
+    selected = np.flatnonzero(fronts < last_front)
+    n_missing = target_count - len(selected)
+    if n_missing > 0:
+        last_members = np.flatnonzero(fronts == last_front)
+        distance = crowding_distance(F[last_members])
+        keep = np.argsort(-distance, kind='stable')[:n_missing]
+        selected = np.concatenate([selected, last_members[keep]])
+    return np.sort(selected), fronts
+
+def summarize_selection(fronts, selected, objective_columns):
+    """
+    Resumo da seleção por frentes, para o relatório.
+
+    Args:
+        fronts (numpy.ndarray): Frente de cada linha (ver non_dominated_fronts).
+        selected (numpy.ndarray): Posições selecionadas por select_by_fronts.
+        objective_columns (list): Nomes dos objetivos.
+
+    Returns:
+        dict: Objetivos, total de frentes, modelos não dominados e a última frente
+        usada, com quantos de seus modelos foram selecionados.
+    """
+    last_front = int(fronts[selected].max()) if len(selected) else -1
+    return {
+        'objectives': list(objective_columns),
+        'n_rows': len(fronts),
+        'n_selected': len(selected),
+        'n_fronts': int(fronts.max()) + 1 if len(fronts) else 0,
+        'n_nondominated': int((fronts == 0).sum()),
+        'last_front': last_front,
+        'last_front_size': int((fronts == last_front).sum()),
+        'last_front_selected': int((fronts[selected] == last_front).sum()),
+    }
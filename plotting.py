@@ -2,71 +2,185 @@
 """
 Módulo para gerar as visualizações da análise de calibração,
 como gráficos de dispersão, PCA e boxplots. Salva os gráficos em arquivos.
+
+Os gráficos usam a API orientada a objetos do matplotlib (Figure + Agg), sem o
+estado global do pyplot, de modo que figuras independentes podem ser
+renderizadas em paralelo por render_plots. O matplotlib e o seaborn só são
+importados ao desenhar o primeiro gráfico, para que execuções sem gráficos
+(ou só com as etapas numéricas) não paguem esse custo.
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import numpy as np # Importado para o teste
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
 import config # Importa as configurações
-import data_loader # Para teste
-import analysis_steps # Para teste
-import clustering # Para teste
 
-# Configurações de estilo para os gráficos (opcional, mas melhora a aparência)
-sns.set_theme(style="whitegrid")
+NOISE_COLOR = (0.6, 0.6, 0.6, 1.0) # Cor dos modelos de ruído (clustering por densidade)
+
+_style_applied = False
+
+def _apply_style():
+    """Aplica o tema do seaborn uma única vez por processo."""
+    global _style_applied
+    if not _style_applied:
+        import seaborn as sns
+        # Configurações de estilo para os gráficos (opcional, mas melhora a aparência)
+        sns.set_theme(style="whitegrid")
+        _style_applied = True
+
+def new_figure(figsize):
+    """Cria uma figura com canvas Agg, independente do pyplot e com o tema do projeto."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    _apply_style()
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _use_density(n_points, threshold):
+    """Indica se o gráfico deve usar o modo de densidade (histograma 2D rasterizado)."""
+    threshold = config.SCATTER_DENSITY_THRESHOLD if threshold is None else threshold
+    return threshold is not None and n_points > threshold
+
+def _density_extent(x, y):
+    """Limites [xmin, xmax, ymin, ymax] dos dados, com margem para valores constantes."""
+    x_min, x_max = float(np.nanmin(x)), float(np.nanmax(x))
+    y_min, y_max = float(np.nanmin(y)), float(np.nanmax(y))
+    if x_max == x_min:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    if y_max == y_min:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+    return [x_min, x_max, y_min, y_max]
+
+def _bin_indices(x, y, extent, bins):
+    """Índice linear do pixel (bin) de cada ponto em uma grade bins=(nx, ny)."""
+    nx, ny = bins
+    ix = np.clip(((np.asarray(x, dtype=np.float64) - extent[0]) / (extent[1] - extent[0]) * nx).astype(np.int64), 0, nx - 1)
+    iy = np.clip(((np.asarray(y, dtype=np.float64) - extent[2]) / (extent[3] - extent[2]) * ny).astype(np.int64), 0, ny - 1)
+    return iy * nx + ix
+
+def _density_counts(x, y, extent, bins):
+    """Contagem de pontos por pixel, como matriz (ny, nx) pronta para imshow."""
+    nx, ny = bins
+    return np.bincount(_bin_indices(x, y, extent, bins), minlength=nx * ny).reshape(ny, nx)
+
+def _density_rgba(counts, color):
+    """Imagem RGBA de uma cor única com opacidade proporcional ao log da densidade."""
+    import matplotlib.colors
 
-def plot_of_scatter(df_all, df_best, x_col, y_col, filename):
+    rgba = np.zeros(counts.shape + (4,))
+    rgba[..., :3] = matplotlib.colors.to_rgb(color)
+    if counts.max() > 0:
+        rgba[..., 3] = np.log1p(counts) / np.log1p(counts.max())
+    return rgba
+
+def plot_of_scatter(df_all, df_best, x_col, y_col, filename, density_threshold=None, best_label=None):
     """
     Gera um gráfico de dispersão mostrando todos os OF Values e destacando
     os melhores modelos selecionados.
 
+    Acima de config.SCATTER_DENSITY_THRESHOLD pontos, desenha histogramas 2D
+    rasterizados (opacidade pela densidade) em vez de marcadores individuais,
+    de modo que o custo depende da resolução da imagem e não do número de linhas.
+
     Args:
         df_all (pd.DataFrame): DataFrame com todos os dados limpos.
         df_best (pd.DataFrame): DataFrame com os melhores modelos filtrados.
         x_col (str): Nome da coluna para o eixo X (ex: 'Simulation').
         y_col (str): Nome da coluna para o eixo Y (ex: 'OF Value').
         filename (str): Nome do arquivo para salvar o gráfico.
+        density_threshold (int, optional): Limite de pontos para o modo de densidade.
+                                           Padrão: config.SCATTER_DENSITY_THRESHOLD.
+        best_label (str, optional): Legenda dos modelos selecionados (ex.: as frentes de
+                                    Pareto usadas). Padrão: 'Melhores X%' (BEST_MODEL_PERCENTILE).
     """
 
-    plt.figure(figsize=(10, 6))
-    # Plota todos os pontos
-    plt.plot(df_all[x_col], df_all[y_col], marker='o', linestyle='None',
-             alpha=0.5, label='Todos os Modelos')
-    # Destaca os melhores pontos
-    plt.plot(df_best[x_col], df_best[y_col], marker='o', linestyle='None',
-             label=f'Melhores {config.BEST_MODEL_PERCENTILE*100:.0f}%')
-
-    plt.xlabel('Simulação')
-    plt.ylabel('Valor da Função Objetivo (OF)')
-    plt.title('Dispersão dos Valores da Função Objetivo')
-    plt.legend()
-    plt.grid(True)
-
-    plt.savefig(filename)
+    import matplotlib.patches
+    import seaborn as sns
+
+    fig = new_figure((10, 6))
+    ax = fig.add_subplot()
+    best_label = best_label or f'Melhores {config.BEST_MODEL_PERCENTILE*100:.0f}%'
+    palette = sns.color_palette()
+    if _use_density(len(df_all), density_threshold):
+        extent = _density_extent(df_all[x_col], df_all[y_col])
+        bins = config.SCATTER_DENSITY_BINS
+        all_counts = _density_counts(df_all[x_col], df_all[y_col], extent, bins)
+        best_counts = _density_counts(df_best[x_col], df_best[y_col], extent, bins)
+        for counts, color in ((all_counts, palette[0]), (best_counts, palette[1])):
+            ax.imshow(_density_rgba(counts, color), extent=extent, origin='lower',
+                      aspect='auto', interpolation='nearest')
+        ax.legend(handles=[matplotlib.patches.Patch(color=palette[0], label='Todos os Modelos (densidade)'),
+                           matplotlib.patches.Patch(color=palette[1], label=f'{best_label} (densidade)')])
+    else:
+        # Plota todos os pontos
+        ax.plot(df_all[x_col], df_all[y_col], marker='o', linestyle='None',
+                alpha=0.5, label='Todos os Modelos')
+        # Destaca os melhores pontos
+        ax.plot(df_best[x_col], df_best[y_col], marker='o', linestyle='None',
+                label=best_label)
+        ax.legend()
+
+    ax.set_xlabel('Simulação')
+    ax.set_ylabel('Valor da Função Objetivo (OF)')
+    ax.set_title('Dispersão dos Valores da Função Objetivo')
+    ax.grid(True)
+
+    fig.savefig(filename)
     print(f"Gráfico de dispersão OF salvo como '{filename}'")
-    plt.close()
 
-def plot_pca_clusters(X_pca, cluster_labels, pca_model, filename):
+def plot_pca_clusters(X_pca, cluster_labels, pca_model, filename, density_threshold=None):
     """
     Gera um gráfico de dispersão dos dois primeiros componentes principais,
     colorindo os pontos pelos seus clusters.
 
+    Acima de config.SCATTER_DENSITY_THRESHOLD pontos, cada pixel recebe a cor do
+    cluster mais frequente nele, com opacidade proporcional à densidade.
+
     Args:
         X_pca (numpy.ndarray): Dados após PCA (pelo menos 2 componentes).
         cluster_labels (numpy.ndarray): Rótulos de cluster para cada ponto.
         pca_model (PCA): Modelo PCA ajustado para obter a variância explicada.
         filename (str): Nome do arquivo para salvar o gráfico.
+        density_threshold (int, optional): Limite de pontos para o modo de densidade.
+                                           Padrão: config.SCATTER_DENSITY_THRESHOLD.
     """
 
-    plt.figure(figsize=(12, 8))
-    unique_clusters = np.unique(cluster_labels)
-    colors = plt.cm.viridis(np.linspace(0, 1, len(unique_clusters)))
+    import matplotlib
+
+    fig = new_figure((12, 8))
+    ax = fig.add_subplot()
+    unique_clusters, cluster_codes = np.unique(cluster_labels, return_inverse=True)
+    # Ruído dos backends por densidade (rótulo negativo) em cinza, fora da escala de cores
+    is_noise = unique_clusters < 0
+    colors = np.empty((len(unique_clusters), 4))
+    colors[~is_noise] = matplotlib.colormaps['viridis'](np.linspace(0, 1, int((~is_noise).sum())))
+    colors[is_noise] = NOISE_COLOR
+    legend_labels = ['Ruído' if cluster < 0 else f'Cluster {cluster}' for cluster in unique_clusters]
 
-    for cluster, color in zip(unique_clusters, colors):
-        idx = cluster_labels == cluster
-        plt.scatter(X_pca[idx, 0], X_pca[idx, 1], color=color,
-                    label=f'Cluster {cluster}', s=100, alpha=0.8)
+    if _use_density(len(X_pca), density_threshold):
+        extent = _density_extent(X_pca[:, 0], X_pca[:, 1])
+        nx, ny = bins = config.SCATTER_DENSITY_BINS
+        n_pixels = nx * ny
+        # Contagens (cluster, pixel) com um único bincount
+        pixel = _bin_indices(X_pca[:, 0], X_pca[:, 1], extent, bins)
+        counts = np.bincount(cluster_codes * n_pixels + pixel,
+                             minlength=len(unique_clusters) * n_pixels).reshape(len(unique_clusters), n_pixels)
+        total = counts.sum(axis=0)
+        rgba = np.zeros((n_pixels, 4))
+        rgba[:, :3] = colors[counts.argmax(axis=0), :3]
+        rgba[:, 3] = np.log1p(total) / np.log1p(total.max())
+        ax.imshow(rgba.reshape(ny, nx, 4), extent=extent, origin='lower',
+                  aspect='auto', interpolation='nearest')
+        for label, color in zip(legend_labels, colors):
+            ax.scatter([], [], color=color, label=label, s=100)
+    else:
+        for cluster, label, color in zip(unique_clusters, legend_labels, colors):
+            idx = cluster_labels == cluster
+            ax.scatter(X_pca[idx, 0], X_pca[idx, 1], color=color,
+                       label=label, s=100, alpha=0.8)
 
     # Adiciona variância explicada aos rótulos dos eixos
     variance_explained = pca_model.explained_variance_ratio_
@@ -74,18 +188,53 @@ def plot_pca_clusters(X_pca, cluster_labels, pca_model, filename):
     pc2_var = variance_explained[1] * 100
     total_var = np.sum(variance_explained[:2]) * 100
 
-    plt.title(f'Clusters no Espaço PCA (Total Var. Explicada nos 2 PCs: {total_var:.1f}%)')
-    plt.xlabel(f'Componente Principal 1 ({pc1_var:.1f}%)')
-    plt.ylabel(f'Componente Principal 2 ({pc2_var:.1f}%)')
-    plt.legend(title='Cluster')
-    plt.grid(True, linestyle='--', alpha=0.6)
+    ax.set_title(f'Clusters no Espaço PCA (Total Var. Explicada nos 2 PCs: {total_var:.1f}%)')
+    ax.set_xlabel(f'Componente Principal 1 ({pc1_var:.1f}%)')
+    ax.set_ylabel(f'Componente Principal 2 ({pc2_var:.1f}%)')
+    ax.legend(title='Cluster')
+    ax.grid(True, linestyle='--', alpha=0.6)
 
-    plt.savefig(filename)
+    fig.savefig(filename)
     print(f"Gráfico de clusters PCA salvo como '{filename}'")
-    
-    plt.close()
 
-def plot_parameter_boxplots(X_params_with_clusters, filename):
+def compute_boxplot_stats(X_params_with_clusters):
+    """
+    Pré-calcula as estatísticas dos boxplots (quartis e bigodes de 1,5·IQR) de
+    cada parâmetro em cada cluster, de forma vetorizada com groupby.
+
+    Args:
+        X_params_with_clusters (pd.DataFrame): Parâmetros com a coluna 'Cluster'.
+
+    Returns:
+        dict: parâmetro -> lista de dicionários no formato de Axes.bxp, um por cluster.
+    """
+
+    grouped = X_params_with_clusters.groupby('Cluster')
+    quartiles = grouped.quantile([0.25, 0.5, 0.75])
+    q1 = quartiles.xs(0.25, level=1)
+    median = quartiles.xs(0.5, level=1)
+    q3 = quartiles.xs(0.75, level=1)
+    iqr = q3 - q1
+
+    # Bigodes: valores extremos dentro de [Q1 - 1,5·IQR, Q3 + 1,5·IQR]
+    clusters = X_params_with_clusters['Cluster']
+    values = X_params_with_clusters.drop(columns='Cluster')
+    low_fence = (q1 - 1.5 * iqr).loc[clusters].set_axis(values.index)
+    high_fence = (q3 + 1.5 * iqr).loc[clusters].set_axis(values.index)
+    whislo = values.where(values >= low_fence).groupby(clusters).min()
+    whishi = values.where(values <= high_fence).groupby(clusters).max()
+
+    stats = {}
+    for column in values.columns:
+        stats[column] = [
+            {'label': str(cluster), 'q1': q1.at[cluster, column], 'med': median.at[cluster, column],
+             'q3': q3.at[cluster, column], 'whislo': whislo.at[cluster, column],
+             'whishi': whishi.at[cluster, column], 'fliers': []}
+            for cluster in q1.index
+        ]
+    return stats
+
+def plot_parameter_boxplots(X_params_with_clusters, filename, boxplot_stats=None):
     """
     Gera boxplots para cada parâmetro, agrupados por cluster.
 
@@ -93,29 +242,88 @@ def plot_parameter_boxplots(X_params_with_clusters, filename):
         X_params_with_clusters (pd.DataFrame): DataFrame original (não escalado)
                                                 dos parâmetros com a coluna 'Cluster'.
         filename (str): Nome do arquivo para salvar o gráfico.
+        boxplot_stats (dict, optional): Estatísticas de compute_boxplot_stats. Se
+                                        informadas, os boxplots são desenhados a partir
+                                        delas (sem pontos discrepantes) e os dados
+                                        brutos podem ser None.
     """
-    if X_params_with_clusters is None:
+    if X_params_with_clusters is None and boxplot_stats is None:
         print("Erro: DataFrame de entrada para plot_parameter_boxplots é None.")
         return
 
-    parameter_cols = [col for col in X_params_with_clusters.columns if col != 'Cluster']
+    if boxplot_stats is not None:
+        parameter_cols = list(boxplot_stats)
+    else:
+        parameter_cols = [col for col in X_params_with_clusters.columns if col != 'Cluster']
     n_params = len(parameter_cols)
     # Ajusta o layout (ex: 3 colunas de gráficos)
     n_cols = 3
     n_rows = (n_params + n_cols - 1) // n_cols
 
-    plt.figure(figsize=(5 * n_cols, 4 * n_rows)) # Ajusta tamanho da figura
+    import seaborn as sns
+
+    fig = new_figure((5 * n_cols, 4 * n_rows)) # Ajusta tamanho da figura
+    palette = sns.color_palette()
     for i, column in enumerate(parameter_cols):
-        plt.subplot(n_rows, n_cols, i + 1)
-        sns.boxplot(x='Cluster', y=column, data=X_params_with_clusters)
-        plt.title(f'{column}')
-        plt.xlabel('Cluster') # Opcional, pode remover se ficar muito cheio
-        plt.ylabel('Valor do Multiplicador') # Opcional
-
-    plt.suptitle('Distribuição dos Parâmetros por Cluster', fontsize=16, y=1.02) # Título geral
-    plt.tight_layout(rect=[0, 0.03, 1, 0.98]) # Ajusta layout para não sobrepor títulos
-  
-    plt.savefig(filename)
+        ax = fig.add_subplot(n_rows, n_cols, i + 1)
+        if boxplot_stats is not None:
+            column_stats = boxplot_stats[column]
+            boxes = ax.bxp(column_stats, showfliers=False, patch_artist=True)['boxes']
+            for j, box in enumerate(boxes):
+                box.set_facecolor(palette[j % len(palette)])
+        else:
+            sns.boxplot(x='Cluster', y=column, data=X_params_with_clusters, ax=ax)
+        ax.set_title(f'{column}')
+        ax.set_xlabel('Cluster') # Opcional, pode remover se ficar muito cheio
+        ax.set_ylabel('Valor do Multiplicador') # Opcional
+
+    fig.suptitle('Distribuição dos Parâmetros por Cluster', fontsize=16, y=1.02) # Título geral
+    fig.tight_layout(rect=[0, 0.03, 1, 0.98]) # Ajusta layout para não sobrepor títulos
+
+    fig.savefig(filename)
     print(f"Gráfico de boxplots salvo como '{filename}'")
-    
-    plt.close()
+
+def _run_plot_job(job, settings=None):
+    """
+    Executa um job (função, args, kwargs) de gráfico; retorna a mensagem de erro, se houver.
+
+    settings (config.settings() do processo principal) é aplicado antes do job:
+    processos iniciados por 'spawn' (macOS, Windows) importam config com os
+    valores padrão e não veriam as alterações feitas por config.update/--set.
+    """
+    function, args, kwargs = job
+    if settings is not None:
+        config.update(**settings)
+    try:
+        function(*args, **kwargs)
+        return None
+    except Exception as e:
+        return f"Erro ao gerar gráfico com {function.__name__}: {e}"
+
+def render_plots(jobs, n_jobs=None):
+    """
+    Renderiza gráficos independentes em paralelo, em processos separados.
+
+    Args:
+        jobs (list): Lista de tuplas (função, args, kwargs), ex.:
+                     (plot_of_scatter, (df_all, df_best, 'Simulation', 'OF Value', arquivo), {}).
+                     Funções e argumentos precisam ser serializáveis com pickle.
+        n_jobs (int, optional): Número de processos. Padrão: config.PLOT_N_JOBS
+                                (None = um por gráfico até o número de núcleos; 1 = sequencial).
+
+    Returns:
+        list: Mensagens de erro dos gráficos que falharam (vazia se todos foram gerados).
+    """
+
+    n_jobs = n_jobs if n_jobs is not None else config.PLOT_N_JOBS
+    n_workers = min(n_jobs or os.cpu_count() or 1, len(jobs))
+    if n_workers <= 1:
+        errors = [_run_plot_job(job) for job in jobs]
+    else:
+        run_job = partial(_run_plot_job, settings=config.settings())
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            errors = list(executor.map(run_job, jobs))
+    errors = [error for error in errors if error]
+    for error in errors:
+        print(error)
+    return errors
@@ -0,0 +1,121 @@
+# quantile_sketch.py
+"""
+Módulo com um esboço (sketch) de quantis KLL, que estima quantis em uma única
+passada com memória limitada e pode ser combinado (merge) entre blocos ou
+arquivos diferentes. Usado para calcular o corte da OF em modo de leitura em blocos.
+"""
+
+import math
+import numpy as np
+
+class KLLSketch:
+    """
+    Esboço de quantis KLL (Karnin, Lang e Liberty, 2016).
+
+    O erro de posto (rank) de cada quantil estimado é aproximadamente
+    'error' * n, com memória O(1/error) independente de n.
+
+    Args:
+        error (float): Erro de posto aproximado desejado (ex.: 0.001 = 0,1%).
+        random_state (int): Semente para as compactações, para resultados reprodutíveis.
+    """
+
+    _DECAY = 2.0 / 3.0
+
+    def __init__(self, error=0.001, random_state=42):
+        if not 0 < error < 1:
+            raise ValueError("error deve estar entre 0 e 1.")
+        self.error = error
+        self.k = max(8, int(math.ceil(1.7 / error)))
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(random_state)
+
+    def _capacity(self, level):
+        height = len(self._compactors)
+        return max(2, int(math.ceil(self.k * self._DECAY ** (height - level - 1))))
+
+    def _compress(self):
+        """Compacta os níveis que excedem a capacidade, promovendo metade dos itens."""
+        level = 0
+        while level < len(self._compactors):
+            items = self._compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self._compactors):
+                    self._compactors.append(np.empty(0))
+                items = np.sort(items)
+                # Itens em número ímpar: o último permanece no nível atual
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(keep)]
+                offset = int(self._rng.integers(2))
+                self._compactors[level + 1] = np.concatenate([self._compactors[level + 1], paired[offset::2]])
+                self._compactors[level] = keep
+            level += 1
+
+    def update(self, values):
+        """
+        Adiciona um array de valores ao esboço.
+
+        Args:
+            values (array-like): Valores numéricos (NaN são ignorados).
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        # Um bloco grande é compactado em cascata (cada nível recebe metade do anterior)
+        self._compactors[0] = np.concatenate([self._compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Combina outro esboço a este (ex.: de outro bloco ou arquivo).
+
+        Args:
+            other (KLLSketch): Esboço a ser incorporado.
+
+        Returns:
+            KLLSketch: O próprio esboço, atualizado.
+        """
+        if other.n == 0:
+            return self
+        while len(self._compactors) < len(other._compactors):
+            self._compactors.append(np.empty(0))
+        for level, items in enumerate(other._compactors):
+            self._compactors[level] = np.concatenate([self._compactors[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Estima o(s) quantil(is) q (entre 0 e 1).
+
+        Args:
+            q (float or array-like): Quantil(is) desejado(s).
+
+        Returns:
+            float or numpy.ndarray: Valor(es) estimado(s).
+        """
+        if self.n == 0:
+            raise ValueError("O esboço está vazio.")
+        items = np.concatenate(self._compactors)
+        weights = np.concatenate([np.full(len(c), 2.0 ** level) for level, c in enumerate(self._compactors)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        q_arr = np.clip(np.atleast_1d(np.asarray(q, dtype=np.float64)), 0.0, 1.0)
+        positions = np.searchsorted(cumulative, q_arr * cumulative[-1], side='left')
+        result = items[np.minimum(positions, len(items) - 1)]
+        result = np.where(q_arr <= 0, self.min, np.where(q_arr >= 1, self.max, result))
+        return float(result[0]) if np.ndim(q) == 0 else result
+
+    def __len__(self):
+        return self.n
@@ -6,14 +6,289 @@ em formato Markdown, incluindo tabelas e links para os gráficos.
 
 import os
 import pandas as pd
-import numpy as np # Necessário para np.sum no teste
+import numpy as np
 import config # Importa as configurações
-import data_loader # Para teste
-import analysis_steps # Para teste
-import clustering # Para teste
-import plotting # Para teste (indiretamente via clustering no teste)
+import clustering
+from silhouette import SILHOUETTE_MODE_LABELS
+from string import Template
 from datetime import datetime # Para adicionar data/hora ao relatório
 
+# Modelo do relatório. Todas as tabelas são resumos (uma linha por k ou por
+# cluster), então o tempo de geração não cresce com o número de simulações;
+# os resultados por simulação ficam nos arquivos gravados por output_writer.
+REPORT_TEMPLATE = Template("""\
+# Relatório de Análise de Calibração
+
+Relatório gerado em: ${generated_at}
+
+Arquivo de entrada: `${input_file}`
+
+## Resumo das Configurações da Análise
+
+${selection_setting}
+* **Variância Mantida pelo PCA:** ${pca_variance}%
+* **Número de Componentes Principais:** ${n_components}
+* **Número de Clusters (k):** ${n_clusters}
+* **Backend de Clustering:** ${backend}
+
+## Seleção dos Melhores Modelos
+
+Total de simulações: ${n_simulations}
+Número de modelos selecionados (${selection_description}): ${n_best}
+
+${pareto_section}![Gráfico de Dispersão OF](${plot_of_scatter})
+*Gráfico 1: Dispersão dos valores da Função Objetivo (OF). Pontos laranjas indicam os modelos selecionados.*
+
+${duplicates_section}${k_determination_section}${k_selection_section}${incremental_section}## Visualização e Análise dos Clusters
+
+![Clusters PCA](${plot_pca_clusters})
+*Gráfico 4: Visualização dos ${n_clusters} clusters no espaço dos dois primeiros Componentes Principais (Total Var. Explicada: ${pca_variance_2pc}%).*
+
+${quality_section}### Tamanho dos Clusters
+
+${cluster_sizes_table}
+
+${consensus_section}### Centróides dos Clusters (Valores Médios dos Parâmetros Originais)
+
+${centroids_table}
+*Tabela 1: Valores médios dos multiplicadores para cada cluster.*
+
+### Estatísticas da Função Objetivo ('OF Value') por Cluster
+
+${of_stats_table}
+*Tabela 2: Estatísticas descritivas do 'OF Value' para os modelos dentro de cada cluster.*
+
+### Distribuição dos Parâmetros por Cluster
+
+![Boxplots Parâmetros](${plot_boxplots})
+*Gráfico 5: Boxplots mostrando a distribuição dos valores de cada parâmetro (multiplicador) dentro de cada cluster.*
+
+${sensitivity_section}## Seleção dos Modelos Representativos ('Campeões' por Cluster)
+
+${champions_description}
+
+${best_per_cluster_table}
+*Tabela 3: Melhores simulações representativas de cada cluster.*
+
+${performance_section}""")
+
+# Seção da escolha de k (backends K-Means)
+K_DETERMINATION_TEMPLATE = Template("""\
+## Determinação do Número de Clusters (k)
+
+Foram analisados valores de k no intervalo: ${k_range}
+
+![Método do Cotovelo](${plot_elbow})
+*Gráfico 2: Método do Cotovelo (Inércia vs. k). O 'cotovelo' sugere um k ótimo.*
+
+![Pontuação de Silhueta](${plot_silhouette})
+*Gráfico 3: Pontuação Média de Silhueta vs. k. Valores mais altos indicam melhor separação dos clusters.*
+
+${k_sweep_section}**Número de clusters escolhido (k): ${n_clusters}**
+
+""")
+
+def _k_determination_section(k_sweep, model):
+    """Escolha de k (K-Means) ou descrição do clustering por densidade (sem varredura de k)."""
+    if isinstance(model, clustering.DensityClustering):
+        if model.backend == 'hdbscan':
+            criterion = (f"HDBSCAN (clusters com pelo menos {model.min_cluster_size} modelos, "
+                         f"densidade estimada com {model.min_samples} vizinhos)")
+        else:
+            criterion = (f"DBSCAN (raio {config.DBSCAN_EPS} no espaço PCA, "
+                         f"{model.min_samples} vizinhos por ponto central)")
+        n_rows = len(model.labels_)
+        return ("## Clustering por Densidade\n\n"
+                f"Os clusters foram definidos pela densidade dos modelos no espaço PCA, com o {criterion}, "
+                "sem varredura de k. Modelos em regiões de baixa densidade não são forçados a um cluster: "
+                f"recebem o rótulo {clustering.NOISE_LABEL} (ruído) nas tabelas, gráficos e resultados.\n\n"
+                f"* **Clusters encontrados:** {model.n_clusters}\n"
+                f"* **Modelos de ruído:** {model.n_noise} ({model.n_noise / n_rows:.1%})\n"
+                f"* **Silhueta média (sem o ruído):** {model.silhouette:.4f}\n"
+                f"* **Tempo do ajuste:** {model.seconds:.2f} s\n\n")
+    if k_sweep is None and clustering.is_density_backend():
+        # O clustering por densidade classificou tudo como ruído (ver apply_density_clustering)
+        return ("## Determinação do Número de Clusters (k)\n\n"
+                f"O backend `{config.CLUSTERING_BACKEND}` classificou todos os modelos como ruído; foi usado "
+                f"o K-Means com k = {model.n_clusters} (`OPTIMAL_K`), sem varredura de k.\n\n")
+    return K_DETERMINATION_TEMPLATE.substitute(
+        k_range=list(config.K_RANGE),
+        plot_elbow=os.path.basename(config.PLOT_ELBOW),
+        plot_silhouette=os.path.basename(config.PLOT_SILHOUETTE),
+        k_sweep_section=_k_sweep_section(k_sweep),
+        n_clusters=model.n_clusters)
+
+def _k_sweep_section(k_sweep):
+    """Modo de cálculo da silhueta e tabela de métricas por k."""
+    if k_sweep is None:
+        return ''
+    text = f"Cálculo da silhueta: **{SILHOUETTE_MODE_LABELS[k_sweep.silhouette_mode]}**"
+    if k_sweep.silhouette_mode == 'sample':
+        text += (f" (amostra de até {config.SILHOUETTE_SAMPLE_SIZE} pontos, "
+                 f"intervalo de confiança de {config.SILHOUETTE_CONFIDENCE*100:.0f}%)")
+    sweep_table = pd.DataFrame({'k': k_sweep.k_values,
+                                'Inércia': k_sweep.inertia_list(),
+                                'Silhueta': k_sweep.silhouette_list(),
+                                'Calinski-Harabasz': [k_sweep.calinski_harabasz.get(k, np.nan) for k in k_sweep.k_values],
+                                'Davies-Bouldin': [k_sweep.davies_bouldin.get(k, np.nan) for k in k_sweep.k_values]})
+    if k_sweep.silhouette_mode == 'sample':
+        bounds = np.array([k_sweep.silhouette_ci.get(k, (np.nan, np.nan)) for k in k_sweep.k_values])
+        sweep_table['IC Inferior'] = bounds[:, 0]
+        sweep_table['IC Superior'] = bounds[:, 1]
+    return f"{text}\n\n{sweep_table.set_index('k').to_markdown(floatfmt='.4f')}\n\n"
+
+def _incremental_section(incremental_summary):
+    """Resumo da atualização incremental (modelos novos, desvio e variação da inércia)."""
+    if incremental_summary is None:
+        return ''
+    return ("### Atualização Incremental\n\n"
+            f"Scaler, PCA e modelo de clustering reaproveitados do último ajuste completo "
+            f"(atualização nº {incremental_summary['n_updates']}).\n\n"
+            f"* **Simulações novas:** {incremental_summary['n_new']}\n"
+            f"* **Modelos que entraram / saíram do conjunto dos melhores:** "
+            f"{incremental_summary['n_entering']} / {incremental_summary['n_leaving']}\n"
+            f"* **Corte da OF:** {incremental_summary['of_threshold']:.4f}\n"
+            f"* **Desvio dos parâmetros (desvios padrão):** {incremental_summary['drift']:.3f} "
+            f"(limite: {config.INCREMENTAL_DRIFT_THRESHOLD})\n"
+            f"* **Variação da inércia média:** {incremental_summary['inertia_increase']*100:+.2f}% "
+            f"(limite: {config.INCREMENTAL_QUALITY_TOLERANCE*100:.0f}%)\n\n")
+
+def _selection_texts(pareto_summary):
+    """
+    Critério de seleção dos melhores modelos, para o resumo das configurações e a
+    contagem de selecionados: o percentil da OF ou as frentes de Pareto usadas.
+    """
+    if pareto_summary is None:
+        percentile = f"{config.BEST_MODEL_PERCENTILE*100:.0f}"
+        return f"* **Percentil para Melhores Modelos:** {percentile}%", f"melhores {percentile}%"
+    objectives = ', '.join(f"`{col}`" for col in pareto_summary['objectives'])
+    fronts = f"frentes de Pareto 0 a {pareto_summary['last_front']}"
+    return f"* **Seleção dos Melhores Modelos:** {fronts} dos objetivos {objectives}", fronts
+
+def _pareto_section(pareto_summary):
+    """Resumo da seleção por frentes de Pareto (SELECTION_MODE = 'pareto')."""
+    if pareto_summary is None:
+        return ''
+    objectives = ', '.join(f"`{col}`" for col in pareto_summary['objectives'])
+    return ("### Seleção por Frentes de Pareto\n\n"
+            f"Os modelos foram selecionados pelas frentes de Pareto dos objetivos {objectives} "
+            "(todos minimizados), em vez do percentil da 'OF Value'. As frentes entram em ordem e a "
+            "última necessária é truncada pelas maiores distâncias de aglomeração (crowding distance), "
+            "preservando a diversidade dos compromissos entre os objetivos.\n\n"
+            f"* **Frentes no ensemble:** {pareto_summary['n_fronts']}\n"
+            f"* **Modelos não dominados (frente 0):** {pareto_summary['n_nondominated']}\n"
+            f"* **Frentes selecionadas:** 0 a {pareto_summary['last_front']} "
+            f"(frente {pareto_summary['last_front']}: {pareto_summary['last_front_selected']} de "
+            f"{pareto_summary['last_front_size']} modelos)\n\n"
+            "A frente de cada modelo está na coluna 'Frente_Pareto' dos resultados.\n\n")
+
+def _duplicates_section(duplicates):
+    """Simulações quase idênticas unidas antes do clustering (DUPLICATE_RADIUS)."""
+    if duplicates is None:
+        return ''
+    return ("### Simulações Quase Idênticas\n\n"
+            f"{duplicates.n_collapsed} das {duplicates.n_rows} simulações selecionadas estão a menos de "
+            f"{duplicates.radius} (distância no espaço PCA) de um modelo de OF menor e foram unidas ao seu grupo. A escolha de k "
+            f"e o K-Means usaram só os {duplicates.n_groups} representantes (o modelo de menor OF de cada "
+            "grupo); os demais membros recebem o cluster do seu representante.\n\n")
+
+def _champions_description():
+    """Critério de escolha dos modelos representativos de cada cluster."""
+    if config.CHAMPIONS_PER_CLUSTER == 1 and not config.CHAMPION_MIN_DISTANCE:
+        return "A tabela abaixo mostra a simulação com o menor 'OF Value' dentro de cada um dos clusters identificados."
+    text = (f"A tabela abaixo mostra as {config.CHAMPIONS_PER_CLUSTER} simulações de menor 'OF Value' "
+            "de cada um dos clusters identificados")
+    if config.CHAMPION_MIN_DISTANCE:
+        text += (f", escolhidas com uma distância mínima de {config.CHAMPION_MIN_DISTANCE} (no espaço PCA) "
+                 "entre quaisquer dois campeões, inclusive de clusters diferentes, para evitar modelos "
+                 "representativos quase idênticos")
+    return text + "."
+
+def _best_per_cluster_table(best_per_cluster_df):
+    """Tabela dos campeões, com o Simulation_ID como índice e o posto no cluster sem casas decimais."""
+    if 'Posto_no_Cluster' in best_per_cluster_df.columns:
+        best_per_cluster_df = best_per_cluster_df.astype({'Posto_no_Cluster': str})
+    return best_per_cluster_df.to_markdown(index=True, floatfmt=".4f")
+
+def _consensus_section(consensus_result):
+    """Estabilidade dos clusters no clustering de consenso."""
+    if consensus_result is None:
+        return ''
+    ari = consensus_result.adjusted_rand
+    return ("### Estabilidade dos Clusters (Consenso)\n\n"
+            f"Rótulos definidos pela maioria de {consensus_result.n_runs} execuções do K-Means "
+            f"(sementes diferentes, {consensus_result.sample_fraction:.0%} das linhas em cada uma), "
+            f"alinhadas ao K-Means de referência.\n\n"
+            f"* **Índice de Rand ajustado (execuções vs. consenso):** {ari.mean():.4f} ± {ari.std():.4f}\n"
+            f"* **Modelos com rótulo diferente do K-Means de referência:** {consensus_result.n_changed}\n\n"
+            f"{consensus_result.stability.round(3).to_markdown()}\n"
+            "*Estabilidade por cluster: índice de consenso (co-associação média entre os membros), "
+            "Jaccard médio do cluster correspondente em cada execução e fração média das execuções "
+            "que concordam com o rótulo de cada modelo (valores próximos de 1 indicam clusters estáveis).*\n\n")
+
+def _sensitivity_section(sensitivity_result):
+    """Correlações, testes entre clusters e cargas do PCA de cada parâmetro."""
+    if sensitivity_result is None:
+        return ''
+    summary = sensitivity_result.summary
+    loadings = summary.filter(like='Carga PC')
+    statistics = summary.drop(columns=loadings.columns)
+    population = (f"{sensitivity_result.n_all} simulações do ensemble e {sensitivity_result.n_best} melhores modelos"
+                  if sensitivity_result.n_all else f"{sensitivity_result.n_best} melhores modelos")
+    return ("## Sensibilidade dos Parâmetros\n\n"
+            f"Análise sobre {population}. Spearman: correlação de postos entre o parâmetro e a 'OF Value' "
+            "(positiva: valores maiores do parâmetro pioram a OF). Amplitude: diferença entre a maior e a "
+            f"menor OF média das {config.SENSITIVITY_BINS} faixas de igual frequência do parâmetro, em desvios "
+            "padrão da OF. ANOVA/Kruskal-Wallis e Eta²: quanto o parâmetro difere entre os clusters.\n\n"
+            f"{statistics.to_markdown(floatfmt='.3g')}\n"
+            "*Sensibilidade de cada parâmetro, em ordem decrescente de |Spearman|. A OF por faixa está em "
+            f"`{os.path.basename(config.OUTPUT_SENSITIVITY_BINS)}`.*\n\n"
+            f"{loadings.to_markdown(floatfmt='.3f')}\n"
+            "*Cargas do PCA: correlação entre cada parâmetro padronizado e cada componente principal.*\n\n")
+
+def _quality_section(clustering_quality):
+    """Perda de qualidade do backend aproximado em relação ao K-Means completo."""
+    if clustering_quality is None:
+        return ''
+    return ("### Qualidade do Clustering vs. K-Means Completo\n\n"
+            f"Comparação em uma amostra de {clustering_quality['sample_size']} modelos:\n\n"
+            f"* **Inércia do modelo usado:** {clustering_quality['inertia_model']:.4f}\n"
+            f"* **Inércia do K-Means completo:** {clustering_quality['inertia_full']:.4f}\n"
+            f"* **Aumento relativo da inércia:** {clustering_quality['inertia_increase']*100:.2f}%\n"
+            f"* **Índice de Rand ajustado entre os rótulos:** {clustering_quality['adjusted_rand']:.4f}\n\n")
+
+def _performance_section(performance):
+    """Tempo, CPU, memória e vazão das etapas já concluídas e tempos por k da varredura."""
+    if performance is None:
+        return ''
+    stages = performance.stage_frame()
+    table = pd.DataFrame({'Etapa': stages['stage'] + '. ' + stages['title'],
+                          'Tempo (s)': stages['wall_seconds'],
+                          'CPU (s)': stages['cpu_seconds'],
+                          'Pico RSS (MB)': stages['peak_rss_mb'],
+                          'Linhas/s': stages['rows_per_second']})
+    text = ("## Desempenho\n\n"
+            f"Tempo total até a geração do relatório: {stages['wall_seconds'].sum():.2f} s. "
+            f"As medidas completas (inclusive desta etapa) estão em `{os.path.basename(config.OUTPUT_PERFORMANCE_JSON)}`.\n\n"
+            f"{table.to_markdown(index=False, floatfmt='.2f')}\n"
+            "*Tabela 4: Tempo de relógio, tempo de CPU (incluindo processos filhos), pico de memória e vazão por etapa.*\n\n")
+    k_timings = performance.k_sweep_frame()
+    if not k_timings.empty:
+        k_timings = k_timings.rename(columns={'fit_seconds': 'Ajuste (s)', 'metrics_seconds': 'Métricas (s)',
+                                              'cpu_seconds': 'CPU (s)'})
+        text += (f"{k_timings.to_markdown(floatfmt='.3f')}\n"
+                 "*Tabela 5: Tempo de ajuste do clustering e das métricas (silhueta, CH, DB) para cada k da varredura.*\n\n")
+    return text
+
+def _cluster_sizes_table(df_best, of_stats_df):
+    """Tamanho de cada cluster, lido das estatísticas de OF quando disponíveis."""
+    if 'count' in of_stats_df:
+        counts = of_stats_df['count'].astype(int)
+    else:
+        counts = df_best['Cluster'].value_counts().sort_index()
+    cluster_counts = pd.DataFrame({'Cluster': counts.index, 'Número de Modelos': counts.to_numpy()})
+    return cluster_counts.to_markdown(index=False)
+
 def generate_markdown_report(report_filename,
                                df_cleaned,
                                df_best,
@@ -21,9 +296,18 @@ def generate_markdown_report(report_filename,
                                kmeans_model, # Passando o modelo kmeans para obter n_clusters
                                centroid_df,
                                of_stats_df,
-                               best_per_cluster_df):
+                               best_per_cluster_df,
+                               k_sweep=None,
+                               clustering_quality=None,
+                               k_selection_reason=None,
+                               performance=None,
+                               incremental_summary=None,
+                               consensus_result=None,
+                               sensitivity_result=None,
+                               pareto_summary=None,
+                               duplicates=None):
     """
-    Gera um relatório da análise em formato Markdown.
+    Gera um relatório da análise em formato Markdown, a partir de REPORT_TEMPLATE.
 
     Args:
         report_filename (str): Nome do arquivo .md a ser criado.
@@ -33,7 +317,23 @@ def generate_markdown_report(report_filename,
         kmeans_model (KMeans): Modelo KMeans ajustado.
         centroid_df (pd.DataFrame): DataFrame com os centróides dos clusters (escala original).
         of_stats_df (pd.DataFrame): DataFrame com estatísticas de OF por cluster.
-        best_per_cluster_df (pd.DataFrame): DataFrame com a melhor simulação de cada cluster.
+        best_per_cluster_df (pd.DataFrame): DataFrame com os campeões (melhores simulações) de cada cluster.
+        k_sweep (clustering.KSweepResult, optional): Varredura de k, para registrar
+                                                     a silhueta de cada k e o modo de cálculo.
+        clustering_quality (dict, optional): Resultado de clustering.evaluate_clustering_quality,
+                                             quando um backend aproximado for usado.
+        k_selection_reason (str, optional): Justificativa da escolha de k
+                                            (retornada por clustering.select_optimal_k).
+        performance (instrumentation.PipelineProfiler, optional): Medidas das etapas
+                                                                 concluídas, para a seção "Desempenho".
+        incremental_summary (dict, optional): Resumo de incremental.prepare_update, quando
+                                              a execução foi uma atualização incremental.
+        consensus_result (consensus.ConsensusResult, optional): Resultado do clustering de consenso.
+        sensitivity_result (sensitivity.SensitivityResult, optional): Resultado da análise de sensibilidade.
+        pareto_summary (dict, optional): Resumo de pareto.summarize_selection, quando a seleção
+                                         foi por frentes de Pareto.
+        duplicates (spatial_index.DuplicateGroups, optional): Grupos de simulações quase
+                                                              idênticas unidas antes do clustering.
     """
     # Verifica se todas as entradas são válidas
     # Verifica explicitamente se alguma das entradas necessárias é None
@@ -54,71 +354,40 @@ def generate_markdown_report(report_filename,
         return
 
     try:
+        selection_setting, selection_description = _selection_texts(pareto_summary)
+        sections = {
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'input_file': config.INPUT_FILE,
+            'selection_setting': selection_setting,
+            'selection_description': selection_description,
+            'pca_variance': f"{config.PCA_VARIANCE_THRESHOLD*100:.0f}",
+            'n_components': pca_model.n_components_,
+            'n_clusters': kmeans_model.n_clusters, # Usa n_clusters do modelo
+            'backend': type(getattr(kmeans_model, 'estimator', kmeans_model)).__name__,
+            'n_simulations': len(df_cleaned),
+            'n_best': len(df_best),
+            'plot_of_scatter': os.path.basename(config.PLOT_OF_SCATTER),
+            'k_determination_section': _k_determination_section(k_sweep, kmeans_model),
+            'k_selection_section': (f"Critério de escolha (`{config.K_SELECTION_STRATEGY}`): {k_selection_reason}.\n\n"
+                                    if k_selection_reason else ''),
+            'sensitivity_section': _sensitivity_section(sensitivity_result),
+            'consensus_section': _consensus_section(consensus_result),
+            'pareto_section': _pareto_section(pareto_summary),
+            'duplicates_section': _duplicates_section(duplicates),
+            'champions_description': _champions_description(),
+            'incremental_section': _incremental_section(incremental_summary),
+            'plot_pca_clusters': os.path.basename(config.PLOT_PCA_CLUSTERS),
+            'pca_variance_2pc': f"{np.sum(pca_model.explained_variance_ratio_[:2]) * 100:.1f}",
+            'quality_section': _quality_section(clustering_quality),
+            'cluster_sizes_table': _cluster_sizes_table(df_best, of_stats_df),
+            'centroids_table': centroid_df.to_markdown(floatfmt=".4f"), # Formata floats
+            'of_stats_table': of_stats_df.to_markdown(floatfmt=".4f"),
+            'plot_boxplots': os.path.basename(config.PLOT_BOXPLOTS),
+            'best_per_cluster_table': _best_per_cluster_table(best_per_cluster_df),
+            'performance_section': _performance_section(performance),
+        }
         with open(report_filename, 'w', encoding='utf-8') as f:
-            # --- Cabeçalho ---
-            f.write(f"# Relatório de Análise de Calibração\n\n")
-            f.write(f"Relatório gerado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            f.write(f"Arquivo de entrada: `{config.INPUT_FILE}`\n\n")
-
-            # --- Resumo das Configurações ---
-            f.write("## Resumo das Configurações da Análise\n\n")
-            f.write(f"* **Percentil para Melhores Modelos:** {config.BEST_MODEL_PERCENTILE*100:.0f}%\n")
-            f.write(f"* **Variância Mantida pelo PCA:** {config.PCA_VARIANCE_THRESHOLD*100:.0f}%\n")
-            f.write(f"* **Número de Componentes Principais:** {pca_model.n_components_}\n")
-            f.write(f"* **Número de Clusters (k):** {kmeans_model.n_clusters}\n\n") # Usa n_clusters do modelo
-
-            # --- Seleção de Modelos ---
-            f.write("## Seleção dos Melhores Modelos\n\n")
-            f.write(f"Total de simulações: {len(df_cleaned)}\n")
-            f.write(f"Número de modelos selecionados (melhores {config.BEST_MODEL_PERCENTILE*100:.0f}%): {len(df_best)}\n\n")
-            f.write(f"![Gráfico de Dispersão OF]({os.path.basename(config.PLOT_OF_SCATTER)})\n")
-            f.write("*Gráfico 1: Dispersão dos valores da Função Objetivo (OF). Pontos laranjas indicam os modelos selecionados.*\n\n")
-
-            # --- Determinação do Número de Clusters ---
-            f.write("## Determinação do Número de Clusters (k)\n\n")
-            f.write(f"Foram analisados valores de k no intervalo: {list(config.K_RANGE)}\n\n")
-            f.write(f"![Método do Cotovelo]({os.path.basename(config.PLOT_ELBOW)})\n")
-            f.write("*Gráfico 2: Método do Cotovelo (Inércia vs. k). O 'cotovelo' sugere um k ótimo.*\n\n")
-            f.write(f"![Pontuação de Silhueta]({os.path.basename(config.PLOT_SILHOUETTE)})\n")
-            f.write("*Gráfico 3: Pontuação Média de Silhueta vs. k. Valores mais altos indicam melhor separação dos clusters.*\n\n")
-            f.write(f"**Número de clusters escolhido (k): {config.OPTIMAL_K}**\n\n")
-
-            # --- Visualização e Análise dos Clusters ---
-            f.write("## Visualização e Análise dos Clusters\n\n")
-            # PCA Plot
-            variance_explained = pca_model.explained_variance_ratio_
-            total_var_2pc = np.sum(variance_explained[:2]) * 100
-            f.write(f"![Clusters PCA]({os.path.basename(config.PLOT_PCA_CLUSTERS)})\n")
-            f.write(f"*Gráfico 4: Visualização dos {config.OPTIMAL_K} clusters no espaço dos dois primeiros Componentes Principais (Total Var. Explicada: {total_var_2pc:.1f}%).*\n\n")
-
-            # Tamanho dos Clusters
-            f.write("### Tamanho dos Clusters\n\n")
-            cluster_counts = df_best['Cluster'].value_counts().sort_index().reset_index()
-            cluster_counts.columns = ['Cluster', 'Número de Modelos']
-            f.write(cluster_counts.to_markdown(index=False))
-            f.write("\n\n")
-
-            # Centróides
-            f.write("### Centróides dos Clusters (Valores Médios dos Parâmetros Originais)\n\n")
-            f.write(centroid_df.to_markdown(floatfmt=".4f")) # Formata floats
-            f.write("\n*Tabela 1: Valores médios dos multiplicadores para cada cluster.*\n\n")
-
-            # Estatísticas OF
-            f.write(f"### Estatísticas da Função Objetivo ('OF Value') por Cluster\n\n")
-            f.write(of_stats_df.to_markdown(floatfmt=".4f"))
-            f.write("\n*Tabela 2: Estatísticas descritivas do 'OF Value' para os modelos dentro de cada cluster.*\n\n")
-
-            # Boxplots
-            f.write("### Distribuição dos Parâmetros por Cluster\n\n")
-            f.write(f"![Boxplots Parâmetros]({os.path.basename(config.PLOT_BOXPLOTS)})\n")
-            f.write("*Gráfico 5: Boxplots mostrando a distribuição dos valores de cada parâmetro (multiplicador) dentro de cada cluster.*\n\n")
-
-            # --- Seleção dos Modelos Representativos ---
-            f.write("## Seleção dos Modelos Representativos ('Campeões' por Cluster)\n\n")
-            f.write("A tabela abaixo mostra a simulação com o menor 'OF Value' dentro de cada um dos clusters identificados.\n\n")
-            f.write(best_per_cluster_df.to_markdown(index=True, floatfmt=".4f")) # Inclui o Simulation_ID como índice
-            f.write("\n*Tabela 3: Melhores simulações representativas de cada cluster.*\n\n")
-            
+            f.write(REPORT_TEMPLATE.substitute(sections))
 
         print(f"Relatório Markdown gerado com sucesso em '{report_filename}'")
 
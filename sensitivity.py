@@ -0,0 +1,263 @@
+# sensitivity.py
+"""
+Módulo de análise de sensibilidade dos parâmetros (multiplicadores) em relação
+à Função Objetivo, sobre o ensemble completo e sobre os melhores modelos.
+
+Para cada parâmetro:
+- correlação de postos de Spearman com a 'OF Value' (e o p-valor);
+- estatísticas da OF condicionadas a faixas de igual frequência do parâmetro
+  (tabela longa) e a amplitude das médias entre as faixas;
+- ANOVA de um fator e Kruskal-Wallis entre os clusters dos melhores modelos;
+- cargas do PCA (correlação entre o parâmetro padronizado e cada componente).
+
+Tudo é calculado de uma vez sobre a matriz (n, n_parâmetros): os postos de
+todas as colunas saem de um único argsort, e as somas por faixa ou por
+cluster, de um único np.bincount sobre índices combinados (coluna, grupo).
+"""
+
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+import data_model
+
+@dataclass
+class SensitivityResult:
+    """
+    Resultado da análise de sensibilidade.
+
+    Attributes:
+        summary (pd.DataFrame): Uma linha por parâmetro (correlações, testes entre
+                                clusters e cargas do PCA), ordenada pela |Spearman| no ensemble.
+        bins (pd.DataFrame): Estatísticas da OF por faixa de cada parâmetro (formato longo).
+        n_all (int): Simulações usadas no ensemble completo (0 se indisponível).
+        n_best (int): Melhores modelos usados.
+    """
+    summary: pd.DataFrame
+    bins: pd.DataFrame
+    n_all: int
+    n_best: int
+
+def _average_ranks(X):
+    """
+    Postos médios (empates recebem a média dos postos) de todas as colunas de X.
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Postos (n, n_colunas), de 1 a n.
+            - numpy.ndarray: Termo de empates sum(t³ - t) de cada coluna (correção do Kruskal-Wallis).
+    """
+    # Cada coluna é processada como uma linha contígua (X transposta): acesso sequencial à memória
+    columns = np.ascontiguousarray(X.T)
+    n_rows = columns.shape[1]
+    order = np.argsort(columns, axis=1)
+    sorted_columns = np.take_along_axis(columns, order, axis=1)
+    positions = np.arange(n_rows)
+
+    # Cada grupo de empates ocupa as posições [início, fim] da coluna ordenada
+    group_start = np.empty(sorted_columns.shape, dtype=bool)
+    group_start[:, 0] = True
+    np.not_equal(sorted_columns[:, 1:], sorted_columns[:, :-1], out=group_start[:, 1:])
+    group_end = np.empty_like(group_start)
+    group_end[:, -1] = True
+    group_end[:, :-1] = group_start[:, 1:]
+    starts = np.maximum.accumulate(np.where(group_start, positions, 0), axis=1)
+    ends = np.minimum.accumulate(np.where(group_end, positions, n_rows - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty(columns.shape, dtype=np.float64)
+    np.put_along_axis(ranks, order, (starts + ends) / 2.0 + 1.0, axis=1)
+    tie_sizes = np.where(group_start, ends - starts + 1, 0).astype(np.float64)
+    return ranks.T, (tie_sizes ** 3 - tie_sizes).sum(axis=1)
+
+def _spearman(ranks, of_ranks):
+    """Correlação de Spearman (Pearson dos postos) de cada coluna com a OF, e o p-valor bilateral."""
+    from scipy import stats # Importado sob demanda (início mais rápido)
+
+    n_rows = len(of_ranks)
+    centered = ranks - ranks.mean(axis=0)
+    of_centered = of_ranks - of_ranks.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = (of_centered @ centered) / np.sqrt((centered ** 2).sum(axis=0) * (of_centered ** 2).sum())
+        t_stat = rho * np.sqrt((n_rows - 2) / np.maximum(1.0 - rho ** 2, 1e-300))
+    return rho, 2.0 * stats.t.sf(np.abs(t_stat), max(n_rows - 2, 1))
+
+def _group_sums(group_index, n_groups, weights=None):
+    """Somas (ou contagens) por (grupo, coluna) com um único bincount sobre índices combinados."""
+    n_columns = group_index.shape[1]
+    flat_index = (group_index * n_columns + np.arange(n_columns)).ravel()
+    sums = np.bincount(flat_index, weights=None if weights is None else weights.ravel(),
+                       minlength=n_groups * n_columns)
+    return sums.reshape(n_groups, n_columns)
+
+def conditional_of_stats(X, of_values, ranks, parameter_columns, n_bins):
+    """
+    Estatísticas da OF em faixas de igual frequência de cada parâmetro.
+
+    Args:
+        X (numpy.ndarray): Parâmetros (n, n_parâmetros).
+        of_values (numpy.ndarray): Valores da OF.
+        ranks (numpy.ndarray): Postos de X (de _average_ranks); valores empatados caem na mesma faixa.
+        parameter_columns (list): Nomes dos parâmetros.
+        n_bins (int): Número de faixas.
+
+    Returns:
+        pd.DataFrame: Uma linha por (parâmetro, faixa) não vazia.
+    """
+    n_rows, n_columns = X.shape
+    bins = np.minimum(((ranks - 1.0) * n_bins / n_rows).astype(np.int64), n_bins - 1)
+    of_matrix = np.broadcast_to(of_values[:, None], X.shape)
+    counts = _group_sums(bins, n_bins)
+    of_sums = _group_sums(bins, n_bins, of_matrix)
+    of_sq_sums = _group_sums(bins, n_bins, of_matrix ** 2)
+    param_sums = _group_sums(bins, n_bins, X.astype(np.float64))
+    of_min = np.full(n_bins * n_columns, np.inf)
+    np.minimum.at(of_min, (bins * n_columns + np.arange(n_columns)).ravel(), of_matrix.ravel())
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        of_mean = of_sums / counts
+        of_std = np.sqrt(np.maximum(of_sq_sums / counts - of_mean ** 2, 0.0))
+        param_mean = param_sums / counts
+    column_ids, bin_ids = np.nonzero(counts.T) # Ordenado por parâmetro e, dentro dele, por faixa
+    return pd.DataFrame({'Parâmetro': np.asarray(parameter_columns)[column_ids],
+                         'Faixa': bin_ids + 1,
+                         'Valor Médio do Parâmetro': param_mean[bin_ids, column_ids],
+                         'Modelos': counts[bin_ids, column_ids].astype(int),
+                         'OF Média': of_mean[bin_ids, column_ids],
+                         'OF Desvio Padrão': of_std[bin_ids, column_ids],
+                         'OF Mínima': of_min.reshape(n_bins, n_columns)[bin_ids, column_ids]})
+
+def cluster_tests(X, ranks, tie_terms, labels):
+    """
+    ANOVA de um fator e Kruskal-Wallis de cada parâmetro entre os clusters.
+
+    Args:
+        X (numpy.ndarray): Parâmetros (n, n_parâmetros).
+        ranks (numpy.ndarray): Postos de X.
+        tie_terms (numpy.ndarray): Termo de empates de cada coluna (de _average_ranks).
+        labels (numpy.ndarray): Rótulos de cluster (0..k-1).
+
+    Returns:
+        dict: Arrays por parâmetro: 'F ANOVA', 'p ANOVA', 'Eta²', 'H Kruskal', 'p Kruskal'.
+    """
+    from scipy import stats # Importado sob demanda (início mais rápido)
+
+    X = X.astype(np.float64, copy=False)
+    n_rows = len(X)
+    n_groups = int(labels.max()) + 1
+    group_index = np.broadcast_to(labels[:, None], X.shape)
+    counts = np.bincount(labels, minlength=n_groups).astype(np.float64)[:, None]
+    occupied = counts[:, 0] > 0
+    k = int(occupied.sum())
+
+    sums = _group_sums(group_index, n_groups, X)
+    grand_mean = X.mean(axis=0)
+    total_ss = ((X - grand_mean) ** 2).sum(axis=0)
+    # Parâmetros constantes não têm variação a explicar: resultados NaN
+    total_ss[np.ptp(X, axis=0) == 0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Soma dos quadrados entre grupos pelos desvios das médias (sem o cancelamento de sum(S²/n) - n·média²)
+        group_means = sums[occupied] / counts[occupied]
+        between_ss = (counts[occupied] * (group_means - grand_mean) ** 2).sum(axis=0)
+        within_ss = np.maximum(total_ss - between_ss, 0.0)
+        f_stat = (between_ss / (k - 1)) / (within_ss / (n_rows - k))
+        eta_squared = between_ss / total_ss
+
+        rank_sums = _group_sums(group_index, n_groups, ranks)
+        h_stat = (12.0 / (n_rows * (n_rows + 1)) * (rank_sums[occupied] ** 2 / counts[occupied]).sum(axis=0)
+                  - 3.0 * (n_rows + 1))
+        h_stat = h_stat / (1.0 - tie_terms / (n_rows ** 3 - n_rows))
+
+    valid = k >= 2 and n_rows > k
+    nan = np.full(X.shape[1], np.nan)
+    return {'F ANOVA': f_stat if valid else nan,
+            'p ANOVA': stats.f.sf(f_stat, k - 1, n_rows - k) if valid else nan,
+            'Eta²': eta_squared if valid else nan,
+            'H Kruskal': h_stat if valid else nan,
+            'p Kruskal': stats.chi2.sf(h_stat, k - 1) if valid else nan}
+
+def pca_loadings(pca, parameter_columns):
+    """Cargas do PCA: correlação entre cada parâmetro padronizado e cada componente."""
+    loadings = pca.components_.T * np.sqrt(pca.explained_variance_)
+    return pd.DataFrame(loadings, index=parameter_columns,
+                        columns=[f"Carga PC{i + 1}" for i in range(loadings.shape[1])])
+
+def _finite_rows(matrix):
+    """Máscara das linhas sem NaN nos parâmetros nem na OF."""
+    return np.isfinite(matrix.values).all(axis=1) & np.isfinite(matrix.of_values)
+
+def run_sensitivity(df_cleaned, df_best, labels, pca, parameter_columns, n_bins=None):
+    """
+    Executa a análise de sensibilidade.
+
+    Args:
+        df_cleaned (pd.DataFrame): Ensemble completo. Se não tiver as colunas de parâmetros
+                                   (modo em blocos), só os melhores modelos são analisados.
+        df_best (pd.DataFrame): Melhores modelos.
+        labels (numpy.ndarray): Rótulos de cluster dos melhores modelos (-1 = ruído, ignorado nos testes).
+        pca: PCA ajustado (para as cargas).
+        parameter_columns (list): Nomes dos parâmetros.
+        n_bins (int, optional): Faixas por parâmetro. Padrão: config.SENSITIVITY_BINS.
+
+    Returns:
+        SensitivityResult: Tabelas da análise.
+    """
+    n_bins = n_bins or config.SENSITIVITY_BINS
+    summary = pd.DataFrame(index=pd.Index(parameter_columns, name='Parâmetro'))
+    bins_tables = []
+
+    populations = [('melhores', df_best)]
+    if all(col in df_cleaned.columns for col in parameter_columns):
+        populations.insert(0, ('todas', df_cleaned))
+    else:
+        print("Aviso: Parâmetros do ensemble completo indisponíveis (modo em blocos); "
+              "sensibilidade calculada só nos melhores modelos.")
+
+    n_used = {'todas': 0, 'melhores': 0}
+    for name, df in populations:
+        matrix = data_model.CalibrationMatrix.from_frame(df, parameter_columns)
+        finite = _finite_rows(matrix)
+        X, of_values = matrix.values[finite], matrix.of_values[finite]
+        n_used[name] = len(X)
+        if len(X) < 3:
+            continue
+        ranks, tie_terms = _average_ranks(X)
+        of_ranks, _ = _average_ranks(of_values[:, None])
+        rho, p_value = _spearman(ranks, of_ranks[:, 0])
+        summary[f"Spearman ({name})"] = rho
+        summary[f"p Spearman ({name})"] = p_value
+
+        bins_table = conditional_of_stats(X, of_values, ranks, parameter_columns, n_bins)
+        of_range = bins_table.groupby('Parâmetro', sort=False)['OF Média'].agg(lambda s: s.max() - s.min())
+        summary[f"Amplitude da OF entre Faixas ({name})"] = of_range.reindex(parameter_columns).to_numpy() \
+            / (of_values.std() or np.nan)
+        bins_tables.append(bins_table.assign(Conjunto=name))
+
+        if name == 'melhores':
+            best_labels = np.asarray(labels)[finite]
+            clustered = best_labels >= 0 # O ruído (rótulo -1) do clustering por densidade fica fora dos testes
+            if clustered.all():
+                tests = cluster_tests(X, ranks, tie_terms, best_labels)
+            else:
+                X_clustered = X[clustered]
+                tests = cluster_tests(X_clustered, *_average_ranks(X_clustered), best_labels[clustered])
+            for column, values in tests.items():
+                summary[column] = values
+
+    summary = summary.join(pca_loadings(pca, parameter_columns))
+    sort_column = 'Spearman (todas)' if 'Spearman (todas)' in summary else 'Spearman (melhores)'
+    summary = summary.iloc[np.argsort(-summary[sort_column].abs().to_numpy(), kind='stable')]
+    bins = pd.concat(bins_tables, ignore_index=True) if bins_tables else pd.DataFrame()
+    if not bins.empty:
+        bins = bins[['Conjunto'] + [col for col in bins.columns if col != 'Conjunto']]
+
+    print("\n--- Sensibilidade dos Parâmetros em relação à OF ---")
+    print(summary.filter(like='Spearman').round(4))
+    return SensitivityResult(summary=summary, bins=bins, n_all=n_used['todas'], n_best=n_used['melhores'])
+
+def write_sensitivity(result, summary_path=None, bins_path=None):
+    """Grava as tabelas da análise de sensibilidade em CSV."""
+    summary_path = summary_path or config.OUTPUT_SENSITIVITY
+    bins_path = bins_path or config.OUTPUT_SENSITIVITY_BINS
+    result.summary.to_csv(summary_path)
+    result.bins.to_csv(bins_path, index=False)
+    return summary_path, bins_path
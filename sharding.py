@@ -0,0 +1,637 @@
+# sharding.py
+"""
+Execução do pipeline em shards, em vários processos ou em vários nós.
+
+As linhas do ensemble são divididas em shards (partes de cada arquivo de
+entrada, ver data_loader.iter_data_chunks(part=...)). Cada worker lê só o seu
+shard e devolve resultados parciais pequenos, que o coordenador combina:
+
+1. Esboço KLL da OF (combinado com KLLSketch.merge) -> corte do percentil.
+2. Momentos dos melhores modelos: contagem, médias e co-momentos (soma de
+   (x - média)(x - média)ᵀ), combinados pelas fórmulas de Chan et al. ->
+   StandardScaler e PCA (autovetores da covariância dos dados escalados), mais
+   uma amostra uniforme (as menores chaves aleatórias de todos os shards) para
+   escolher k e iniciar o K-Means. Os melhores modelos de cada shard são
+   gravados em config.SHARD_DIR, de onde as passadas seguintes os leem.
+3. K-Means distribuído: a cada iteração, cada shard devolve a soma das
+   coordenadas, a contagem e a inércia por cluster em relação aos centróides
+   atuais, e o coordenador calcula os novos centróides.
+4. Estatísticas por cluster: momentos e esboços KLL da OF, soma dos
+   parâmetros (centróides no espaço original) e o melhor modelo de cada
+   cluster. Os arquivos dos shards recebem a coluna 'Cluster'.
+
+Os workers recebem tudo o que precisam como argumentos (não dependem de
+config), de modo que o mesmo código roda em um pool de processos local
+('process') ou em um cluster Dask ('dask', local ou em vários nós com
+config.SHARD_SCHEDULER_ADDRESS; requer dask.distributed, os módulos deste
+diretório nos workers e config.RESULTS_DIR em um sistema de arquivos
+compartilhado).
+
+Diferenças em relação a main.main: o corte é sempre o do esboço KLL, a
+seleção é sempre por percentil e o clustering é sempre K-Means (k de
+config.OPTIMAL_K ou, com K_SELECTION_STRATEGY automática, escolhido na amostra).
+
+Uso:
+    python sharding.py arquivo.parquet --shards 16 --workers 8
+    python sharding.py "parte_*.csv" --executor dask --scheduler tcp://10.0.0.5:8786
+"""
+
+import os
+import sys
+import copy
+import glob
+import json
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import numpy as np
+import pandas as pd
+import config # Importa as configurações
+import clustering
+import data_loader
+import instrumentation
+import model_bundle
+from analysis_steps import _truncate_pca
+from quantile_sketch import KLLSketch
+
+SHARD_EXECUTORS = ('process', 'dask')
+OF_COLUMN = 'OF Value'
+# Linhas por bloco nas distâncias aos centróides (limita a memória de cada worker)
+ASSIGN_BLOCK_ROWS = 65_536
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Uma parte das linhas de um arquivo de entrada.
+
+    Attributes:
+        index (int): Número do shard (define o nome do seu arquivo em config.SHARD_DIR).
+        file_path (str): Arquivo de entrada.
+        part (int): Parte do arquivo (0 .. n_parts - 1).
+        n_parts (int): Número de partes do arquivo.
+    """
+    index: int
+    file_path: str
+    part: int = 0
+    n_parts: int = 1
+
+    def iter_chunks(self, chunk_size):
+        return data_loader.iter_data_chunks(self.file_path, chunk_size, part=(self.part, self.n_parts))
+
+@dataclass
+class ScanPartial:
+    """Passada 1: linhas, esboço KLL da OF e colunas de um ou mais shards."""
+    n_rows: int
+    sketch: KLLSketch
+    columns: list
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        return ScanPartial(self.n_rows + other.n_rows, self.sketch, self.columns or other.columns)
+
+@dataclass
+class MomentsPartial:
+    """
+    Passada 2: momentos dos melhores modelos e amostra uniforme.
+
+    Attributes:
+        n (int): Melhores modelos.
+        mean (numpy.ndarray): Média de cada parâmetro.
+        comoment (numpy.ndarray): Soma de (x - média)(x - média)ᵀ, forma (d, d).
+        sample_keys (numpy.ndarray): Chaves aleatórias das linhas da amostra.
+        sample (numpy.ndarray): Parâmetros das linhas da amostra (as de menor chave).
+    """
+    n: int
+    mean: np.ndarray
+    comoment: np.ndarray
+    sample_keys: np.ndarray
+    sample: np.ndarray
+
+    def merge(self, other, sample_size):
+        n = self.n + other.n
+        if n == 0:
+            return self
+        # Chan et al., com o produto externo no lugar do quadrado
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.n / n
+        comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.n * other.n / n
+        keys = np.concatenate([self.sample_keys, other.sample_keys])
+        sample = np.concatenate([self.sample, other.sample])
+        keep = np.argsort(keys, kind='stable')[:sample_size]
+        return MomentsPartial(n, mean, comoment, keys[keep], sample[keep])
+
+@dataclass
+class KMeansPartial:
+    """Passada 3: soma das coordenadas, contagem e inércia por cluster."""
+    sums: np.ndarray
+    counts: np.ndarray
+    inertia: float
+
+    def merge(self, other):
+        return KMeansPartial(self.sums + other.sums, self.counts + other.counts, self.inertia + other.inertia)
+
+@dataclass
+class ClusterPartial:
+    """
+    Passada 4: estatísticas por cluster.
+
+    Attributes:
+        of_moments (pd.DataFrame): count, mean, M2, min e max da OF por cluster.
+        sketches (dict): Cluster -> KLLSketch da OF.
+        parameter_sums (numpy.ndarray): Soma dos parâmetros por cluster, forma (k, d).
+        champions (pd.DataFrame): Modelo de menor OF de cada cluster.
+    """
+    of_moments: pd.DataFrame
+    sketches: dict
+    parameter_sums: np.ndarray
+    champions: pd.DataFrame
+
+    def merge(self, other):
+        for cluster, sketch in other.sketches.items():
+            if cluster in self.sketches:
+                self.sketches[cluster].merge(sketch)
+            else:
+                self.sketches[cluster] = sketch
+        champions = pd.concat([self.champions, other.champions])
+        return ClusterPartial(clustering._merge_of_moments(self.of_moments, other.of_moments), self.sketches,
+                              self.parameter_sums + other.parameter_sums, _best_per_cluster(champions))
+
+@dataclass
+class ShardedResult:
+    """
+    Resultado consolidado da execução em shards.
+
+    Attributes:
+        n_rows (int): Linhas do ensemble.
+        n_best (int): Melhores modelos (OF <= of_threshold).
+        of_threshold (float): Corte da OF (esboço KLL).
+        parameter_columns (list): Colunas de parâmetros.
+        scaler (sklearn.preprocessing.StandardScaler): Scaler dos momentos combinados.
+        pca (sklearn.decomposition.PCA): PCA da covariância combinada.
+        model (sklearn.cluster.KMeans): K-Means com os centróides distribuídos.
+        n_iter (int): Iterações do K-Means distribuído.
+        of_stats (pd.DataFrame): Estatísticas da OF por cluster (como DataFrame.describe()).
+        centroids (pd.DataFrame): Média dos parâmetros de cada cluster.
+        champions (pd.DataFrame): Modelo de menor OF de cada cluster.
+        shard_files (list): Arquivos dos melhores modelos (com 'Cluster') de cada shard.
+    """
+    n_rows: int
+    n_best: int
+    of_threshold: float
+    parameter_columns: list
+    scaler: object
+    pca: object
+    model: object
+    n_iter: int
+    of_stats: pd.DataFrame
+    centroids: pd.DataFrame
+    champions: pd.DataFrame
+    shard_files: list
+
+def make_shards(files, n_shards=None):
+    """
+    Divide os arquivos de entrada em pelo menos n_shards shards (o mesmo número
+    de partes por arquivo).
+
+    Args:
+        files (list): Arquivos de entrada.
+        n_shards (int, optional): Número mínimo de shards. Padrão: config.SHARD_COUNT.
+
+    Returns:
+        list: Os shards (Shard), numerados na ordem dos arquivos.
+    """
+    n_shards = max(n_shards or config.SHARD_COUNT or 1, 1)
+    n_parts = max(1, -(-n_shards // len(files)))
+    pairs = [(path, part) for path in files for part in range(n_parts)]
+    return [Shard(index=i, file_path=path, part=part, n_parts=n_parts) for i, (path, part) in enumerate(pairs)]
+
+def _parameter_columns(columns):
+    """Mesmas colunas de analysis_steps.select_parameters."""
+    excluded = {OF_COLUMN, 'Simulation', 'Frente_Pareto'} | set(config.OBJECTIVE_COLUMNS or [])
+    return [col for col in columns if col not in excluded]
+
+def _best_per_cluster(champions):
+    """Mantém a linha de menor OF de cada cluster (empates: menor Simulation_ID)."""
+    if champions.empty:
+        return champions
+    champions = champions.rename_axis('Simulation_ID').sort_values(['Cluster', OF_COLUMN, 'Simulation_ID'])
+    return champions[~champions['Cluster'].duplicated()]
+
+def _shard_path(shard_dir, shard):
+    return os.path.join(shard_dir, f"shard_{shard.index:04d}.parquet")
+
+# --- Workers (recebem tudo como argumentos; não leem config) ---
+
+def _init_shard_worker(n_threads):
+    """Inicializa um processo do pool local, limitando os threads de BLAS."""
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=n_threads)
+
+def _scan_shard(shard, chunk_size, error):
+    """Passada 1: esboço KLL da OF do shard."""
+    sketch = KLLSketch(error)
+    n_rows = 0
+    columns = []
+    for chunk in shard.iter_chunks(chunk_size):
+        sketch.update(chunk[OF_COLUMN].to_numpy())
+        n_rows += len(chunk)
+        columns = columns or list(chunk.columns)
+    return ScanPartial(n_rows, sketch, columns)
+
+def _uniform_columns(frame):
+    """Tipos iguais em todos os blocos gravados ('Simulation' é reduzida bloco a bloco)."""
+    if 'Simulation' in frame:
+        simulation = frame['Simulation']
+        frame = frame.assign(Simulation=simulation.astype(np.int64) if pd.api.types.is_integer_dtype(simulation)
+                             else simulation.astype(str))
+    return frame
+
+def _best_moments_shard(shard, of_threshold, parameter_columns, chunk_size, sample_size, random_state, shard_dir):
+    """
+    Passada 2: grava os melhores modelos do shard e devolve seus momentos e a
+    amostra das sample_size linhas de menor chave aleatória.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    n_features = len(parameter_columns)
+    partial_result = MomentsPartial(0, np.zeros(n_features), np.zeros((n_features, n_features)),
+                                    np.empty(0), np.empty((0, n_features)))
+    rng = np.random.default_rng([random_state, shard.index])
+    path = _shard_path(shard_dir, shard)
+    writer = None
+    try:
+        for chunk in shard.iter_chunks(chunk_size):
+            best = chunk[chunk[OF_COLUMN] <= of_threshold]
+            if best.empty:
+                continue
+            X = best[parameter_columns].to_numpy(dtype=np.float64)
+            mean = X.mean(axis=0)
+            centered = X - mean
+            keys = rng.random(len(X))
+            keep = np.argsort(keys)[:sample_size]
+            chunk_moments = MomentsPartial(len(X), mean, centered.T @ centered, keys[keep], X[keep])
+            partial_result = partial_result.merge(chunk_moments, sample_size)
+
+            table = pa.Table.from_pandas(_uniform_columns(best[['Simulation', OF_COLUMN] + parameter_columns]),
+                                         preserve_index=True)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return partial_result
+
+# Coordenadas PCA do último arquivo lido por este processo (as iterações do K-Means releem o mesmo shard)
+_worker_projected = {}
+
+def _projected(path, parameter_columns, projection, offset):
+    """Coordenadas PCA dos melhores modelos do shard (em cache no processo durante a execução)."""
+    key = (path, projection.tobytes(), offset.tobytes())
+    if key not in _worker_projected:
+        import pyarrow.parquet as pq
+
+        # Só guarda shards da projeção atual (um worker Dask sobrevive a várias execuções)
+        for stale in [k for k in _worker_projected if k[1:] != key[1:]]:
+            del _worker_projected[stale]
+        X = pq.read_table(path, columns=parameter_columns).to_pandas().to_numpy(dtype=np.float64)
+        _worker_projected[key] = X @ projection + offset
+    return _worker_projected[key]
+
+def _assign(Z, centers):
+    """Cluster mais próximo e distância ao quadrado de cada linha, em blocos."""
+    labels = np.empty(len(Z), dtype=np.int64)
+    distances = np.empty(len(Z))
+    center_norms = (centers ** 2).sum(axis=1)
+    for start in range(0, len(Z), ASSIGN_BLOCK_ROWS):
+        block = Z[start:start + ASSIGN_BLOCK_ROWS]
+        d2 = center_norms[None, :] - 2.0 * block @ centers.T
+        labels[start:start + len(block)] = d2.argmin(axis=1)
+        distances[start:start + len(block)] = np.maximum(d2.min(axis=1) + (block ** 2).sum(axis=1), 0.0)
+    return labels, distances
+
+def _kmeans_step_shard(path, parameter_columns, projection, offset, centers):
+    """Passada 3: uma iteração de Lloyd sobre o shard."""
+    Z = _projected(path, parameter_columns, projection, offset)
+    labels, distances = _assign(Z, centers)
+    k = len(centers)
+    sums = np.column_stack([np.bincount(labels, weights=Z[:, j], minlength=k) for j in range(Z.shape[1])])
+    return KMeansPartial(sums, np.bincount(labels, minlength=k), float(distances.sum()))
+
+def _summarize_shard(path, parameter_columns, projection, offset, centers, error):
+    """Passada 4: rótulos finais (gravados no arquivo do shard) e estatísticas por cluster."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    labels, _ = _assign(_projected(path, parameter_columns, projection, offset), centers)
+    table = pq.read_table(path)
+    if 'Cluster' in table.column_names:
+        table = table.drop_columns(['Cluster'])
+    pq.write_table(table.append_column('Cluster', pa.array(labels.astype(np.int32))), path, compression='zstd')
+    _worker_projected.clear()
+
+    df = table.to_pandas()
+    df['Cluster'] = labels.astype(np.int32)
+    grouped = df.groupby('Cluster')[OF_COLUMN]
+    of_moments = grouped.agg(['count', 'mean', 'min', 'max'])
+    of_moments['M2'] = grouped.var(ddof=0) * of_moments['count']
+    sketches = {cluster: KLLSketch(error).update(values.to_numpy()) for cluster, values in grouped}
+    parameter_sums = np.zeros((len(centers), len(parameter_columns)))
+    sums = df.groupby('Cluster')[parameter_columns].sum()
+    parameter_sums[sums.index.to_numpy()] = sums.to_numpy(dtype=np.float64)
+    # Posições (o Simulation_ID pode se repetir entre arquivos)
+    best_positions = df[OF_COLUMN].reset_index(drop=True).groupby(labels).idxmin().to_numpy()
+    champions = _best_per_cluster(df.iloc[best_positions])
+    return ClusterPartial(of_moments, sketches, parameter_sums, champions)
+
+# --- Coordenador ---
+
+class _InlineExecutor:
+    """Executor sequencial no próprio processo (SHARD_WORKERS=1, útil para depuração)."""
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+@contextlib.contextmanager
+def shard_executor(kind=None, n_workers=None, scheduler_address=None):
+    """
+    Executor (interface de concurrent.futures) onde os shards são processados.
+
+    Args:
+        kind (str, optional): 'process' ou 'dask'. Padrão: config.SHARD_EXECUTOR.
+        n_workers (int, optional): Processos/workers locais. Padrão: config.SHARD_WORKERS.
+        scheduler_address (str, optional): Scheduler Dask existente (vários nós).
+                                           Padrão: config.SHARD_SCHEDULER_ADDRESS.
+
+    Yields:
+        Executor com map(fn, iterável).
+    """
+    kind = kind or config.SHARD_EXECUTOR
+    if kind not in SHARD_EXECUTORS:
+        raise ValueError(f"Executor de shards desconhecido: '{kind}'. Use um de {SHARD_EXECUTORS}.")
+    n_workers = n_workers if n_workers is not None else config.SHARD_WORKERS
+    n_workers = n_workers or os.cpu_count() or 1
+    scheduler_address = scheduler_address or config.SHARD_SCHEDULER_ADDRESS
+
+    if kind == 'dask':
+        try:
+            from dask.distributed import Client, LocalCluster
+        except ImportError:
+            print("Aviso: dask.distributed não está instalado; usando o pool de processos local.")
+        else:
+            cluster = None if scheduler_address else LocalCluster(n_workers=n_workers, threads_per_worker=1)
+            client = Client(scheduler_address or cluster)
+            print(f"Executor de shards: Dask ({scheduler_address or f'cluster local de {n_workers} worker(s)'}).")
+            try:
+                yield client.get_executor()
+            finally:
+                client.close()
+                if cluster is not None:
+                    cluster.close()
+            return
+
+    if n_workers <= 1:
+        print("Executor de shards: sequencial (1 processo).")
+        yield _InlineExecutor()
+        return
+    n_threads = max(1, (os.cpu_count() or 1) // n_workers)
+    print(f"Executor de shards: pool local de {n_workers} processo(s).")
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_shard_worker,
+                             initargs=(n_threads,)) as executor:
+        yield executor
+
+def _merge_all(partials, merge=None):
+    """Combina os resultados parciais dos shards na ordem dos shards."""
+    merge = merge or (lambda a, b: a.merge(b))
+    merged = None
+    for partial_result in partials:
+        merged = partial_result if merged is None else merge(merged, partial_result)
+    return merged
+
+def _scaler_from_moments(moments):
+    """StandardScaler com a média e a variância (ddof=0) combinadas."""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = moments.mean
+    scaler.var_ = np.diag(moments.comoment) / moments.n
+    scale = np.sqrt(scaler.var_)
+    scaler.scale_ = np.where(scale < 10 * np.finfo(np.float64).eps, 1.0, scale)
+    scaler.n_samples_seen_ = moments.n
+    scaler.n_features_in_ = len(moments.mean)
+    return scaler
+
+def _pca_from_moments(moments, scaler, variance_threshold):
+    """
+    PCA dos dados escalados a partir da covariância combinada (autovetores em
+    ordem decrescente de variância, sinal como o svd_flip do scikit-learn), com o
+    número de componentes escolhido como em PCA(n_components=float).
+    """
+    from sklearn.decomposition import PCA
+
+    n_features = len(moments.mean)
+    covariance = moments.comoment / max(moments.n - 1, 1) / np.outer(scaler.scale_, scaler.scale_)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1]
+    explained_variance = np.maximum(eigenvalues[order], 0.0)
+    components = eigenvectors[:, order].T
+    largest = np.abs(components).argmax(axis=1)
+    components *= np.sign(components[np.arange(n_features), largest])[:, None]
+
+    total_variance = explained_variance.sum()
+    pca = PCA(n_components=variance_threshold)
+    pca.components_ = components
+    pca.explained_variance_ = explained_variance
+    pca.explained_variance_ratio_ = explained_variance / total_variance if total_variance > 0 else np.zeros(n_features)
+    pca.singular_values_ = np.sqrt(explained_variance * max(moments.n - 1, 1))
+    pca.mean_ = np.zeros(n_features) # Os dados escalados têm média zero
+    pca.n_samples_ = moments.n
+    pca.n_features_in_ = n_features
+    cumulative = np.cumsum(pca.explained_variance_ratio_)
+    n_components = min(int(np.searchsorted(cumulative, variance_threshold, side='right')) + 1, n_features)
+    return _truncate_pca(pca, n_components)
+
+def _choose_k(sample_pca):
+    """k de config.OPTIMAL_K ou, com escolha automática, da varredura sobre a amostra."""
+    if config.K_SELECTION_STRATEGY == 'manual':
+        return config.OPTIMAL_K
+    k_range = [k for k in config.K_RANGE if k < len(sample_pca)]
+    sweep = clustering.run_k_sweep(sample_pca, k_range, backend='kmeans')
+    optimal_k, _ = clustering.select_optimal_k(sweep, X_pca=sample_pca)
+    return optimal_k
+
+def _distributed_kmeans(executor, paths, parameter_columns, projection, offset, centers, tol, max_iter):
+    """Iterações de Lloyd com somas e contagens combinadas dos shards."""
+    step = partial(_kmeans_step_shard, parameter_columns=parameter_columns, projection=projection, offset=offset)
+    inertia = np.nan
+    for n_iter in range(1, max_iter + 1):
+        totals = _merge_all(executor.map(partial(step, centers=centers), paths))
+        new_centers = centers.copy()
+        filled = totals.counts > 0 # Clusters vazios mantêm o centróide anterior
+        new_centers[filled] = totals.sums[filled] / totals.counts[filled, None]
+        shift = float(((new_centers - centers) ** 2).sum())
+        centers, inertia = new_centers, totals.inertia
+        print(f"  Iteração {n_iter}: inércia = {inertia:.4f}, deslocamento dos centróides = {shift:.3e}")
+        if shift <= tol:
+            break
+    return centers, inertia, n_iter
+
+def run_sharded(inputs=None, n_shards=None, kind=None, n_workers=None, scheduler_address=None, random_state=42):
+    """
+    Executa filtragem, escalonamento, PCA, K-Means e as estatísticas por cluster
+    com os shards processados em paralelo e combinados pelo coordenador.
+
+    Args:
+        inputs (list, optional): Arquivos de entrada. Padrão: [config.INPUT_FILE].
+        n_shards (int, optional): Número mínimo de shards. Padrão: config.SHARD_COUNT.
+        kind (str, optional): 'process' ou 'dask'. Padrão: config.SHARD_EXECUTOR.
+        n_workers (int, optional): Processos/workers locais. Padrão: config.SHARD_WORKERS.
+        scheduler_address (str, optional): Scheduler Dask. Padrão: config.SHARD_SCHEDULER_ADDRESS.
+        random_state (int): Semente da amostra e da inicialização do K-Means.
+
+    Returns:
+        ShardedResult: Modelos ajustados e tabelas consolidadas.
+    """
+    files = list(inputs or [config.INPUT_FILE])
+    shards = make_shards(files, n_shards)
+    chunk_size = config.SHARD_CHUNK_SIZE
+    error = config.QUANTILE_SKETCH_ERROR
+    percentile = config.BEST_MODEL_PERCENTILE
+    if config.SELECTION_MODE != 'percentile':
+        print(f"Aviso: Seleção '{config.SELECTION_MODE}' não é suportada em shards; usando o percentil da OF.")
+    if config.CLUSTERING_BACKEND != 'kmeans':
+        print(f"Aviso: Backend '{config.CLUSTERING_BACKEND}' não é suportado em shards; usando K-Means distribuído.")
+
+    config.ensure_results_dir()
+    shard_dir = config.SHARD_DIR
+    os.makedirs(shard_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(shard_dir, 'shard_*.parquet')): # De uma execução anterior
+        os.remove(stale)
+    print(f"{len(shards)} shard(s) de {len(files)} arquivo(s).")
+
+    profiler = instrumentation.PipelineProfiler()
+    with shard_executor(kind, n_workers, scheduler_address) as executor:
+        profiler.start_stage(1, "Esboço da OF por Shard")
+        scan = _merge_all(executor.map(partial(_scan_shard, chunk_size=chunk_size, error=error), shards))
+        if scan is None or scan.n_rows == 0:
+            raise ValueError("Nenhuma linha encontrada nos arquivos de entrada.")
+        profiler.set_rows(scan.n_rows)
+        of_threshold = scan.sketch.quantile(percentile)
+        parameter_columns = _parameter_columns(scan.columns)
+        print(f"Calculando o valor de corte da OF ({percentile*100:.0f}º percentil): {of_threshold:.4f}")
+
+        profiler.start_stage(2, "Momentos dos Melhores Modelos por Shard", rows=scan.n_rows)
+        best_moments = partial(_best_moments_shard, of_threshold=of_threshold, parameter_columns=parameter_columns,
+                               chunk_size=chunk_size, sample_size=config.SHARD_SAMPLE_SIZE,
+                               random_state=random_state, shard_dir=shard_dir)
+        partials = list(executor.map(best_moments, shards))
+        paths = [_shard_path(shard_dir, shard) for shard, part in zip(shards, partials) if part.n]
+        moments = _merge_all(partials, partial(MomentsPartial.merge, sample_size=config.SHARD_SAMPLE_SIZE))
+        print(f"Número de modelos selecionados (melhores {percentile*100:.0f}%): {moments.n}")
+        if moments.n == 0:
+            raise ValueError("Nenhum modelo abaixo do corte da OF.")
+        scaler = _scaler_from_moments(moments)
+        pca = _pca_from_moments(moments, scaler, config.PCA_VARIANCE_THRESHOLD)
+        print(f"PCA aplicado. Número de componentes selecionados: {pca.n_components_}")
+        print(f"Variância explicada acumulada: {np.sum(pca.explained_variance_ratio_):.2f}")
+        projection, offset = model_bundle._fused_projection(scaler, pca)
+
+        profiler.start_stage(3, "Determinando k e Iniciando o K-Means (amostra)", rows=len(moments.sample))
+        sample_pca = moments.sample @ projection + offset
+        optimal_k = _choose_k(sample_pca)
+        if len(sample_pca) < optimal_k:
+            raise ValueError(f"Dados insuficientes para formar {optimal_k} clusters.")
+        init_model = clustering._make_kmeans(optimal_k, 'kmeans', random_state=random_state).fit(sample_pca)
+        print(f"K-Means inicial na amostra de {len(sample_pca)} modelos, k={optimal_k}.")
+
+        profiler.start_stage(4, "K-Means Distribuído", rows=moments.n)
+        tol = config.SHARD_KMEANS_TOL * float(np.mean(pca.explained_variance_))
+        centers, inertia, n_iter = _distributed_kmeans(executor, paths, parameter_columns, projection, offset,
+                                                       init_model.cluster_centers_.astype(np.float64),
+                                                       tol, config.SHARD_KMEANS_MAX_ITER)
+        # Como consensus.consensus_model: o mesmo estimador, com os centróides combinados
+        model = copy.copy(init_model)
+        model.cluster_centers_ = centers
+        model.inertia_ = inertia
+        model.n_iter_ = n_iter
+
+        profiler.start_stage(5, "Estatísticas por Cluster", rows=moments.n)
+        summary = _merge_all(executor.map(partial(_summarize_shard, parameter_columns=parameter_columns,
+                                                  projection=projection, offset=offset, centers=centers,
+                                                  error=error), paths))
+
+    counts = summary.of_moments['count'].reindex(range(optimal_k), fill_value=0).to_numpy()
+    centroids = pd.DataFrame(summary.parameter_sums / np.maximum(counts, 1)[:, None],
+                             columns=parameter_columns).iloc[np.flatnonzero(counts)]
+    centroids.index.name = 'Cluster'
+    of_stats = clustering.describe_of_moments(summary.of_moments, summary.sketches)
+    print(f"\n--- Estatísticas da '{OF_COLUMN}' por Cluster ---")
+    print(of_stats)
+    result = ShardedResult(n_rows=scan.n_rows, n_best=moments.n, of_threshold=float(of_threshold),
+                           parameter_columns=parameter_columns, scaler=scaler, pca=pca, model=model, n_iter=n_iter,
+                           of_stats=of_stats, centroids=centroids, champions=summary.champions.reset_index().set_index('Cluster'),
+                           shard_files=paths)
+
+    profiler.start_stage(6, "Salvando Resultados", rows=moments.n)
+    for path in save_sharded_results(result, files):
+        print(f"  Salvo: '{path}'")
+    profiler.finish()
+    # Medidas em SHARD_DIR, sem sobrescrever as de main.py no mesmo diretório de resultados
+    profiler.write(os.path.join(shard_dir, 'desempenho.json'), os.path.join(shard_dir, 'desempenho.csv'))
+    return result
+
+def save_sharded_results(result, files):
+    """
+    Grava as tabelas consolidadas, o resumo da execução e (config.SAVE_MODEL_BUNDLE)
+    o pacote do modelo em '<SHARD_DIR>/modelo'.
+
+    Returns:
+        list: Caminhos gravados.
+    """
+    result.of_stats.to_csv(config.OUTPUT_SHARDED_OF_STATS)
+    result.centroids.to_csv(config.OUTPUT_SHARDED_CENTROIDS)
+    result.champions.to_csv(config.OUTPUT_SHARDED_CHAMPIONS)
+    summary = {
+        'input_files': list(files),
+        'n_rows': result.n_rows,
+        'n_best': result.n_best,
+        'of_threshold': result.of_threshold,
+        'n_components': int(result.pca.n_components_),
+        'n_clusters': int(len(result.model.cluster_centers_)),
+        'kmeans_iterations': result.n_iter,
+        'inertia': float(result.model.inertia_),
+        'shard_files': result.shard_files,
+    }
+    with open(config.OUTPUT_SHARDED_SUMMARY, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    paths = [config.OUTPUT_SHARDED_OF_STATS, config.OUTPUT_SHARDED_CENTROIDS,
+             config.OUTPUT_SHARDED_CHAMPIONS, config.OUTPUT_SHARDED_SUMMARY]
+    if config.SAVE_MODEL_BUNDLE:
+        bundle_dir = os.path.join(config.SHARD_DIR, 'modelo')
+        paths.append(model_bundle.save_bundle(bundle_dir, result.scaler, result.pca, result.model,
+                                              result.parameter_columns, dtype=config.MODEL_BUNDLE_DTYPE,
+                                              metadata={'input_files': list(files), 'sharded': True}))
+    return paths
+
+if __name__ == "__main__":
+    import batch_runner
+
+    parser = argparse.ArgumentParser(description="Executa a análise de calibração em shards paralelos.")
+    parser.add_argument('inputs', nargs='*', help="Arquivos ou padrões glob (padrão: config.INPUT_FILE).")
+    parser.add_argument('--shards', type=int, default=None, help="Número mínimo de shards.")
+    parser.add_argument('--workers', type=int, default=None, help="Processos/workers locais.")
+    parser.add_argument('--executor', choices=SHARD_EXECUTORS, default=None, help="Executor dos shards.")
+    parser.add_argument('--scheduler', default=None, help="Endereço de um scheduler Dask (vários nós).")
+    config.add_cli_arguments(parser)
+    args = parser.parse_args()
+    config.update(**config.load_overrides(args.config_file, args.assignments))
+    files = batch_runner.expand_inputs(args.inputs) if args.inputs else [config.INPUT_FILE]
+    if not files:
+        sys.exit(1)
+    if args.inputs and config._results_dir is None:
+        config.configure(files[0])
+    run_sharded(files, args.shards, args.executor, args.workers, args.scheduler)
@@ -0,0 +1,175 @@
+# silhouette.py
+"""
+Módulo para calcular a Pontuação de Silhueta com memória limitada.
+
+Modos disponíveis (config.SILHOUETTE_MODE):
+- 'exact': silhueta exata, calculada em blocos de linhas da matriz de distâncias.
+- 'sample': estimativa por amostra estratificada por cluster, com intervalo de confiança.
+- 'simplified': silhueta simplificada baseada nos centróides, com custo O(n·k).
+"""
+
+from dataclasses import dataclass
+from statistics import NormalDist
+import numpy as np
+import config # Importa as configurações
+
+SILHOUETTE_MODES = ('exact', 'sample', 'simplified')
+
+# Descrição de cada modo, usada nas mensagens e no relatório
+SILHOUETTE_MODE_LABELS = {
+    'exact': 'exata (em blocos)',
+    'sample': 'estimada por amostra estratificada',
+    'simplified': 'simplificada (baseada nos centróides)',
+}
+
+@dataclass
+class SilhouetteEstimate:
+    """
+    Resultado de compute_silhouette.
+
+    Attributes:
+        score (float): Pontuação média de silhueta (NaN se não aplicável).
+        mode (str): Modo de cálculo utilizado.
+        n_evaluated (int): Número de pontos avaliados.
+        ci_low (float): Limite inferior do intervalo de confiança (só no modo 'sample').
+        ci_high (float): Limite superior do intervalo de confiança (só no modo 'sample').
+    """
+    score: float
+    mode: str
+    n_evaluated: int
+    ci_low: float = np.nan
+    ci_high: float = np.nan
+
+def _block_rows(n_samples, max_bytes):
+    """Número de linhas por bloco para que a matriz de distâncias caiba em max_bytes."""
+    return max(1, int(max_bytes // (8 * max(n_samples, 1))))
+
+def _silhouette_of_rows(X, labels, rows, block_rows):
+    """
+    Silhueta exata dos pontos em 'rows' em relação a todos os pontos de X,
+    processando blocos de linhas da matriz de distâncias.
+    """
+    from sklearn.metrics.pairwise import euclidean_distances # Importado sob demanda (início mais rápido)
+
+    _, label_codes = np.unique(labels, return_inverse=True)
+    n_clusters = label_codes.max() + 1
+    cluster_sizes = np.bincount(label_codes, minlength=n_clusters).astype(np.float64)
+    # Matriz indicadora (n x k) para somar distâncias por cluster com um produto matricial
+    indicator = np.zeros((len(X), n_clusters))
+    indicator[np.arange(len(X)), label_codes] = 1.0
+
+    scores = np.empty(len(rows))
+    for start in range(0, len(rows), block_rows):
+        block = rows[start:start + block_rows]
+        distance_sums = euclidean_distances(X[block], X) @ indicator
+        own = label_codes[block]
+        own_sizes = cluster_sizes[own]
+
+        a = distance_sums[np.arange(len(block)), own] / np.maximum(own_sizes - 1, 1)
+        mean_to_others = distance_sums / cluster_sizes
+        mean_to_others[np.arange(len(block)), own] = np.inf
+        b = mean_to_others.min(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        # Convenção do scikit-learn: pontos de clusters unitários têm silhueta 0
+        scores[start:start + len(block)] = np.where(own_sizes > 1, np.nan_to_num(s), 0.0)
+    return scores
+
+def _stratified_sample(labels, sample_size, rng):
+    """Sorteia até sample_size pontos, alocados proporcionalmente a cada cluster."""
+    unique_labels, label_codes = np.unique(labels, return_inverse=True)
+    n_total = len(labels)
+    strata = []
+    for code in range(len(unique_labels)):
+        members = np.flatnonzero(label_codes == code)
+        n_stratum = max(min(2, len(members)), int(round(sample_size * len(members) / n_total)))
+        n_stratum = min(n_stratum, len(members))
+        strata.append((members, rng.choice(members, size=n_stratum, replace=False)))
+    return strata
+
+def _simplified_silhouette(X, labels, centers):
+    """Silhueta simplificada: usa as distâncias aos centróides em vez das distâncias par a par."""
+    from sklearn.metrics.pairwise import euclidean_distances
+
+    unique_labels, label_codes = np.unique(labels, return_inverse=True)
+    if centers is None or len(centers) != len(unique_labels):
+        centers = np.vstack([X[label_codes == code].mean(axis=0) for code in range(len(unique_labels))])
+    distances = euclidean_distances(X, centers)
+    a = distances[np.arange(len(X)), label_codes]
+    distances[np.arange(len(X)), label_codes] = np.inf
+    b = distances.min(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.nan_to_num((b - a) / np.maximum(a, b))
+    # Convenção do scikit-learn: pontos de clusters unitários têm silhueta 0
+    cluster_sizes = np.bincount(label_codes)
+    s[cluster_sizes[label_codes] == 1] = 0.0
+    return float(np.mean(s))
+
+def compute_silhouette(X, labels, mode=None, centers=None, sample_size=None,
+                       confidence=None, max_bytes=None, random_state=42):
+    """
+    Calcula a Pontuação de Silhueta no modo escolhido.
+
+    Args:
+        X (numpy.ndarray): Dados (ex.: coordenadas PCA).
+        labels (numpy.ndarray): Rótulos de cluster de cada ponto.
+        mode (str, optional): 'exact', 'sample' ou 'simplified'. Padrão: config.SILHOUETTE_MODE.
+        centers (numpy.ndarray, optional): Centróides (modo 'simplified'); se None,
+                                           são calculados como médias dos clusters.
+        sample_size (int, optional): Tamanho da amostra (modo 'sample').
+                                     Padrão: config.SILHOUETTE_SAMPLE_SIZE.
+        confidence (float, optional): Nível do intervalo de confiança (modo 'sample').
+                                      Padrão: config.SILHOUETTE_CONFIDENCE.
+        max_bytes (int, optional): Memória máxima de cada bloco da matriz de distâncias.
+                                   Padrão: config.SILHOUETTE_BLOCK_BYTES.
+        random_state (int): Semente da amostragem.
+
+    Returns:
+        SilhouetteEstimate: Pontuação, modo utilizado e intervalo de confiança (se houver).
+                            No modo 'sample' com sample_size >= número de pontos, a
+                            silhueta é a exata e o modo retornado é 'exact'.
+    """
+
+    mode = mode or config.SILHOUETTE_MODE
+    if mode not in SILHOUETTE_MODES:
+        raise ValueError(f"Modo de silhueta desconhecido: '{mode}'. Use um de {SILHOUETTE_MODES}.")
+
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels)
+    n_samples = len(X)
+    n_labels = len(np.unique(labels))
+    if n_labels < 2 or n_labels >= n_samples:
+        return SilhouetteEstimate(np.nan, mode, 0)
+
+    block_rows = _block_rows(n_samples, max_bytes or config.SILHOUETTE_BLOCK_BYTES)
+    sample_size = sample_size or config.SILHOUETTE_SAMPLE_SIZE
+
+    if mode == 'simplified':
+        return SilhouetteEstimate(_simplified_silhouette(X, labels, centers), mode, n_samples)
+
+    if mode == 'exact' or sample_size >= n_samples:
+        scores = _silhouette_of_rows(X, labels, np.arange(n_samples), block_rows)
+        return SilhouetteEstimate(float(np.mean(scores)), 'exact', n_samples)
+
+    # Estimador estratificado: média ponderada pelo tamanho de cada cluster,
+    # com a silhueta de cada ponto sorteado calculada contra todos os pontos
+    rng = np.random.default_rng(random_state)
+    strata = _stratified_sample(labels, sample_size, rng)
+    sampled_rows = np.concatenate([rows for _, rows in strata])
+    sampled_scores = _silhouette_of_rows(X, labels, sampled_rows, block_rows)
+
+    estimate, variance, offset = 0.0, 0.0, 0
+    for members, rows in strata:
+        stratum_scores = sampled_scores[offset:offset + len(rows)]
+        offset += len(rows)
+        weight = len(members) / n_samples
+        estimate += weight * stratum_scores.mean()
+        if len(rows) > 1:
+            finite_population = 1.0 - len(rows) / len(members)
+            variance += weight ** 2 * stratum_scores.var(ddof=1) / len(rows) * finite_population
+
+    z = NormalDist().inv_cdf(0.5 + (confidence or config.SILHOUETTE_CONFIDENCE) / 2)
+    margin = z * np.sqrt(variance)
+    return SilhouetteEstimate(float(estimate), mode, len(sampled_rows),
+                              float(estimate - margin), float(estimate + margin))
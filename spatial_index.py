@@ -0,0 +1,176 @@
+# spatial_index.py
+"""
+Índice espacial (KD-tree, scipy.spatial.cKDTree) sobre o espaço PCA dos
+melhores modelos, para duas tarefas:
+
+- agrupar simulações quase idênticas (a menos de um raio do representante)
+  antes do clustering: o otimizador gera muitos vetores de parâmetros
+  praticamente iguais, que pesam demais no K-Means e na silhueta. Cada grupo
+  é representado pelo modelo de menor OF; k e o K-Means são ajustados só sobre
+  os representantes e os demais membros recebem o rótulo do seu representante;
+- escolher os 'campeões' de cada cluster: os N de menor OF, com uma distância
+  mínima (maximin) entre quaisquer dois campeões, inclusive de clusters
+  vizinhos, para que não sejam quase cópias uns dos outros.
+
+Os candidatos de cada cluster são obtidos com np.argpartition (só os melhores
+são ordenados, nunca a tabela inteira) e a restrição de distância é aplicada
+com consultas de raio ao KD-tree dos candidatos.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+
+# Candidatos (por campeão pedido) considerados em cada cluster quando há distância mínima
+CHAMPION_POOL_FACTOR = 50
+
+@dataclass
+class DuplicateGroups:
+    """
+    Grupos de simulações quase idênticas.
+
+    Attributes:
+        group_of_row (numpy.ndarray): Grupo de cada linha (0 .. n_grupos - 1).
+        representatives (numpy.ndarray): Posição da linha que representa cada grupo (a de menor OF).
+        radius (float): Raio usado no agrupamento.
+    """
+    group_of_row: np.ndarray
+    representatives: np.ndarray
+    radius: float
+
+    @property
+    def n_rows(self):
+        return len(self.group_of_row)
+
+    @property
+    def n_groups(self):
+        return len(self.representatives)
+
+    @property
+    def n_collapsed(self):
+        """Linhas que não são representantes (absorvidas por outro modelo do grupo)."""
+        return self.n_rows - self.n_groups
+
+def find_near_duplicates(X, radius, of_values=None):
+    """
+    Agrupa as linhas a menos de radius de um representante (atribuição gulosa
+    por líderes): as linhas são visitadas em ordem de OF e cada linha ainda sem
+    grupo vira representante e absorve as linhas sem grupo a menos de radius
+    dela (consulta de raio ao KD-tree). Todo membro fica a menos de radius do
+    seu representante, de modo que os grupos não se encadeiam pelo espaço.
+
+    Linhas exatamente iguais são unidas antes (np.unique), de modo que as
+    consultas não crescem com o número de cópias exatas.
+
+    Args:
+        X (numpy.ndarray): Coordenadas (n, d), ex.: os dados após PCA.
+        radius (float): Distância euclidiana máxima entre um membro e o representante do grupo.
+        of_values (numpy.ndarray, optional): OF de cada linha; as linhas são visitadas em ordem
+                                             de OF, de modo que o representante de cada grupo
+                                             é a de menor OF (ou a primeira linha).
+
+    Returns:
+        DuplicateGroups: O grupo de cada linha e os representantes.
+    """
+    from scipy.spatial import cKDTree
+
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    n_rows = len(X)
+    unique_X, inverse = np.unique(X, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    n_unique = len(unique_X)
+
+    # Linha que representa cada ponto distinto: a de menor OF (empates: a primeira linha)
+    of_values = np.zeros(n_rows) if of_values is None else np.asarray(of_values, dtype=np.float64)
+    row_order = np.lexsort((np.arange(n_rows), of_values))
+    unique_row = np.empty(n_unique, dtype=np.int64)
+    unique_row[inverse[row_order[::-1]]] = row_order[::-1] # A última escrita (a de menor OF) prevalece
+
+    # Líderes em ordem de OF: cada ponto ainda sem grupo absorve os vizinhos sem grupo
+    tree = cKDTree(unique_X)
+    unique_groups = np.full(n_unique, -1, dtype=np.int64)
+    leaders = []
+    for point in np.lexsort((unique_row, of_values[unique_row])):
+        if unique_groups[point] >= 0:
+            continue
+        neighbors = np.asarray(tree.query_ball_point(unique_X[point], radius), dtype=np.int64)
+        unique_groups[neighbors[unique_groups[neighbors] < 0]] = len(leaders)
+        leaders.append(point)
+    representatives = unique_row[np.asarray(leaders, dtype=np.int64)]
+
+    # Grupos renumerados na ordem das linhas dos representantes
+    order_reps = np.argsort(representatives, kind='stable')
+    renumber = np.empty(len(representatives), dtype=np.int64)
+    renumber[order_reps] = np.arange(len(representatives))
+    return DuplicateGroups(group_of_row=renumber[unique_groups[inverse]], representatives=representatives[order_reps],
+                           radius=float(radius))
+
+def _ranked_candidates(of_values, members, pool_size):
+    """Os pool_size membros de menor OF (com empates no limite), em ordem de OF e de posição."""
+    if pool_size < len(members):
+        member_of = of_values[members]
+        cutoff = member_of[np.argpartition(member_of, pool_size - 1)[pool_size - 1]]
+        members = members[member_of <= cutoff]
+    return members[np.lexsort((members, of_values[members]))]
+
+def select_champions(X, of_values, labels, n_per_cluster=1, min_distance=None, pool_factor=CHAMPION_POOL_FACTOR):
+    """
+    Escolhe os campeões de cada cluster: os n_per_cluster modelos de menor OF,
+    mantendo pelo menos min_distance entre quaisquer dois campeões escolhidos.
+
+    As escolhas são feitas em rodadas (o melhor de cada cluster, depois o
+    segundo, ...), com os clusters em ordem da sua melhor OF, e cada campeão
+    bloqueia os candidatos a menos de min_distance dele (consulta de raio ao
+    KD-tree). Sem min_distance, o campeão de cada cluster é o de menor OF (o
+    mesmo de groupby('Cluster')['OF Value'].idxmin()).
+
+    Args:
+        X (numpy.ndarray): Coordenadas (n, d) usadas nas distâncias (ex.: os dados após PCA).
+        of_values (numpy.ndarray): OF de cada linha.
+        labels (numpy.ndarray): Cluster de cada linha (rótulos negativos são ignorados).
+        n_per_cluster (int): Campeões por cluster.
+        min_distance (float, optional): Distância euclidiana mínima entre campeões.
+        pool_factor (int): Com min_distance, só os pool_factor * n_per_cluster melhores de
+                           cada cluster são candidatos.
+
+    Returns:
+        tuple: Contendo:
+            - numpy.ndarray: Posições dos campeões, por cluster e, dentro dele, por OF.
+            - numpy.ndarray: Posto de cada campeão dentro do seu cluster (1 = melhor).
+    """
+    of_values = np.asarray(of_values, dtype=np.float64)
+    labels = np.asarray(labels)
+    clusters = np.unique(labels[labels >= 0])
+    pool_size = n_per_cluster * (pool_factor if min_distance else 1)
+    pools = [_ranked_candidates(of_values, np.flatnonzero(labels == c), pool_size) for c in clusters]
+
+    if not min_distance:
+        picks = [pool[:n_per_cluster] for pool in pools]
+    else:
+        from scipy.spatial import cKDTree
+
+        candidates = np.concatenate(pools)
+        tree = cKDTree(np.asarray(X, dtype=np.float64)[candidates])
+        blocked = np.zeros(len(candidates), dtype=bool)
+        offsets = np.r_[0, np.cumsum([len(pool) for pool in pools])]
+        cursors = offsets[:-1].copy()
+        picks = [[] for _ in pools]
+        cluster_order = np.argsort([of_values[pool[0]] for pool in pools], kind='stable')
+        for _ in range(n_per_cluster):
+            for i in cluster_order:
+                while cursors[i] < offsets[i + 1] and blocked[cursors[i]]:
+                    cursors[i] += 1
+                if cursors[i] == offsets[i + 1]:
+                    continue # Candidatos do cluster esgotados
+                pick = cursors[i]
+                picks[i].append(candidates[pick])
+                blocked[tree.query_ball_point(tree.data[pick], min_distance)] = True
+                blocked[pick] = True
+        short = [int(c) for c, chosen in zip(clusters, picks) if len(chosen) < n_per_cluster]
+        if short:
+            print(f"Aviso: Clusters {short} com menos de {n_per_cluster} campeões a {min_distance} "
+                  f"de distância entre si (entre os {pool_size} melhores de cada um).")
+        picks = [np.asarray(chosen, dtype=np.int64) for chosen in picks]
+
+    positions = np.concatenate(picks) if picks else np.empty(0, dtype=np.int64)
+    ranks = np.concatenate([np.arange(1, len(chosen) + 1) for chosen in picks]) if picks else np.empty(0, dtype=np.int64)
+    return positions, ranks
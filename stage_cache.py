@@ -0,0 +1,120 @@
+# stage_cache.py
+"""
+Módulo de cache das etapas do pipeline (melhores modelos, scaler/PCA,
+varredura de k e modelo K-Means final).
+
+Cada entrada é endereçada pelo conteúdo: a chave combina a chave da etapa
+anterior com os valores de configuração que afetam a etapa. Assim, uma nova
+execução que só altera configurações posteriores (ex.: OPTIMAL_K ou estilo
+dos gráficos) reaproveita todas as etapas anteriores. As entradas ficam em
+config.STAGE_CACHE_DIR e são removidas por idade e pelo tamanho total.
+"""
+
+import os
+import glob
+import time
+import pickle
+import hashlib
+import config # Importa as configurações
+
+# Versão do formato das entradas. Incremente ao mudar o que uma etapa retorna.
+STAGE_CACHE_VERSION = 3
+
+def make_key(*parts):
+    """
+    Gera a chave (hash SHA-256) de uma etapa a partir das suas entradas.
+
+    Args:
+        *parts: Chave da etapa anterior e valores de configuração relevantes
+                (strings, números, ranges, tuplas...). Devem ter repr estável.
+
+    Returns:
+        str: A chave em hexadecimal.
+    """
+    payload = repr((STAGE_CACHE_VERSION,) + parts).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+def _entry_path(stage, key, cache_dir):
+    return os.path.join(cache_dir, f"{stage}_{key[:32]}.pkl")
+
+def cached_stage(stage, key, compute, cache_dir=None, enabled=None):
+    """
+    Retorna o resultado da etapa a partir do cache ou o calcula e armazena.
+
+    Args:
+        stage (str): Nome da etapa (ex.: 'pca').
+        key (str): Chave da etapa, gerada por make_key.
+        compute (callable): Função sem argumentos que calcula o resultado da etapa.
+        cache_dir (str, optional): Diretório do cache. Padrão: config.STAGE_CACHE_DIR.
+        enabled (bool, optional): Se o cache deve ser usado. Padrão: config.USE_STAGE_CACHE.
+
+    Returns:
+        O resultado da etapa (qualquer objeto serializável com pickle).
+    """
+    enabled = config.USE_STAGE_CACHE if enabled is None else enabled
+    if not enabled:
+        return compute()
+
+    cache_dir = cache_dir or config.STAGE_CACHE_DIR
+    path = _entry_path(stage, key, cache_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path) # Marca como usada recentemente (para a remoção por idade/tamanho)
+            print(f"  Etapa '{stage}' recuperada do cache.")
+            return value
+        except Exception as e:
+            print(f"Aviso: Entrada de cache '{path}' inválida, recalculando: {e}")
+
+    value = compute()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path) # Escrita atômica
+    except Exception as e:
+        print(f"Aviso: Não foi possível salvar a etapa '{stage}' no cache: {e}")
+    return value
+
+def evict(cache_dir=None, max_bytes=None, max_age_days=None):
+    """
+    Remove entradas antigas e, se o cache exceder o tamanho máximo,
+    as menos usadas recentemente.
+
+    Args:
+        cache_dir (str, optional): Diretório do cache. Padrão: config.STAGE_CACHE_DIR.
+        max_bytes (int, optional): Tamanho máximo total. Padrão: config.STAGE_CACHE_MAX_BYTES.
+        max_age_days (float, optional): Idade máxima das entradas, em dias.
+                                        Padrão: config.STAGE_CACHE_MAX_AGE_DAYS.
+
+    Returns:
+        int: Número de entradas removidas.
+    """
+    cache_dir = cache_dir or config.STAGE_CACHE_DIR
+    max_bytes = max_bytes if max_bytes is not None else config.STAGE_CACHE_MAX_BYTES
+    max_age_days = max_age_days if max_age_days is not None else config.STAGE_CACHE_MAX_AGE_DAYS
+
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*.pkl')):
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort() # Mais antigas (menos usadas) primeiro
+
+    removed = 0
+    now = time.time()
+    total_bytes = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        too_old = (now - mtime) > max_age_days * 86400
+        if too_old or total_bytes > max_bytes:
+            os.remove(path)
+            total_bytes -= size
+            removed += 1
+    if removed:
+        print(f"Cache de etapas: {removed} entrada(s) removida(s).")
+    return removed
+
+def clear(cache_dir=None):
+    """Remove todas as entradas do cache de etapas."""
+    return evict(cache_dir, max_bytes=0, max_age_days=0)